@@ -1,21 +1,88 @@
+import os
 from flask import Flask
 from .models import User, Appointment, Medication, ChatMessage
 from .store import DataStore
+from .backends import create_backend
+from .history import create_history
+from .vitals import create_vitals
+from .sessions import create_session_store
+from .scheduling import create_booking_store
+from .reminders import ReminderScheduler, ChatHistorySink, create_reminder_queue
 from .nlp import NLPEngine
+from .intent_classifier import IntentClassifier
 from .dialog import DialogManager
-from .security import SecurityManager
+from .security import SecurityManager, RateLimiter
+from .crypto import EnvelopeCipher
+
+def create_services():
+    """Build the dialog manager, security manager and login session store from the environment."""
+    # CHATBOT_ENCRYPTION_KEY (base64, 32 bytes; see EnvelopeCipher.generate_master_key)
+    # encrypts health data and chat history at rest
+    master_key = os.environ.get("CHATBOT_ENCRYPTION_KEY")
+    cipher = EnvelopeCipher.from_base64(master_key) if master_key else None
+    
+    # CHATBOT_STORE_URL / CHATBOT_HISTORY_URL / CHATBOT_VITALS_URL pick the user,
+    # chat history and vitals stores, e.g. sqlite:///chatbot.db (default: in memory)
+    store_url = os.environ.get("CHATBOT_STORE_URL", "memory://")
+    # Doctor bookings go in a table next to a SQLite user store unless
+    # CHATBOT_BOOKING_URL says otherwise
+    booking_url = store_url.partition("?")[0] if store_url.startswith("sqlite:") else "memory://"
+    data_store = DataStore(
+        create_backend(store_url, cipher),
+        history=create_history(os.environ.get("CHATBOT_HISTORY_URL", "memory://"), cipher),
+        vitals=create_vitals(os.environ.get("CHATBOT_VITALS_URL", "memory://"), cipher),
+        bookings=create_booking_store(os.environ.get("CHATBOT_BOOKING_URL", booking_url))
+    )
+    
+    # CHATBOT_INTENT_BACKEND=classifier detects intents with a TF-IDF model trained
+    # on data_store.intent_examples (cached under CHATBOT_MODEL_DIR if set)
+    # instead of the regex patterns
+    intent_classifier = None
+    if os.environ.get("CHATBOT_INTENT_BACKEND", "regex") == "classifier":
+        intent_classifier = IntentClassifier.train(data_store.intent_examples, cache_dir=os.environ.get("CHATBOT_MODEL_DIR"))
+    nlp_engine = NLPEngine(data_store, intent_classifier)
+    
+    # Sessions expire after CHATBOT_SESSION_TTL seconds of inactivity;
+    # CHATBOT_SESSION_URL=sqlite:///sessions.db shares them between workers
+    session_url = os.environ.get("CHATBOT_SESSION_URL", "memory://")
+    session_ttl = float(os.environ.get("CHATBOT_SESSION_TTL", "1800"))
+    active_sessions = create_session_store(session_url, "active_sessions", session_ttl)
+    dialog_sessions = create_session_store(session_url, "dialog_sessions", session_ttl)
+    for sessions in (active_sessions, dialog_sessions):
+        sessions.start_sweeper()
+    
+    # Medication reminders are posted into the user's chat history; set
+    # CHATBOT_REMINDER_URL=sqlite:///reminders.db to keep them across restarts
+    reminders = ReminderScheduler(create_reminder_queue(os.environ.get("CHATBOT_REMINDER_URL", "memory://")), ChatHistorySink(data_store))
+    reminders.start()
+    
+    # Password hashing cost (scrypt N, r, p) and the size of its process pool;
+    # CHATBOT_LOGIN_RATE login/register attempts per minute per client IP
+    # (0 disables the limit), in bursts of up to CHATBOT_LOGIN_BURST
+    login_rate = float(os.environ.get("CHATBOT_LOGIN_RATE", "10"))
+    security_manager = SecurityManager(
+        n=int(os.environ.get("CHATBOT_SCRYPT_N", "16384")),
+        r=int(os.environ.get("CHATBOT_SCRYPT_R", "8")),
+        p=int(os.environ.get("CHATBOT_SCRYPT_P", "1")),
+        workers=int(os.environ.get("CHATBOT_AUTH_WORKERS", "2")),
+        max_pending=int(os.environ.get("CHATBOT_AUTH_MAX_PENDING", "64")),
+        rate_limiter=RateLimiter(login_rate / 60, int(os.environ.get("CHATBOT_LOGIN_BURST", "10"))) if login_rate else None,
+        cipher=cipher
+    )
+    
+    # The security manager also hashes the password chosen during chat onboarding
+    dialog_manager = DialogManager(data_store, nlp_engine, dialog_sessions, reminders=reminders,
+                                   security_manager=security_manager)
+    return dialog_manager, security_manager, active_sessions
 
 def create_app():
     app = Flask(__name__)
     
     # Initialize components
-    data_store = DataStore()
-    nlp_engine = NLPEngine(data_store)
-    dialog_manager = DialogManager(data_store, nlp_engine)
-    security_manager = SecurityManager()
+    dialog_manager, security_manager, active_sessions = create_services()
     
     # Register routes
     from .main import init_routes
-    init_routes(app, dialog_manager, security_manager)
+    init_routes(app, dialog_manager, security_manager, active_sessions)
     
     return app
\ No newline at end of file
@@ -0,0 +1,153 @@
+import asyncio
+import os
+import uuid
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+from aiohttp import web
+from .dialog import DialogManager
+from .security import SecurityManager, AuthBusyError
+from .sessions import SessionStore, MemorySessionBackend
+from .models import ChatMessage, User
+from .indexes import DuplicateValueError
+from .backends import MemoryUserBackend
+
+class AsyncChatServer:
+    """asyncio serving mode for the chatbot API (aiohttp).
+    
+    Same endpoints and JSON as init_routes. Turns of one conversation are
+    serialized by a per-user asyncio.Lock while different conversations
+    interleave freely on the event loop. With in-memory stores a turn is
+    pure CPU work and runs inline, except the onboarding password step,
+    which waits on scrypt and so always runs on the loop's default thread
+    pool. When the user store or either session store does blocking I/O
+    (SQLite, dbm), turns, session lookups and user reads and writes are
+    handed to a small thread pool instead so the loop keeps accepting
+    requests.
+    """
+    
+    def __init__(self, dialog_manager: DialogManager, security_manager: SecurityManager,
+                 active_sessions: SessionStore, offload: Optional[bool] = None, workers: int = 4):
+        self.dialog_manager = dialog_manager
+        self.security_manager = security_manager
+        self.active_sessions = active_sessions
+        if offload is None:
+            offload = not (isinstance(dialog_manager.data_store.users, MemoryUserBackend)
+                           and isinstance(active_sessions.backend, MemorySessionBackend)
+                           and isinstance(dialog_manager.session_data.backend, MemorySessionBackend))
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="chat-turn") if offload else None
+        self._locks = weakref.WeakValueDictionary()
+    
+    def _lock(self, user_id: str) -> asyncio.Lock:
+        lock = self._locks.get(user_id)
+        if lock is None:
+            lock = self._locks[user_id] = asyncio.Lock()
+        return lock
+    
+    async def _blocking(self, function, *args):
+        # Store access: inline when everything is in memory, else on the thread pool
+        if self.executor is None:
+            return function(*args)
+        return await asyncio.get_running_loop().run_in_executor(self.executor, function, *args)
+    
+    def _turn(self, user_id: str, message: str) -> str:
+        response = self.dialog_manager.process_message(user_id, message)
+        data_store = self.dialog_manager.data_store
+        if data_store.get_user(user_id):
+            data_store.append_chat_messages(user_id, [
+                ChatMessage("user", message),
+                ChatMessage("bot", response)
+            ])
+        return response
+    
+    async def handle_message(self, request: web.Request) -> web.Response:
+        data = await request.json()
+        session_token = request.headers.get("X-Session-Token")
+        message = data.get("message", "")
+        
+        user_id = await self._blocking(self.active_sessions.get, session_token) if session_token else None
+        if user_id is None:
+            # A guest conversation: its token keeps the next turns in the same session
+            session_token = self.security_manager.generate_session_token()
+            user_id = f"temp_{self.security_manager.generate_session_token()}"
+            await self._blocking(self.active_sessions.set, session_token, user_id)
+        
+        async with self._lock(user_id):
+            if self.executor is None and self.dialog_manager.waits_on_pool(user_id):
+                # The password step blocks on scrypt's result: wait for it off the loop
+                response = await asyncio.get_running_loop().run_in_executor(None, self._turn, user_id, message)
+            else:
+                response = await self._blocking(self._turn, user_id, message)
+        return web.json_response({"response": response, "session_token": session_token})
+    
+    async def handle_authenticate(self, request: web.Request) -> web.Response:
+        # scrypt runs in the security manager's process pool; the loop only awaits it
+        if not self.security_manager.allow_login(request.remote or "unknown"):
+            return web.json_response({"error": "Too many login attempts"}, status=429)
+        data = await request.json()
+        email = data.get("email")
+        password = data.get("password") or ""
+        data_store = self.dialog_manager.data_store
+        user = await self._blocking(data_store.get_user_by_email, email) if email else None
+        try:
+            valid = await asyncio.wrap_future(
+                self.security_manager.submit_verify(password, user.password_hash if user else None))
+            if valid and self.security_manager.needs_rehash(user.password_hash):
+                user.password_hash = await asyncio.wrap_future(self.security_manager.submit_hash(password))
+                await self._blocking(data_store.update_user, user)
+        except AuthBusyError:
+            return web.json_response({"error": "Authentication is busy, try again shortly"}, status=503)
+        if not valid:
+            return web.json_response({"error": "Invalid email or password"}, status=401)
+        session_token = self.security_manager.generate_session_token()
+        await self._blocking(self.active_sessions.set, session_token, user.user_id)
+        return web.json_response({"session_token": session_token})
+    
+    async def handle_register(self, request: web.Request) -> web.Response:
+        if not self.security_manager.allow_login(request.remote or "unknown"):
+            return web.json_response({"error": "Too many login attempts"}, status=429)
+        data = await request.json()
+        if not all(data.get(field) for field in ("name", "email", "dob", "password")):
+            return web.json_response({"error": "name, email, dob and password are required"}, status=400)
+        try:
+            password_hash = await asyncio.wrap_future(self.security_manager.submit_hash(data["password"]))
+        except AuthBusyError:
+            return web.json_response({"error": "Authentication is busy, try again shortly"}, status=503)
+        user = User(str(uuid.uuid4()), data["name"], data["email"], data["dob"], password_hash)
+        try:
+            await self._blocking(self.dialog_manager.data_store.create_user, user)
+        except DuplicateValueError:
+            return web.json_response({"error": f"An account with {data['email']} already exists"}, status=409)
+        session_token = self.security_manager.generate_session_token()
+        await self._blocking(self.active_sessions.set, session_token, user.user_id)
+        return web.json_response({"session_token": session_token}, status=201)
+    
+    async def handle_metrics(self, request: web.Request) -> web.Response:
+        return web.json_response({
+            "active_sessions": await self._blocking(self.active_sessions.metrics),
+            "dialog_sessions": await self._blocking(self.dialog_manager.session_data.metrics),
+            "response_cache": self.dialog_manager.response_cache.stats()
+        })
+    
+    async def _shutdown(self, app: web.Application) -> None:
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+        self.security_manager.close()
+    
+    def make_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/api/message", self.handle_message)
+        app.router.add_post("/api/authenticate", self.handle_authenticate)
+        app.router.add_post("/api/register", self.handle_register)
+        app.router.add_get("/api/sessions/metrics", self.handle_metrics)
+        app.on_cleanup.append(self._shutdown)
+        return app
+
+def create_async_app() -> web.Application:
+    from . import create_services
+    dialog_manager, security_manager, active_sessions = create_services()
+    return AsyncChatServer(dialog_manager, security_manager, active_sessions).make_app()
+
+if __name__ == "__main__":
+    # Run from backend/chatbot:  python -m app.async_server
+    web.run_app(create_async_app(), host="0.0.0.0", port=int(os.environ.get("PORT", "5000")))
@@ -0,0 +1,104 @@
+import threading
+from collections import deque
+from typing import Hashable, List, Tuple
+
+class KeywordAutomaton:
+    """Aho-Corasick automaton for finding many keywords in one linear scan.
+    
+    Keywords can be added and removed at any time. The trie is edited in
+    place, but the failure links are not: any change marks them stale and
+    the next search recomputes all of them in one breadth-first pass over
+    the trie. Every keyword carries a set of payloads (e.g. the conditions a
+    symptom belongs to) returned with each match.
+    
+    Thread-safe: edits, the relink and searches run under one lock, so no
+    search walks links that another thread is recomputing.
+    """
+    
+    def __init__(self):
+        self._goto = [{}]
+        self._keyword = [None]
+        self._payloads = [set()]
+        self._fail = [0]
+        self._output_link = [0]
+        self._dirty = False
+        self._lock = threading.Lock()
+    
+    def add(self, keyword: str, payload: Hashable) -> None:
+        with self._lock:
+            node = 0
+            for char in keyword:
+                next_node = self._goto[node].get(char)
+                if next_node is None:
+                    next_node = len(self._goto)
+                    self._goto[node][char] = next_node
+                    self._goto.append({})
+                    self._keyword.append(None)
+                    self._payloads.append(set())
+                    self._fail.append(0)
+                    self._output_link.append(0)
+                node = next_node
+            self._keyword[node] = keyword
+            self._payloads[node].add(payload)
+            self._dirty = True
+    
+    def remove(self, keyword: str, payload: Hashable) -> None:
+        with self._lock:
+            node = 0
+            for char in keyword:
+                node = self._goto[node].get(char)
+                if node is None:
+                    return
+            self._payloads[node].discard(payload)
+            self._dirty = True
+    
+    def __contains__(self, keyword: str) -> bool:
+        with self._lock:
+            node = 0
+            for char in keyword:
+                node = self._goto[node].get(char)
+                if node is None:
+                    return False
+            return bool(self._payloads[node])
+    
+    def _link(self) -> None:
+        # Caller holds the lock. Breadth-first pass computing failure links and, for each node, the
+        # nearest proper suffix that ends a keyword (the output link)
+        queue = deque()
+        for child in self._goto[0].values():
+            self._fail[child] = 0
+            self._output_link[child] = 0
+            queue.append(child)
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                fail = self._goto[fallback].get(char, 0)
+                self._fail[child] = fail
+                self._output_link[child] = fail if self._payloads[fail] else self._output_link[fail]
+                queue.append(child)
+        self._dirty = False
+    
+    def find_all(self, text: str) -> List[Tuple[int, int, str, frozenset]]:
+        """Return every (start, end, keyword, payloads) match, overlaps included, in order of end offset."""
+        with self._lock:
+            if self._dirty:
+                self._link()
+            
+            goto, fail, payloads, output_link, keywords = (
+                self._goto, self._fail, self._payloads, self._output_link, self._keyword)
+            matches = []
+            node = 0
+            for end, char in enumerate(text, 1):
+                while node and char not in goto[node]:
+                    node = fail[node]
+                node = goto[node].get(char, 0)
+                
+                match_node = node if payloads[node] else output_link[node]
+                while match_node:
+                    keyword = keywords[match_node]
+                    matches.append((end - len(keyword), end, keyword, frozenset(payloads[match_node])))
+                    match_node = output_link[match_node]
+            return matches
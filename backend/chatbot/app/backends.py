@@ -0,0 +1,356 @@
+import dbm
+import queue
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Iterable, Iterator, Optional
+from urllib.parse import parse_qsl, urlparse
+from .indexes import DuplicateValueError, UnwrittenUsersError, normalize_email
+from .models import User
+
+class SQLitePool:
+    """Fixed pool of autocommit SQLite connections in WAL mode."""
+    
+    def __init__(self, path: str, size: int = 4):
+        self.path = path
+        self._connections = queue.Queue()
+        for _ in range(size):
+            conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._connections.put(conn)
+    
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        conn = self._connections.get()
+        try:
+            yield conn
+        finally:
+            self._connections.put(conn)
+    
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        with self.connection() as conn:
+            conn.execute("BEGIN")
+            try:
+                yield conn
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+    
+    def close(self) -> None:
+        while not self._connections.empty():
+            self._connections.get().close()
+
+class UserBackend(ABC):
+    """Storage interface for users; DataStore talks to one of these."""
+    
+    # Backends that serialize users seal their health fields with this
+    # EnvelopeCipher when one is set
+    cipher = None
+    # Unique fields storage enforces itself (across processes), which
+    # DataStore then needn't preload into its own indexes at startup
+    unique_fields = frozenset()
+    
+    @abstractmethod
+    def get(self, user_id: str) -> Optional[User]:
+        ...
+    
+    @abstractmethod
+    def get_by_email(self, email: str) -> Optional[User]:
+        ...
+    
+    def put(self, user: User) -> None:
+        self.put_many([user])
+    
+    @abstractmethod
+    def put_many(self, users: Iterable[User]) -> None:
+        ...
+    
+    def insert_many(self, users: Iterable[User]) -> None:
+        """Add new users, raising DuplicateValueError if storage already holds one of their emails."""
+        self.put_many(users)
+    
+    @abstractmethod
+    def delete(self, user_id: str) -> None:
+        ...
+    
+    @abstractmethod
+    def __iter__(self) -> Iterator[User]:
+        ...
+    
+    @abstractmethod
+    def __len__(self) -> int:
+        ...
+    
+    def flush(self) -> None:
+        pass
+    
+    def close(self) -> None:
+        self.flush()
+    
+    def _encode(self, user: User) -> bytes:
+        return user.to_bytes(self.cipher)
+    
+    def _decode(self, data: bytes) -> User:
+        return User.from_bytes(data, self.cipher)
+
+class MemoryUserBackend(UserBackend):
+    """Process-local dict of live User objects (the original behaviour)."""
+    
+    def __init__(self):
+        self.users = {}
+    
+    def get(self, user_id: str) -> Optional[User]:
+        return self.users.get(user_id)
+    
+    def get_by_email(self, email: str) -> Optional[User]:
+        # DataStore answers email lookups from its own index; this is the unindexed fallback
+        email = normalize_email(email)
+        for user in list(self.users.values()):
+            if normalize_email(user.email) == email:
+                return user
+        return None
+    
+    def put_many(self, users: Iterable[User]) -> None:
+        for user in users:
+            self.users[user.user_id] = user
+    
+    def delete(self, user_id: str) -> None:
+        self.users.pop(user_id, None)
+    
+    def __iter__(self) -> Iterator[User]:
+        return iter(list(self.users.values()))
+    
+    def __len__(self) -> int:
+        return len(self.users)
+
+class SQLiteUserBackend(UserBackend):
+    """SQLite (WAL mode) user table shared by every worker process.
+    
+    Connections come from a small pool so request threads don't open one per
+    call, and writes can be batched: with batch_size > 1 updates are
+    buffered (reads still see them) and written in one transaction when the
+    buffer fills or on flush()/close(). The email column holds the
+    normalized address under a UNIQUE index, so two workers can't create
+    the same account; inserts are never buffered so that shows up at once,
+    and buffered updates are checked against stored and buffered emails
+    before they're accepted. An update another worker beats to an email
+    before the flush is reported by user_id in an UnwrittenUsersError.
+    """
+    
+    unique_fields = frozenset({"email"})
+    
+    def __init__(self, path: str, pool_size: int = 4, batch_size: int = 1, cipher=None):
+        self.path = path
+        self.cipher = cipher
+        self.batch_size = batch_size
+        self._pending = {}
+        self._pending_lock = threading.Lock()
+        self._pool = SQLitePool(path, pool_size)
+        with self._pool.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS users ("
+                    " user_id TEXT PRIMARY KEY,"
+                    " email TEXT,"
+                    " data BLOB NOT NULL)"
+                )
+                # Tables from before emails were normalized have a plain index on the raw address
+                if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'users_email'").fetchone():
+                    rows = conn.execute("SELECT user_id, email FROM users").fetchall()
+                    conn.executemany("UPDATE users SET email = ? WHERE user_id = ?",
+                                     [(normalize_email(email), user_id) for user_id, email in rows if email is not None])
+                    conn.execute("DROP INDEX users_email")
+                conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS users_email_unique ON users (email)")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+    
+    @staticmethod
+    def _email_key(email: Optional[str]) -> Optional[str]:
+        return normalize_email(email) if email is not None else None
+    
+    @staticmethod
+    def _duplicate(error: sqlite3.IntegrityError, user_id: str, email: Optional[str]) -> DuplicateValueError:
+        if "users.email" in str(error):
+            return DuplicateValueError("email", email)
+        return DuplicateValueError("user_id", user_id)
+    
+    def get(self, user_id: str) -> Optional[User]:
+        with self._pending_lock:
+            pending = self._pending.get(user_id)
+        if pending is not None:
+            return self._decode(pending[1])
+        with self._pool.connection() as conn:
+            row = conn.execute("SELECT data FROM users WHERE user_id = ?", (user_id,)).fetchone()
+        return self._decode(row[0]) if row else None
+    
+    def get_by_email(self, email: str) -> Optional[User]:
+        email = self._email_key(email)
+        with self._pending_lock:
+            for email_value, data in self._pending.values():
+                if email_value == email:
+                    return self._decode(data)
+        with self._pool.connection() as conn:
+            row = conn.execute("SELECT data FROM users WHERE email = ? LIMIT 1", (email,)).fetchone()
+        return self._decode(row[0]) if row else None
+    
+    def put_many(self, users: Iterable[User]) -> None:
+        rows = {user.user_id: (self._email_key(user.email), self._encode(user)) for user in users}
+        owners = {}
+        for user_id, (email, _) in rows.items():
+            if email is not None and owners.setdefault(email, user_id) != user_id:
+                raise DuplicateValueError("email", email)
+        if owners:
+            with self._pool.connection() as conn:
+                stored = conn.execute(f"SELECT email, user_id FROM users WHERE email IN ({', '.join('?' * len(owners))})",
+                                      list(owners)).fetchall()
+        else:
+            stored = []
+        with self._pending_lock:
+            # Conflicts are checked before anything is buffered, so the caller hears of its own
+            taken = dict(stored)
+            taken.update((email, user_id) for user_id, (email, _) in self._pending.items() if user_id not in rows)
+            for email, user_id in owners.items():
+                if taken.get(email, user_id) != user_id:
+                    raise DuplicateValueError("email", email)
+            self._pending.update(rows)
+            should_flush = len(self._pending) >= self.batch_size
+        if should_flush:
+            self.flush()
+    
+    def insert_many(self, users: Iterable[User]) -> None:
+        rows = [(user.user_id, self._email_key(user.email), self._encode(user)) for user in users]
+        self.flush()
+        with self._pool.transaction() as conn:
+            for row in rows:
+                try:
+                    conn.execute("INSERT INTO users (user_id, email, data) VALUES (?, ?, ?)", row)
+                except sqlite3.IntegrityError as e:
+                    raise self._duplicate(e, row[0], row[1]) from e
+    
+    def flush(self) -> None:
+        with self._pending_lock:
+            rows = [(user_id, email, data) for user_id, (email, data) in self._pending.items()]
+            self._pending = {}
+        if not rows:
+            return
+        upsert = ("INSERT INTO users (user_id, email, data) VALUES (?, ?, ?) "
+                  "ON CONFLICT(user_id) DO UPDATE SET email = excluded.email, data = excluded.data")
+        try:
+            with self._pool.transaction() as conn:
+                conn.executemany(upsert, rows)
+        except sqlite3.IntegrityError:
+            # Another worker took an email since an update was buffered: write
+            # the rest one at a time and report every user that couldn't be
+            errors = {}
+            with self._pool.connection() as conn:
+                for row in rows:
+                    try:
+                        conn.execute(upsert, row)
+                    except sqlite3.IntegrityError as e:
+                        errors[row[0]] = self._duplicate(e, row[0], row[1])
+            if errors:
+                raise UnwrittenUsersError(errors)
+    
+    def delete(self, user_id: str) -> None:
+        with self._pending_lock:
+            self._pending.pop(user_id, None)
+        with self._pool.connection() as conn:
+            conn.execute("DELETE FROM users WHERE user_id = ?", (user_id,))
+    
+    def __iter__(self) -> Iterator[User]:
+        self.flush()
+        with self._pool.connection() as conn:
+            rows = conn.execute("SELECT data FROM users").fetchall()
+        return (self._decode(row[0]) for row in rows)
+    
+    def __len__(self) -> int:
+        self.flush()
+        with self._pool.connection() as conn:
+            return conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+    
+    def close(self) -> None:
+        self.flush()
+        self._pool.close()
+
+class DbmUserBackend(UserBackend):
+    """Local key-value store (stdlib dbm) for single-process deployments."""
+    
+    def __init__(self, path: str, cipher=None):
+        self.cipher = cipher
+        self._db = dbm.open(path, "c")
+        self._lock = threading.Lock()
+    
+    def get(self, user_id: str) -> Optional[User]:
+        with self._lock:
+            data = self._db.get(f"user:{user_id}")
+        return self._decode(data) if data else None
+    
+    @staticmethod
+    def _email_key(email: str) -> str:
+        return f"email:{normalize_email(email)}"
+    
+    def get_by_email(self, email: str) -> Optional[User]:
+        with self._lock:
+            # Stores written before emails were normalized are keyed by the raw address
+            user_id = self._db.get(self._email_key(email)) or self._db.get(f"email:{email}")
+        return self.get(user_id.decode()) if user_id else None
+    
+    def put_many(self, users: Iterable[User]) -> None:
+        with self._lock:
+            for user in users:
+                previous = self._db.get(f"user:{user.user_id}")
+                if previous:
+                    previous_key = self._email_key(self._decode(previous).email)
+                    if previous_key != self._email_key(user.email) and previous_key in self._db:
+                        del self._db[previous_key]
+                self._db[f"user:{user.user_id}"] = self._encode(user)
+                self._db[self._email_key(user.email)] = user.user_id
+    
+    def delete(self, user_id: str) -> None:
+        with self._lock:
+            data = self._db.get(f"user:{user_id}")
+            if data:
+                del self._db[f"user:{user_id}"]
+                email_key = self._email_key(self._decode(data).email)
+                if email_key in self._db:
+                    del self._db[email_key]
+    
+    def __iter__(self) -> Iterator[User]:
+        with self._lock:
+            rows = [self._db[key] for key in self._db.keys() if key.startswith(b"user:")]
+        return (self._decode(row) for row in rows)
+    
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(1 for key in self._db.keys() if key.startswith(b"user:"))
+    
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+def create_backend(url: str = "memory://", cipher=None) -> UserBackend:
+    """Build a backend from a URL: memory://, sqlite:///path/to.db or dbm:///path/to/store.
+    
+    SQLite URLs take pool_size and batch_size query options,
+    e.g. sqlite:///chatbot.db?batch_size=50. With a cipher, persistent
+    backends store health fields encrypted (the memory backend keeps
+    nothing at rest).
+    """
+    parsed = urlparse(url)
+    options = {key: int(value) for key, value in parse_qsl(parsed.query)}
+    if parsed.scheme in ("", "memory"):
+        return MemoryUserBackend()
+    # sqlite:///relative.db and sqlite:////absolute.db, as in SQLAlchemy URLs
+    path = parsed.netloc + parsed.path[1:]
+    if parsed.scheme == "sqlite":
+        return SQLiteUserBackend(path, cipher=cipher, **options)
+    if parsed.scheme == "dbm":
+        return DbmUserBackend(path, cipher)
+    raise ValueError(f"Unsupported store URL: {url}")
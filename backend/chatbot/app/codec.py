@@ -0,0 +1,151 @@
+import struct
+from typing import Any
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# Compact binary encoding in the MessagePack wire format.
+#
+# Uses the msgpack package when it is installed and falls back to this
+# pure-Python subset (nil, bool, int, float, str, bin, array, map) otherwise;
+# both read and write the same bytes.
+
+def _pack(obj: Any, out: bytearray) -> None:
+    if obj is None:
+        out.append(0xc0)
+    elif obj is True:
+        out.append(0xc3)
+    elif obj is False:
+        out.append(0xc2)
+    elif isinstance(obj, int):
+        if 0 <= obj < 0x80:
+            out.append(obj)
+        elif -32 <= obj < 0:
+            out.append(obj & 0xff)
+        elif 0 <= obj < 2 ** 64:
+            out += struct.pack(">BQ", 0xcf, obj)
+        elif -2 ** 63 <= obj < 0:
+            out += struct.pack(">Bq", 0xd3, obj)
+        else:
+            raise OverflowError(f"Integer out of range: {obj}")
+    elif isinstance(obj, float):
+        out += struct.pack(">Bd", 0xcb, obj)
+    elif isinstance(obj, str):
+        data = obj.encode("utf-8")
+        size = len(data)
+        if size < 32:
+            out.append(0xa0 | size)
+        elif size < 2 ** 8:
+            out += struct.pack(">BB", 0xd9, size)
+        elif size < 2 ** 16:
+            out += struct.pack(">BH", 0xda, size)
+        else:
+            out += struct.pack(">BI", 0xdb, size)
+        out += data
+    elif isinstance(obj, (bytes, bytearray)):
+        size = len(obj)
+        if size < 2 ** 8:
+            out += struct.pack(">BB", 0xc4, size)
+        elif size < 2 ** 16:
+            out += struct.pack(">BH", 0xc5, size)
+        else:
+            out += struct.pack(">BI", 0xc6, size)
+        out += obj
+    elif isinstance(obj, (list, tuple)):
+        size = len(obj)
+        if size < 16:
+            out.append(0x90 | size)
+        elif size < 2 ** 16:
+            out += struct.pack(">BH", 0xdc, size)
+        else:
+            out += struct.pack(">BI", 0xdd, size)
+        for item in obj:
+            _pack(item, out)
+    elif isinstance(obj, dict):
+        size = len(obj)
+        if size < 16:
+            out.append(0x80 | size)
+        elif size < 2 ** 16:
+            out += struct.pack(">BH", 0xde, size)
+        else:
+            out += struct.pack(">BI", 0xdf, size)
+        for key, value in obj.items():
+            _pack(key, out)
+            _pack(value, out)
+    else:
+        raise TypeError(f"Cannot encode {type(obj).__name__}")
+
+_SIZED = {
+    0xc4: (">B", "bin"), 0xc5: (">H", "bin"), 0xc6: (">I", "bin"),
+    0xd9: (">B", "str"), 0xda: (">H", "str"), 0xdb: (">I", "str"),
+    0xdc: (">H", "array"), 0xdd: (">I", "array"),
+    0xde: (">H", "map"), 0xdf: (">I", "map")
+}
+_SCALARS = {
+    0xca: ">f", 0xcb: ">d",
+    0xcc: ">B", 0xcd: ">H", 0xce: ">I", 0xcf: ">Q",
+    0xd0: ">b", 0xd1: ">h", 0xd2: ">i", 0xd3: ">q"
+}
+
+def _unpack(data: bytes, offset: int):
+    tag = data[offset]
+    offset += 1
+    if tag < 0x80:
+        return tag, offset
+    if tag >= 0xe0:
+        return tag - 0x100, offset
+    if 0xa0 <= tag < 0xc0:
+        end = offset + (tag & 0x1f)
+        return data[offset:end].decode("utf-8"), end
+    if 0x90 <= tag < 0xa0:
+        kind, size = "array", tag & 0x0f
+    elif 0x80 <= tag < 0x90:
+        kind, size = "map", tag & 0x0f
+    elif tag == 0xc0:
+        return None, offset
+    elif tag == 0xc2:
+        return False, offset
+    elif tag == 0xc3:
+        return True, offset
+    elif tag in _SCALARS:
+        fmt = _SCALARS[tag]
+        return struct.unpack_from(fmt, data, offset)[0], offset + struct.calcsize(fmt)
+    elif tag in _SIZED:
+        fmt, kind = _SIZED[tag]
+        size = struct.unpack_from(fmt, data, offset)[0]
+        offset += struct.calcsize(fmt)
+    else:
+        raise ValueError(f"Unsupported MessagePack type 0x{tag:02x}")
+    
+    if kind == "bin":
+        return bytes(data[offset:offset + size]), offset + size
+    if kind == "str":
+        return data[offset:offset + size].decode("utf-8"), offset + size
+    if kind == "array":
+        items = []
+        for _ in range(size):
+            item, offset = _unpack(data, offset)
+            items.append(item)
+        return items, offset
+    result = {}
+    for _ in range(size):
+        key, offset = _unpack(data, offset)
+        result[key], offset = _unpack(data, offset)
+    return result, offset
+
+def packb(obj: Any) -> bytes:
+    if msgpack is not None:
+        return msgpack.packb(obj, use_bin_type=True)
+    out = bytearray()
+    _pack(obj, out)
+    return bytes(out)
+
+def unpackb(data: bytes) -> Any:
+    if msgpack is not None:
+        return msgpack.unpackb(data, raw=False, strict_map_key=False)
+    obj, offset = _unpack(data, 0)
+    if offset != len(data):
+        raise ValueError("Trailing data after MessagePack object")
+    return obj
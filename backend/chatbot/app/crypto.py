@@ -0,0 +1,200 @@
+import base64
+import os
+import struct
+import threading
+from collections import OrderedDict
+from typing import Iterable, Iterator, List, Tuple
+
+try:
+    from cryptography.exceptions import InvalidTag
+    from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+except ImportError:
+    AESGCM = None
+    InvalidTag = None
+
+# Envelope encryption for data at rest (AES-256-GCM).
+#
+# A master key (the key-encryption key, from configuration) never touches
+# records directly. Each user gets a random data key; records are sealed
+# with it and carry it wrapped by the master key, so every blob is self-
+# describing and the master key can live outside the database. Unwrapped
+# data keys (and their ready-made AESGCM contexts) are cached, so sealing
+# a record costs one AES-GCM call rather than a key unwrap plus setup.
+#
+# Sealed record:  version | wrapped data key | nonce | ciphertext+tag
+# Stream header:  version | wrapped data key | nonce prefix, then frames of
+#                 length | last | ciphertext+tag, each nonce = prefix | counter | last
+
+KEY_BYTES = 32
+NONCE_BYTES = 12
+WRAPPED_KEY_BYTES = NONCE_BYTES + KEY_BYTES + 16
+RECORD_VERSION = 1
+STREAM_VERSION = 2
+STREAM_PREFIX_BYTES = 7
+STREAM_CHUNK_BYTES = 64 * 1024
+
+class DecryptionError(ValueError):
+    """Raised for a blob that was tampered with, sealed for another user or under another master key."""
+
+class EnvelopeCipher:
+    def __init__(self, master_key: bytes, cache_size: int = 4096):
+        if AESGCM is None:
+            raise RuntimeError("Encryption needs the cryptography package (pip install cryptography)")
+        if len(master_key) != KEY_BYTES:
+            raise ValueError(f"Master key must be {KEY_BYTES} bytes")
+        self._master = AESGCM(master_key)
+        self.cache_size = cache_size
+        # user_id -> (wrapped data key, AESGCM context), least recently used first
+        self._keys = OrderedDict()
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def generate_master_key() -> str:
+        """A new random master key, base64 encoded for configuration."""
+        return base64.b64encode(os.urandom(KEY_BYTES)).decode()
+    
+    @classmethod
+    def from_base64(cls, master_key: str, cache_size: int = 4096) -> 'EnvelopeCipher':
+        return cls(base64.b64decode(master_key), cache_size)
+    
+    def _cache(self, user_id: str, wrapped: bytes, aead) -> None:
+        self._keys[user_id] = (wrapped, aead)
+        self._keys.move_to_end(user_id)
+        if len(self._keys) > self.cache_size:
+            self._keys.popitem(last=False)
+    
+    def _data_key(self, user_id: str) -> Tuple[bytes, "AESGCM"]:
+        """The user's current data key, creating one on first use."""
+        with self._lock:
+            entry = self._keys.get(user_id)
+            if entry is not None:
+                self._keys.move_to_end(user_id)
+                return entry
+            key = AESGCM.generate_key(bit_length=KEY_BYTES * 8)
+            nonce = os.urandom(NONCE_BYTES)
+            wrapped = nonce + self._master.encrypt(nonce, key, user_id.encode())
+            entry = (wrapped, AESGCM(key))
+            self._cache(user_id, *entry)
+            return entry
+    
+    def _unwrap(self, user_id: str, wrapped: bytes) -> "AESGCM":
+        with self._lock:
+            entry = self._keys.get(user_id)
+            if entry is not None and entry[0] == wrapped:
+                self._keys.move_to_end(user_id)
+                return entry[1]
+        try:
+            key = self._master.decrypt(wrapped[:NONCE_BYTES], wrapped[NONCE_BYTES:], user_id.encode())
+        except InvalidTag:
+            raise DecryptionError("Data key does not belong to this user or master key") from None
+        aead = AESGCM(key)
+        # Later writes for this user reuse the key they already have on disk
+        with self._lock:
+            self._cache(user_id, wrapped, aead)
+        return aead
+    
+    def seal(self, user_id: str, data: bytes) -> bytes:
+        return self.seal_many(user_id, [data])[0]
+    
+    def seal_many(self, user_id: str, items: Iterable[bytes]) -> List[bytes]:
+        """Encrypt several values for one user with a single key lookup and cipher context."""
+        wrapped, aead = self._data_key(user_id)
+        header = bytes([RECORD_VERSION]) + wrapped
+        aad = user_id.encode()
+        sealed = []
+        for data in items:
+            nonce = os.urandom(NONCE_BYTES)
+            sealed.append(header + nonce + aead.encrypt(nonce, data, aad))
+        return sealed
+    
+    def open(self, user_id: str, blob: bytes) -> bytes:
+        return self.open_many(user_id, [blob])[0]
+    
+    def open_many(self, user_id: str, blobs: Iterable[bytes]) -> List[bytes]:
+        aad = user_id.encode()
+        header_end = 1 + WRAPPED_KEY_BYTES
+        aead = None
+        wrapped = None
+        opened = []
+        for blob in blobs:
+            if blob[0] != RECORD_VERSION:
+                raise DecryptionError(f"Unknown record version {blob[0]}")
+            if blob[1:header_end] != wrapped:
+                wrapped = blob[1:header_end]
+                aead = self._unwrap(user_id, wrapped)
+            try:
+                opened.append(aead.decrypt(blob[header_end:header_end + NONCE_BYTES], blob[header_end + NONCE_BYTES:], aad))
+            except InvalidTag:
+                raise DecryptionError("Record failed authentication") from None
+        return opened
+    
+    def seal_stream(self, user_id: str, chunks: Iterable[bytes], chunk_size: int = STREAM_CHUNK_BYTES) -> Iterator[bytes]:
+        """Encrypt an arbitrarily long byte stream in fixed-size frames.
+        
+        Memory use is bounded by chunk_size. Frames are numbered and the
+        final one is marked, so reordering, dropping or truncating frames
+        fails authentication when the stream is opened.
+        """
+        wrapped, aead = self._data_key(user_id)
+        prefix = os.urandom(STREAM_PREFIX_BYTES)
+        aad = user_id.encode()
+        yield bytes([STREAM_VERSION]) + wrapped + prefix
+        
+        counter = 0
+        buffer = bytearray()
+        for chunk in chunks:
+            buffer += chunk
+            # Strictly more than a frame's worth: the last frame is only known at the end
+            while len(buffer) > chunk_size:
+                yield self._frame(aead, prefix, counter, False, bytes(buffer[:chunk_size]), aad)
+                del buffer[:chunk_size]
+                counter += 1
+        yield self._frame(aead, prefix, counter, True, bytes(buffer), aad)
+    
+    @staticmethod
+    def _frame(aead, prefix: bytes, counter: int, last: bool, data: bytes, aad: bytes) -> bytes:
+        ciphertext = aead.encrypt(prefix + struct.pack(">IB", counter, last), data, aad)
+        return struct.pack(">IB", len(ciphertext), last) + ciphertext
+    
+    def open_stream(self, user_id: str, data: Iterable[bytes]) -> Iterator[bytes]:
+        """Decrypt a seal_stream() stream, yielding plaintext frame by frame."""
+        header_size = 1 + WRAPPED_KEY_BYTES + STREAM_PREFIX_BYTES
+        aad = user_id.encode()
+        buffer = bytearray()
+        aead = None
+        prefix = None
+        counter = 0
+        finished = False
+        for chunk in data:
+            buffer += chunk
+            if aead is None:
+                if len(buffer) < header_size:
+                    continue
+                if buffer[0] != STREAM_VERSION:
+                    raise DecryptionError(f"Unknown stream version {buffer[0]}")
+                aead = self._unwrap(user_id, bytes(buffer[1:1 + WRAPPED_KEY_BYTES]))
+                prefix = bytes(buffer[1 + WRAPPED_KEY_BYTES:header_size])
+                del buffer[:header_size]
+            while len(buffer) >= 5:
+                size, last = struct.unpack_from(">IB", buffer)
+                if len(buffer) < 5 + size:
+                    break
+                if finished:
+                    raise DecryptionError("Data after the final frame")
+                frame = bytes(buffer[5:5 + size])
+                del buffer[:5 + size]
+                try:
+                    # The last flag is part of the nonce, so flipping it fails too
+                    plaintext = aead.decrypt(prefix + struct.pack(">IB", counter, last), frame, aad)
+                except InvalidTag:
+                    raise DecryptionError(f"Frame {counter} failed authentication") from None
+                finished = bool(last)
+                counter += 1
+                yield plaintext
+        if not finished or buffer:
+            raise DecryptionError("Stream is truncated")
+    
+    def forget(self, user_id: str) -> None:
+        """Drop a user's cached data key (e.g. when the account is deleted)."""
+        with self._lock:
+            self._keys.pop(user_id, None)
@@ -1,30 +1,138 @@
-from typing import Optional
+import itertools
+import threading
+import weakref
+from typing import Callable, Optional
 from .store import DataStore
 from .nlp import NLPEngine
-from .models import User, ChatMessage
+from .models import User, ChatMessage, Appointment, Medication
+from .sessions import SessionStore
+from .response_cache import ResponseCache, normalize_message
+from .flows import DialogFlows
+from .indexes import DuplicateValueError
+from .vitals import DAY, METRICS
+from .scheduling import SlotTakenError
+from .reminders import ReminderScheduler
+from .security import SecurityManager, AuthBusyError
 import datetime
-import uuid
+import time
+
+# Intents whose replies depend on the signed-up user's own records
+PERSONAL_INTENTS = ("medication", "health_data")
+METRIC_NAMES = {"blood_pressure": "blood pressure", "weight": "weight", "glucose": "glucose", "heart_rate": "heart rate"}
+METRIC_EXAMPLES = {"blood_pressure": "120/80", "weight": "70 kg", "glucose": "100", "heart_rate": "72"}
+# Flow actions that wait on the password hashing pool rather than only on CPU
+POOL_ACTIONS = ("set_password",)
+
+class AppointmentTimeError(ValueError):
+    # field names the part of the request to ask for again: "date" or "time"
+    def __init__(self, field: str, message: str):
+        super().__init__(message)
+        self.field = field
 
 class DialogManager:
-    def __init__(self, data_store: DataStore, nlp_engine: NLPEngine):
+    def __init__(self, data_store: DataStore, nlp_engine: NLPEngine, session_data: Optional[SessionStore] = None,
+                 response_cache: Optional[ResponseCache] = None, reminders: Optional[ReminderScheduler] = None,
+                 security_manager: Optional[SecurityManager] = None, clock: Callable[[], float] = time.time):
         self.data_store = data_store
         self.nlp_engine = nlp_engine
-        self.session_data = {}
+        # Per-user conversation state, expired after inactivity
+        self.session_data = session_data if session_data is not None else SessionStore()
+        # One lock per user so concurrent turns of a conversation run one at a time
+        self._session_locks = weakref.WeakValueDictionary()
+        self._session_locks_guard = threading.Lock()
+        # Replies that depend only on the message text; knowledge-base edits invalidate them
+        self.response_cache = response_cache if response_cache is not None else ResponseCache()
+        data_store.subscribe_knowledge_base(lambda change, name, data: self.response_cache.clear())
+        # Medication reminders; sent only once something calls reminders.start() or run_due()
+        self.reminders = reminders if reminders is not None else ReminderScheduler()
+        # Hashes the password chosen during onboarding (its process pool starts on first use)
+        self.security_manager = security_manager if security_manager is not None else SecurityManager()
+        # "Now" for appointment requests, which must be in the future
+        self.clock = clock
+        # Multi-turn flows (onboarding, appointment booking, medication entry) from the state table
+        self.flows = DialogFlows(nlp_engine, {
+            "set_password": self._set_password,
+            "create_user": self._create_user,
+            "check_appointment": self._check_appointment,
+            "book_appointment": self._book_appointment,
+            "add_medication": self._add_medication
+        })
+    
+    def session_lock(self, user_id: str) -> threading.Lock:
+        with self._session_locks_guard:
+            lock = self._session_locks.get(user_id)
+            if lock is None:
+                lock = self._session_locks[user_id] = threading.Lock()
+            return lock
+    
+    def waits_on_pool(self, user_id: str) -> bool:
+        """True if this user's next turn may block on the hashing pool (the onboarding password step)."""
+        session = self.session_data.get(user_id)
+        if session is None or not self.flows.handles(session["conversation_state"]):
+            return False
+        return self.flows.states[session["conversation_state"]].action in POOL_ACTIONS
     
     def process_message(self, user_id: str, message: str) -> str:
-        if user_id not in self.session_data:
-            self.session_data[user_id] = {
-                "context": {},
-                "last_intent": None,
-                "conversation_state": "greeting"
-            }
+        with self.session_lock(user_id):
+            session = self.session_data.get(user_id)
+            if session is None:
+                session = {
+                    "context": {},
+                    "last_intent": None,
+                    "conversation_state": "greeting"
+                }
+            
+            response = self._process_turn(user_id, message, session)
+            # Write back so shared session backends see the new state
+            self.session_data.set(user_id, session)
+            return response
+    
+    def _process_turn(self, user_id: str, message: str, session: dict) -> str:
+        state = session["conversation_state"]
         
-        session = self.session_data[user_id]
-        user = self.data_store.get_user(user_id)
+        # Inside a flow the state decides what the message means: one dict
+        # lookup, and NLP only if the state asks for it
+        if self.flows.handles(state):
+            self.response_cache.record_bypass()
+            response = self.flows.step(user_id, message, session)
+            if response is not None:
+                return response
+            state = session["conversation_state"]
+            cached = None
+        else:
+            cached = self.response_cache.get(normalize_message(message))
         
-        intent, confidence = self.nlp_engine.detect_intent(message)
-        entities = self.nlp_engine.extract_entities(message, intent)
+        user = None
+        if cached is not None:
+            intent, entities, response, next_state = cached
+            if intent in PERSONAL_INTENTS:
+                user = self.data_store.get_user(user_id)
+                if user:
+                    self.response_cache.record_miss()
+                    cached = None
+        if cached is not None:
+            if next_state != state:
+                # The turn enters a flow: replay the reply logic (no NLP) so the flow starts cleanly
+                return self._respond(user_id, user, message, session, intent, entities)
+            session["last_intent"] = intent
+            session["context"].update(entities)
+            return response
         
+        text = normalize_message(message)
+        if user is None:
+            user = self.data_store.get_user(user_id)
+        intent, confidence = self.nlp_engine.detect_intent(text)
+        entities = self.nlp_engine.extract_entities(text, intent)
+        response = self._respond(user_id, user, message, session, intent, entities)
+        
+        # Greetings are personalized or start onboarding, and medication and
+        # health data replies are personal for signed-up users
+        personalized = intent == "greeting" or (intent in PERSONAL_INTENTS and user)
+        if not personalized:
+            self.response_cache.put(text, intent, entities, response, session["conversation_state"])
+        return response
+    
+    def _respond(self, user_id: str, user: Optional[User], message: str, session: dict, intent: str, entities: dict) -> str:
         session["last_intent"] = intent
         session["context"].update(entities)
         
@@ -32,61 +140,202 @@ class DialogManager:
             if user:
                 return f"Hello {user.name}! How can I help you with your healthcare needs today?"
             else:
-                session["conversation_state"] = "onboarding_name"
-                return "Welcome to Healthcare Assistant! I'd like to get to know you. What's your name?"
+                return self.flows.enter("onboarding_name", user_id, session, {})
         
         elif intent == "emergency":
             return "⚠️ This sounds like a medical emergency. Please call emergency services (911) immediately or go to the nearest emergency room. ⚠️"
         
         elif intent == "appointment":
-            if "date" in entities and "time" in entities:
-                return f"I've noted your request for an appointment on {entities['date']} at {entities['time']}. Would you like me to schedule this for you?"
-            else:
-                return "I'd be happy to help you schedule an appointment. What day and time works best for you?"
+            return self.flows.enter("appointment_when", user_id, session, entities)
         
         elif intent == "medication":
             if user and user.medications:
                 meds = ", ".join([med["name"] for med in user.medications])
                 return f"I see you're currently taking: {meds}. Would you like information about these medications or help setting up reminders?"
-            else:
-                return "I can help you manage your medications. Would you like to add a new medication or set up reminders?"
+            elif user:
+                self.flows.enter("medication_offer", user_id, session, {})
+            return "I can help you manage your medications. Would you like to add a new medication or set up reminders?"
         
         elif intent == "symptom":
             if "symptoms" in entities and entities["symptoms"]:
                 symptoms = ", ".join(entities["symptoms"])
-                for condition, data in self.data_store.knowledge_base["common_conditions"].items():
-                    matching_symptoms = set(entities["symptoms"]).intersection(set(data["symptoms"]))
-                    if matching_symptoms and len(matching_symptoms) >= 2:
-                        advice = data["self_care"]
-                        return f"Based on your symptoms ({symptoms}), you may have a {condition}. {advice}\n\nWould you like to schedule an appointment with a doctor?"
+                ranked = self.data_store.symptom_index.rank(entities["symptoms"], top_k=1, min_matches=2)
+                if ranked:
+                    condition = ranked[0][0]
+                    advice = self.data_store.knowledge_base["common_conditions"][condition]["self_care"]
+                    return f"Based on your symptoms ({symptoms}), you may have a {condition}. {advice}\n\nWould you like to schedule an appointment with a doctor?"
                 return f"I notice you mentioned these symptoms: {symptoms}. These symptoms could be related to several conditions. Would you like to schedule an appointment to discuss these with a healthcare provider?"
             else:
                 return "I'm sorry to hear you're not feeling well. Can you tell me more about your symptoms?"
         
         elif intent == "health_data":
+            metric = entities.get("metric")
+            if metric and user:
+                if "reading" in entities:
+                    self.data_store.vitals.record(user.user_id, metric, entities["reading"])
+                    return f"Recorded your {METRIC_NAMES[metric]}: {_format_reading(metric, entities['reading'])}."
+                return self._vitals_summary(user.user_id, metric, entities.get("period_days", 30))
+            elif metric:
+                return "I need an account to keep track of your health data. Say hello to get started!"
             return "I can help you track your health data. What type of data would you like to record or view (blood pressure, weight, glucose levels, etc.)?"
         
-        if session["conversation_state"] == "onboarding_name" and intent != "greeting":
-            session["context"]["name"] = message
-            session["conversation_state"] = "onboarding_email"
-            return f"Nice to meet you, {message}! What's your email address so I can create an account for you?"
-        
-        elif session["conversation_state"] == "onboarding_email":
-            session["context"]["email"] = message
-            session["conversation_state"] = "onboarding_dob"
-            return "Thank you! For your health records, I need your date of birth (MM/DD/YYYY):"
-        
-        elif session["conversation_state"] == "onboarding_dob":
-            session["context"]["dob"] = message
-            session["conversation_state"] = "normal"
-            new_user_id = str(uuid.uuid4())
-            new_user = User(
-                new_user_id, 
-                session["context"]["name"],
-                session["context"]["email"],
-                session["context"]["dob"]
-            )
+        return "I'm here to help with your healthcare needs. You can ask me about appointments, medications, symptoms, or health tracking."
+    
+    def _vitals_summary(self, user_id: str, metric: str, days: int) -> str:
+        period = "today" if days == 1 else f"over the last {days} days"
+        summary = self.data_store.vitals.summary(user_id, metric, time.time() - days * DAY)
+        if not summary["count"]:
+            return f"I don't have any {METRIC_NAMES[metric]} readings for you {period}. You can tell me one, like \"my {METRIC_NAMES[metric]} is {METRIC_EXAMPLES[metric]}\"."
+        fields = summary["fields"]
+        average = _format_reading(metric, [fields[name]["mean"] for name in METRICS[metric][0]])
+        low = _format_reading(metric, [fields[name]["min"] for name in METRICS[metric][0]])
+        high = _format_reading(metric, [fields[name]["max"] for name in METRICS[metric][0]])
+        readings = "1 reading" if summary["count"] == 1 else f"{summary['count']} readings"
+        return f"Your {METRIC_NAMES[metric]} {period}: average {average} from {readings} (lowest {low}, highest {high})."
+    
+    def _set_password(self, user_id: str, session: dict) -> Optional[str]:
+        context = session["context"]
+        # Keep only the hash: the session (and its backend) never holds the password itself
+        password = context.pop("password")
+        try:
+            context["password_hash"] = self.security_manager.hash_password(password)
+        except AuthBusyError:
+            session["conversation_state"] = "onboarding_password"
+            return "Sorry, I couldn't save your password just now. Please enter it again:"
+        return None
+    
+    def _create_user(self, user_id: str, session: dict) -> Optional[str]:
+        # The account takes the conversation's own id, so the session that
+        # onboarded it (and its token) is signed in to it from the next turn
+        context = session["context"]
+        new_user = User(
+            user_id,
+            context["name"],
+            context["email"],
+            context["dob"],
+            context.get("password_hash")
+        )
+        try:
             self.data_store.create_user(new_user)
-            return f"Thank you! Your healthcare account has been created. How can I help you today?"
-        
-        return "I'm here to help with your healthcare needs. You can ask me about appointments, medications, symptoms, or health tracking."
\ No newline at end of file
+        except DuplicateValueError:
+            session["conversation_state"] = "onboarding_email"
+            return f"An account with {context['email']} already exists. Please enter a different email address:"
+        context.pop("password_hash", None)
+        return None
+    
+    def _check_appointment(self, user_id: str, session: dict) -> Optional[str]:
+        # Pick the doctor and check the requested slot before asking to confirm
+        scheduler = self.data_store.scheduler
+        context = session["context"]
+        try:
+            date_time = _appointment_datetime(context["date"], context["time"], self._now())
+        except AppointmentTimeError as error:
+            return self._reask_appointment(session, error)
+        if context.get("doctor"):
+            calendar = scheduler.calendar(context["doctor"])
+            if calendar is None:
+                session["conversation_state"] = "normal"
+                doctors = ", ".join(doctor.name for doctor in itertools.islice(scheduler.calendars.values(), 6))
+                return f"I couldn't find Dr. {context['doctor'].title()} in our directory. You can book with {doctors}."
+            next_free = calendar.next_free(date_time)
+        else:
+            # Whoever is free soonest, from the scheduler's cross-doctor slot index
+            calendar, next_free = scheduler.earliest_available(date_time)
+        context["doctor_name"] = calendar.name
+        if next_free != date_time:
+            return self._offer_slot(session, date_time, next_free)
+        return None
+    
+    def _now(self) -> datetime.datetime:
+        return datetime.datetime.fromtimestamp(self.clock())
+    
+    def _reask_appointment(self, session: dict, error: AppointmentTimeError) -> str:
+        # Back to the booking question for the part that can't be booked; the other part is kept
+        session["context"].pop(error.field, None)
+        session["conversation_state"] = "appointment_when"
+        return f"{error} What {'day' if error.field == 'date' else 'time'} would work instead?"
+    
+    def _offer_slot(self, session: dict, requested: datetime.datetime, next_free: datetime.datetime) -> str:
+        context = session["context"]
+        context["date"], context["time"] = _format_date(next_free), _format_time(next_free)
+        session["conversation_state"] = "appointment_confirm"
+        return (f"{context['doctor_name']} isn't available on {_format_date(requested)} at {_format_time(requested)}. "
+                f"The nearest free slot is {context['date']} at {context['time']}. Would you like me to book that instead?")
+    
+    def _book_appointment(self, user_id: str, session: dict) -> Optional[str]:
+        user = self.data_store.get_user(user_id)
+        if not user:
+            return "I need an account to book appointments for you. Say hello to get started!"
+        context = session["context"]
+        try:
+            # The offered slot may have passed while it waited for a yes
+            date_time = _appointment_datetime(context["date"], context["time"], self._now())
+        except AppointmentTimeError as error:
+            return self._reask_appointment(session, error)
+        calendar = self.data_store.scheduler.calendar(context["doctor_name"])
+        appointment = Appointment(calendar.name, date_time, "Requested via chat")
+        try:
+            calendar.book(appointment.appointment_id, date_time, user.user_id)
+        except SlotTakenError as error:
+            # Someone else took the slot since it was offered
+            return self._offer_slot(session, date_time, error.next_free)
+        user.appointments.append(appointment.to_dict())
+        self.data_store.update_user(user)
+        return None
+    
+    def _add_medication(self, user_id: str, session: dict) -> Optional[str]:
+        user = self.data_store.get_user(user_id)
+        if not user:
+            return "I need an account to keep track of your medications. Say hello to get started!"
+        context = session["context"]
+        medication = Medication(
+            context["medication_name"],
+            context["medication_dosage"],
+            context["medication_frequency"],
+            datetime.date.today()
+        )
+        user.medications.append(medication.to_dict())
+        self.data_store.update_user(user)
+        reminder = self.reminders.schedule(user_id, medication.to_dict())
+        if reminder is None:
+            context["medication_reminder"] = "I couldn't work out a schedule from that, so I won't send reminders for it."
+        else:
+            context["medication_reminder"] = (f"I'll remind you {reminder.schedule.describe()}, starting "
+                                              f"{_format_date(datetime.datetime.fromtimestamp(reminder.next_due))} "
+                                              f"at {_format_time(datetime.datetime.fromtimestamp(reminder.next_due))}.")
+        return None
+
+def _appointment_datetime(date: str, time: str, now: datetime.datetime) -> datetime.datetime:
+    # Entities look like "march 5" and "3:00 pm"; pick the next such date from
+    # today. Dates and times that don't exist ("february 30", "13:00 pm") and
+    # times already past raise AppointmentTimeError naming the part to ask again
+    try:
+        clock_time = datetime.datetime.strptime(time, "%I:%M %p").time()
+    except ValueError:
+        raise AppointmentTimeError("time", f"{time} isn't a valid time.") from None
+    for year in (now.year, now.year + 1):
+        try:
+            day = datetime.datetime.strptime(f"{date} {year}", "%B %d %Y").date()
+        except ValueError:
+            # February 29 outside a leap year, or a day the month doesn't have
+            continue
+        if day >= now.date():
+            break
+    else:
+        raise AppointmentTimeError("date", f"I couldn't find {date.title()} on the calendar.")
+    parsed = datetime.datetime.combine(day, clock_time)
+    if parsed <= now:
+        raise AppointmentTimeError("time", f"{_format_time(parsed)} today has already passed.")
+    return parsed
+
+def _format_date(date_time: datetime.datetime) -> str:
+    return f"{date_time:%B} {date_time.day}"
+
+def _format_time(date_time: datetime.datetime) -> str:
+    return f"{date_time.hour % 12 or 12}:{date_time.minute:02d} {'am' if date_time.hour < 12 else 'pm'}"
+
+def _format_reading(metric: str, values) -> str:
+    unit = METRICS[metric][1]
+    if metric == "blood_pressure":
+        return f"{values[0]:.0f}/{values[1]:.0f} {unit}"
+    return f"{values[0]:.1f} {unit}" if metric == "weight" else f"{values[0]:.0f} {unit}"
@@ -0,0 +1,218 @@
+from typing import Callable, Dict, List, Optional
+
+# Multi-turn dialog flows, as data.
+#
+# Each state names what a reply in that state means:
+#   capture  - store the raw message in this context key (no NLP unless
+#              needs_nlp is set, only an emergency-term scan)
+#   extract  - run this intent's entity extractor and require these keys
+#              (optional ones are taken if present)
+#   confirm  - a yes/no answer choosing between two branches
+# plus where to go next, the reply to send (formatted with the session
+# context) and an optional action run on the transition. "prompt" is what
+# the bot says when a flow enters the state from outside. Anything a state
+# can't use (an unrecognised answer, missing entities, an emergency term)
+# leaves the flow and is handled as an ordinary turn.
+
+DIALOG_STATES = {
+    # Onboarding, entered by a greeting from an unknown user
+    "onboarding_name": {
+        "capture": "name",
+        "prompt": "Welcome to Healthcare Assistant! I'd like to get to know you. What's your name?",
+        "next": "onboarding_email",
+        "reply": "Nice to meet you, {name}! What's your email address so I can create an account for you?"
+    },
+    "onboarding_email": {
+        "capture": "email",
+        "next": "onboarding_password",
+        "reply": "Thanks! Please choose a password so you can sign in to your account later:"
+    },
+    # Hashed as soon as it arrives (the action drops the plain text), and
+    # asked before the account exists so it never reaches the chat history
+    "onboarding_password": {
+        "capture": "password",
+        "action": "set_password",
+        "next": "onboarding_dob",
+        "reply": "Thank you! For your health records, I need your date of birth (MM/DD/YYYY):"
+    },
+    "onboarding_dob": {
+        "capture": "dob",
+        "action": "create_user",
+        "next": "normal",
+        "reply": "Thank you, {name}! Your healthcare account has been created; you can sign in with {email} and your password. How can I help you today?"
+    },
+    
+    # Appointment booking, entered by the appointment intent
+    "appointment_when": {
+        "extract": "appointment",
+        "required": ["date", "time"],
+        "optional": ["doctor"],
+        "action": "check_appointment",
+        "next": "appointment_confirm",
+        "prompt": "I'd be happy to help you schedule an appointment. What day and time works best for you?",
+        "reply": "{doctor_name} is available on {date} at {time}. Would you like me to book this appointment for you?"
+    },
+    "appointment_confirm": {
+        "confirm": {
+            "yes": {
+                "action": "book_appointment",
+                "next": "normal",
+                "reply": "Your appointment with {doctor_name} on {date} at {time} is booked. Is there anything else I can help you with?"
+            },
+            "no": {
+                "next": "normal",
+                "reply": "No problem, I haven't booked anything. Is there anything else I can help you with?"
+            }
+        }
+    },
+    
+    # Medication entry, entered by the medication intent for a signed-up user
+    "medication_offer": {
+        "confirm": {
+            "yes": {
+                "next": "medication_name",
+                "reply": "What's the name of the medication?"
+            },
+            "no": {
+                "next": "normal",
+                "reply": "Okay. Let me know if you need anything else with your medications."
+            }
+        }
+    },
+    "medication_name": {
+        "capture": "medication_name",
+        "next": "medication_dosage",
+        "reply": "What dosage of {medication_name} do you take (e.g. 10 mg)?"
+    },
+    "medication_dosage": {
+        "capture": "medication_dosage",
+        "next": "medication_frequency",
+        "reply": "How often do you take it (e.g. twice daily)?"
+    },
+    "medication_frequency": {
+        "capture": "medication_frequency",
+        "action": "add_medication",
+        "next": "normal",
+        "reply": "I've added {medication_name} ({medication_dosage}, {medication_frequency}) to your medications. {medication_reminder}"
+    }
+}
+
+YES_WORDS = frozenset(["yes", "y", "yeah", "yep", "sure", "ok", "okay", "please", "add", "book", "schedule", "confirm"])
+NO_WORDS = frozenset(["no", "n", "nope", "nah", "cancel", "later", "don't", "not"])
+
+# Action: (user_id, session) -> optional reply overriding the state's reply
+Action = Callable[[str, Dict], Optional[str]]
+
+class DialogState:
+    __slots__ = ("name", "capture", "extract", "required", "optional", "confirm", "next", "reply", "prompt", "action", "needs_nlp")
+    
+    def __init__(self, name: str, capture: Optional[str] = None, extract: Optional[str] = None,
+                 required: Optional[List[str]] = None, optional: Optional[List[str]] = None,
+                 confirm: Optional[Dict[str, Dict]] = None,
+                 next: str = "normal", reply: str = "", prompt: str = "", action: Optional[str] = None,
+                 needs_nlp: Optional[bool] = None):
+        self.name = name
+        self.capture = capture
+        self.extract = extract
+        self.required = required or []
+        self.optional = optional or []
+        self.confirm = confirm
+        self.next = next
+        self.reply = reply
+        self.prompt = prompt
+        self.action = action
+        # Entity-extracting states need NLP; a capture state can opt in to
+        # leaving the flow whenever the message matches an intent
+        self.needs_nlp = extract is not None if needs_nlp is None else needs_nlp
+
+class DialogFlows:
+    """Runs the dialog state table: one dict lookup per stateful turn."""
+    
+    def __init__(self, nlp_engine, actions: Dict[str, Action], states: Dict[str, Dict] = None):
+        self.nlp_engine = nlp_engine
+        self.actions = actions
+        self.states = {
+            name: DialogState(name, **spec) for name, spec in (states or DIALOG_STATES).items()
+        }
+        for state in self.states.values():
+            for branch in self._branches(state):
+                if branch.get("action") and branch["action"] not in actions:
+                    raise ValueError(f"State {state.name} uses unknown action {branch['action']}")
+                if branch["next"] != "normal" and branch["next"] not in self.states:
+                    raise ValueError(f"State {state.name} leads to unknown state {branch['next']}")
+        
+        # The context keys each state's flow fills, cleared when the flow is entered
+        self.slots = {name: self._flow_slots(name) for name in self.states}
+    
+    def _flow_slots(self, name: str) -> List[str]:
+        slots = []
+        pending = [name]
+        seen = set()
+        while pending:
+            state = self.states.get(pending.pop())
+            if state is None or state.name in seen:
+                continue
+            seen.add(state.name)
+            slots.extend([state.capture] if state.capture else state.required + state.optional)
+            pending.extend(branch["next"] for branch in self._branches(state))
+        return slots
+    
+    @staticmethod
+    def _branches(state: DialogState) -> List[Dict]:
+        if state.confirm:
+            return list(state.confirm.values())
+        return [{"action": state.action, "next": state.next}]
+    
+    def handles(self, state_name: str) -> bool:
+        return state_name in self.states
+    
+    def _transition(self, user_id: str, session: Dict, action: Optional[str], next_state: str, reply: str) -> str:
+        session["conversation_state"] = next_state
+        override = self.actions[action](user_id, session) if action else None
+        return override if override is not None else reply.format(**session["context"])
+    
+    def enter(self, state_name: str, user_id: str, session: Dict, entities: Dict) -> str:
+        """Start a flow at state_name with this turn's entities; returns the reply."""
+        state = self.states[state_name]
+        context = session["context"]
+        for slot in self.slots[state_name]:
+            context.pop(slot, None)
+        context.update(entities)
+        
+        # An extract state whose entities came with the triggering message is already satisfied
+        if state.extract and all(key in context for key in state.required):
+            return self._transition(user_id, session, state.action, state.next, state.reply)
+        session["conversation_state"] = state_name
+        return state.prompt.format(**context)
+    
+    def step(self, user_id: str, message: str, session: Dict) -> Optional[str]:
+        """Handle a reply in a flow state, or return None to leave the flow and treat it as a normal turn."""
+        state = self.states[session["conversation_state"]]
+        context = session["context"]
+        
+        if state.capture:
+            if state.needs_nlp:
+                interrupted = self.nlp_engine.detect_intent(message)[0] != "unknown"
+            else:
+                interrupted = self.nlp_engine.mentions_emergency(message)
+            if interrupted:
+                session["conversation_state"] = "normal"
+                return None
+            context[state.capture] = message
+            return self._transition(user_id, session, state.action, state.next, state.reply)
+        
+        if state.extract:
+            entities = self.nlp_engine.extract_entities(message, state.extract)
+            if not all(key in entities or key in context for key in state.required):
+                session["conversation_state"] = "normal"
+                return None
+            context.update(entities)
+            return self._transition(user_id, session, state.action, state.next, state.reply)
+        
+        words = message.lower().replace(",", " ").replace(".", " ").replace("!", " ").split()
+        answer = "yes" if words and words[0] in YES_WORDS else "no" if words and words[0] in NO_WORDS else None
+        if answer is None:
+            session["conversation_state"] = "normal"
+            return None
+        branch = state.confirm[answer]
+        return self._transition(user_id, session, branch.get("action"), branch["next"], branch["reply"])
@@ -0,0 +1,225 @@
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+_WORD = re.compile(r"[a-z]+(?:'[a-z]+)?")
+
+# Correctly spelled everyday words that sit one or two edits from a symptom
+# word ("never" -> "fever", "some" -> "sore", "that" -> "throat"). They are
+# only ever matched exactly, never read as typos
+COMMON_WORDS = frozenset("""
+    about after again also always another any anything back because been before being best both bring
+    came chose close come core could cover does done dose down during each either else even ever every
+    fear feel feet felt first five four from gave give goes gone good great had has have having hear
+    here home hose into just keep kind know last later less lever like little live liver long look loose
+    lose made make many might more most much must near need never next nice none noon nothing often once
+    only other over pose rather really rest river rose rough same says score seven sever shall shore
+    should since some something sometimes soon still store such sure take than that their them then
+    there these they thing think this those though thought threat three through tough treat very want
+    were what when where which while will with would your
+""".split())
+
+def edit_distance(a: str, b: str, limit: Optional[int] = None) -> int:
+    """Levenshtein distance, counting an adjacent transposition as one edit.
+    
+    With a limit, gives up as soon as the distance must exceed it and
+    returns limit + 1.
+    """
+    if limit is not None and abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous_row = None
+    row = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        before, previous_row, row = previous_row, row, [i] + [0] * len(b)
+        char = a[i - 1]
+        for j in range(1, len(b) + 1):
+            cost = 0 if char == b[j - 1] else 1
+            value = min(previous_row[j] + 1, row[j - 1] + 1, previous_row[j - 1] + cost)
+            if i > 1 and j > 1 and char == b[j - 2] and a[i - 2] == b[j - 1]:
+                value = min(value, before[j - 2] + 1)
+            row[j] = value
+        if limit is not None and min(row) > limit:
+            return limit + 1
+    return row[-1]
+
+def similarity(a: str, b: str, distance: int) -> float:
+    return 1.0 - distance / max(len(a), len(b), 1)
+
+class FuzzyPhraseIndex:
+    """Typo-tolerant lookup of known phrases (e.g. KB symptoms) in free text.
+    
+    Two levels, both built once from the phrase list:
+    
+    - a character trigram index over the phrases' vocabulary. A message
+      word is looked up by the trigrams it shares with KB words; one edit
+      changes at most three trigrams, so only words sharing enough of them
+      (and of a close enough length) get a bounded edit-distance check.
+      Results are memoized per word, since chat messages reuse words.
+    - the phrases themselves, keyed by their word tuples. A run of message
+      words matches a phrase when each word matched the phrase's word at
+      that position; the phrase score is 1 - (summed word distances) /
+      (longer of the two texts).
+    
+    Typos are therefore recognised within words ("feaver", "sore
+    throught"), not across word boundaries ("sorethroat"). Words in
+    common_words are real words, not typos, and only match exactly. A word
+    of short_length letters or fewer that makes up a phrase on its own
+    ("fevr") must also keep the KB word's first letter: one edit is a
+    large share of a short word, and a longer phrase's other words give
+    context that a lone word doesn't.
+    """
+    
+    def __init__(self, phrases: Iterable[str] = (), min_score: float = 0.75, word_score: float = 0.6,
+                 min_length: int = 4, memo_size: int = 65536, common_words: Iterable[str] = COMMON_WORDS,
+                 short_length: int = 5):
+        self.min_score = min_score
+        self.word_score = word_score
+        self.min_length = min_length
+        self.common_words = frozenset(common_words)
+        self.short_length = short_length
+        self.memo_size = memo_size
+        self.phrases = {}
+        self.vocabulary = {}
+        self.postings = {}
+        self.max_words = 1
+        self._memo = {}
+        for phrase in phrases:
+            self.add(phrase)
+    
+    @staticmethod
+    def _grams(word: str) -> List[str]:
+        padded = f" {word} "
+        return [padded[i:i + 3] for i in range(len(padded) - 2)]
+    
+    def add(self, phrase: str) -> None:
+        # Phrases and words are reference counted: conditions share symptoms like "cough"
+        words = tuple(phrase.lower().split())
+        entry = self.phrases.get(words)
+        self.phrases[words] = (" ".join(words), entry[1] + 1 if entry else 1)
+        if entry:
+            return
+        for word in words:
+            count = self.vocabulary.get(word, 0)
+            self.vocabulary[word] = count + 1
+            if not count:
+                for gram in set(self._grams(word)):
+                    self.postings.setdefault(gram, set()).add(word)
+        self.max_words = max(self.max_words, len(words))
+        self._memo.clear()
+    
+    def remove(self, phrase: str) -> None:
+        words = tuple(phrase.lower().split())
+        entry = self.phrases.get(words)
+        if entry is None:
+            return
+        if entry[1] > 1:
+            self.phrases[words] = (entry[0], entry[1] - 1)
+            return
+        del self.phrases[words]
+        for word in words:
+            count = self.vocabulary[word]
+            if count > 1:
+                self.vocabulary[word] = count - 1
+                continue
+            del self.vocabulary[word]
+            for gram in set(self._grams(word)):
+                words_with_gram = self.postings[gram]
+                words_with_gram.discard(word)
+                if not words_with_gram:
+                    del self.postings[gram]
+        self._memo.clear()
+    
+    def match_word(self, word: str) -> Dict[str, int]:
+        """KB words within the per-word score of this word, with their edit distances."""
+        matches = self._memo.get(word)
+        if matches is not None:
+            return matches
+        matches = {}
+        if word in self.vocabulary:
+            matches[word] = 0
+        if len(word) >= self.min_length and word not in self.common_words:
+            grams = self._grams(word)
+            shared = {}
+            for gram in set(grams):
+                for candidate in self.postings.get(gram, ()):
+                    shared[candidate] = shared.get(candidate, 0) + 1
+            for candidate, count in shared.items():
+                if candidate == word:
+                    continue
+                max_distance = int((1.0 - self.word_score) * max(len(word), len(candidate)) + 1e-9)
+                if abs(len(word) - len(candidate)) > max_distance or count < len(grams) - 3 * max_distance:
+                    continue
+                distance = edit_distance(word, candidate, max_distance)
+                if distance <= max_distance:
+                    matches[candidate] = distance
+        if len(self._memo) >= self.memo_size:
+            self._memo.clear()
+        self._memo[word] = matches
+        return matches
+    
+    def _best_phrase(self, window: List[str], min_score: float) -> Optional[Tuple[str, float]]:
+        # Walk the candidate words position by position, keeping the
+        # partial tuples that are still a prefix of some phrase word-for-word
+        partial = [((), 0)]
+        for word in window:
+            matches = self.match_word(word)
+            if len(window) == 1 and len(word) <= self.short_length:
+                matches = {candidate: distance for candidate, distance in matches.items() if candidate[0] == word[0]}
+            if not matches:
+                return None
+            partial = [(words + (candidate,), distance + extra)
+                       for words, distance in partial for candidate, extra in matches.items()]
+        text_length = sum(len(word) for word in window) + len(window) - 1
+        best = None
+        for words, distance in partial:
+            entry = self.phrases.get(words)
+            if entry is None:
+                continue
+            score = 1.0 - distance / max(text_length, len(entry[0]))
+            if score >= min_score and (best is None or score > best[1] or (score == best[1] and entry[0] < best[0])):
+                best = (entry[0], score)
+        return best
+    
+    def search(self, text: str, min_score: Optional[float] = None) -> Optional[Tuple[str, float]]:
+        """The best matching phrase for a short text, as (phrase, score), or None."""
+        window = _WORD.findall(text.lower())
+        if not window or len(window) > self.max_words:
+            return None
+        return self._best_phrase(window, self.min_score if min_score is None else min_score)
+    
+    def find_all(self, message: str, skip: Iterable[Tuple[int, int]] = (),
+                 min_score: Optional[float] = None) -> List[Tuple[int, int, str, float]]:
+        """Fuzzy phrase mentions in a message as non-overlapping (start, end, phrase, score).
+        
+        Runs of up to max_words words are looked up. Overlapping matches are
+        resolved by score times span length, so "seveer elbow pain" reads as
+        the longer phrase rather than its exact tail "elbow pain". Spans
+        overlapping skip (e.g. exact matches found already) are left alone.
+        """
+        min_score = self.min_score if min_score is None else min_score
+        text = message.lower()
+        spans = [(match.start(), match.end(), match.group()) for match in _WORD.finditer(text)]
+        skip = list(skip)
+        found = []
+        for i in range(len(spans)):
+            window = []
+            for j in range(i, min(i + self.max_words, len(spans))):
+                start, end = spans[i][0], spans[j][1]
+                if any(start < skip_end and skip_start < end for skip_start, skip_end in skip):
+                    break
+                window.append(spans[j][2])
+                # Once a word matches nothing, no longer run starting here can match either
+                if not self.match_word(spans[j][2]):
+                    break
+                best = self._best_phrase(window, min_score)
+                if best is not None:
+                    found.append((best[1], end - start, start, end, best[0]))
+        
+        chosen = []
+        for score, _, start, end, phrase in sorted(found, key=lambda item: (-item[0] * item[1], -item[0], item[2])):
+            if all(end <= other_start or other_end <= start for other_start, other_end, _, _ in chosen):
+                chosen.append((start, end, phrase, score))
+        chosen.sort()
+        return chosen
+    
+    def __len__(self) -> int:
+        return len(self.phrases)
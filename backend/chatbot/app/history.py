@@ -0,0 +1,215 @@
+import threading
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from typing import Iterable, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlparse
+from .models import ChatMessage
+from .backends import SQLitePool
+
+# A page of history: messages oldest first, plus the cursor for the next
+# (older) page or None when the start of the conversation has been reached
+HistoryPage = Tuple[List[ChatMessage], Optional[int]]
+
+class ChatHistoryStore(ABC):
+    """Append-only, per-user chat log, kept apart from the User record.
+    
+    Every message gets a sequence number that increases with insertion
+    order, which doubles as the pagination cursor. Only the newest
+    max_messages per user are retained; older ones are dropped by compact(),
+    which runs automatically every compact_every appends for a user.
+    """
+    
+    def __init__(self, max_messages: Optional[int] = 1000, compact_every: int = 100):
+        self.max_messages = max_messages
+        self.compact_every = compact_every
+        self._appends_since_compaction = {}
+        self._compaction_lock = threading.Lock()
+    
+    def append(self, user_id: str, messages: Iterable[ChatMessage]) -> None:
+        messages = list(messages)
+        if not messages:
+            return
+        self._append(user_id, messages)
+        if self.max_messages is None:
+            return
+        with self._compaction_lock:
+            appended = self._appends_since_compaction.get(user_id, 0) + len(messages)
+            due = appended >= self.compact_every
+            self._appends_since_compaction[user_id] = 0 if due else appended
+        if due:
+            self.compact(user_id)
+    
+    @abstractmethod
+    def _append(self, user_id: str, messages: List[ChatMessage]) -> None:
+        ...
+    
+    @abstractmethod
+    def page(self, user_id: str, limit: int = 50, before: Optional[int] = None) -> HistoryPage:
+        """Return up to limit messages older than the before cursor (newest page by default)."""
+    
+    @abstractmethod
+    def compact(self, user_id: Optional[str] = None) -> int:
+        """Drop messages beyond the retention limit for one user (or everyone); returns the count removed."""
+    
+    @abstractmethod
+    def delete(self, user_id: str) -> None:
+        ...
+    
+    @abstractmethod
+    def count(self, user_id: str) -> int:
+        ...
+    
+    def close(self) -> None:
+        pass
+
+class MemoryChatHistory(ChatHistoryStore):
+    def __init__(self, max_messages: Optional[int] = 1000, compact_every: int = 100):
+        super().__init__(max_messages, compact_every)
+        self._logs = {}
+        self._next_sequence = 1
+        self._lock = threading.Lock()
+    
+    def _append(self, user_id: str, messages: List[ChatMessage]) -> None:
+        with self._lock:
+            sequences, log = self._logs.setdefault(user_id, ([], []))
+            for message in messages:
+                sequences.append(self._next_sequence)
+                log.append(message)
+                self._next_sequence += 1
+    
+    def page(self, user_id: str, limit: int = 50, before: Optional[int] = None) -> HistoryPage:
+        with self._lock:
+            sequences, log = self._logs.get(user_id, ([], []))
+            end = len(sequences) if before is None else bisect_left(sequences, before)
+            start = max(0, end - limit)
+            messages = log[start:end]
+            cursor = sequences[start] if start > 0 else None
+        return messages, cursor
+    
+    def compact(self, user_id: Optional[str] = None) -> int:
+        if self.max_messages is None:
+            return 0
+        removed = 0
+        with self._lock:
+            user_ids = list(self._logs) if user_id is None else [user_id]
+            for uid in user_ids:
+                sequences, log = self._logs.get(uid, ([], []))
+                excess = len(log) - self.max_messages
+                if excess > 0:
+                    del sequences[:excess]
+                    del log[:excess]
+                    removed += excess
+        return removed
+    
+    def delete(self, user_id: str) -> None:
+        with self._lock:
+            self._logs.pop(user_id, None)
+    
+    def count(self, user_id: str) -> int:
+        with self._lock:
+            return len(self._logs.get(user_id, ([], []))[1])
+
+class SQLiteChatHistory(ChatHistoryStore):
+    """Chat log as an insert-only SQLite table indexed by (user_id, seq).
+    
+    A turn costs one small INSERT no matter how long the conversation is,
+    and a page is an index range scan. With a cipher (an EnvelopeCipher)
+    message text is stored encrypted, a batch or page sealed/opened in one
+    call under the user's cached data key.
+    """
+    
+    def __init__(self, path: str, max_messages: Optional[int] = 1000, compact_every: int = 100, pool_size: int = 4,
+                 cipher=None):
+        super().__init__(max_messages, compact_every)
+        self.cipher = cipher
+        self._pool = SQLitePool(path, pool_size)
+        with self._pool.connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS chat_messages ("
+                " seq INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " user_id TEXT NOT NULL,"
+                " message_id TEXT NOT NULL,"
+                " sender TEXT NOT NULL,"
+                " message TEXT NOT NULL,"
+                " created_at INTEGER NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS chat_messages_user ON chat_messages (user_id, seq)")
+    
+    def _append(self, user_id: str, messages: List[ChatMessage]) -> None:
+        texts = [message.message for message in messages]
+        if self.cipher is not None:
+            texts = self.cipher.seal_many(user_id, [text.encode() for text in texts])
+        rows = [
+            (user_id, message.message_id, message.sender, text, message.created_at)
+            for message, text in zip(messages, texts)
+        ]
+        with self._pool.transaction() as conn:
+            conn.executemany(
+                "INSERT INTO chat_messages (user_id, message_id, sender, message, created_at) VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+    
+    def page(self, user_id: str, limit: int = 50, before: Optional[int] = None) -> HistoryPage:
+        # Fetch one extra row to know whether an older page exists
+        with self._pool.connection() as conn:
+            rows = conn.execute(
+                "SELECT seq, message_id, sender, message, created_at FROM chat_messages"
+                " WHERE user_id = ? AND seq < ? ORDER BY seq DESC LIMIT ?",
+                (user_id, before if before is not None else 2 ** 63 - 1, limit + 1)
+            ).fetchall()
+        has_more = len(rows) > limit
+        rows = rows[:limit][::-1]
+        texts = [row[3] for row in rows]
+        if self.cipher is not None:
+            texts = [text.decode() for text in self.cipher.open_many(user_id, texts)]
+        messages = []
+        for (seq, message_id, sender, _, created_at), text in zip(rows, texts):
+            message = ChatMessage(sender, text, created_at)
+            message.message_id = message_id
+            messages.append(message)
+        return messages, (rows[0][0] if has_more else None)
+    
+    def compact(self, user_id: Optional[str] = None) -> int:
+        if self.max_messages is None:
+            return 0
+        with self._pool.connection() as conn:
+            if user_id is None:
+                user_ids = [row[0] for row in conn.execute("SELECT DISTINCT user_id FROM chat_messages")]
+            else:
+                user_ids = [user_id]
+        removed = 0
+        with self._pool.transaction() as conn:
+            for uid in user_ids:
+                removed += conn.execute(
+                    "DELETE FROM chat_messages WHERE user_id = ? AND seq < ("
+                    " SELECT seq FROM chat_messages WHERE user_id = ?"
+                    " ORDER BY seq DESC LIMIT 1 OFFSET ?)",
+                    (uid, uid, self.max_messages - 1)
+                ).rowcount
+        return removed
+    
+    def delete(self, user_id: str) -> None:
+        with self._pool.connection() as conn:
+            conn.execute("DELETE FROM chat_messages WHERE user_id = ?", (user_id,))
+    
+    def count(self, user_id: str) -> int:
+        with self._pool.connection() as conn:
+            return conn.execute("SELECT COUNT(*) FROM chat_messages WHERE user_id = ?", (user_id,)).fetchone()[0]
+    
+    def close(self) -> None:
+        self._pool.close()
+
+def create_history(url: str = "memory://", cipher=None) -> ChatHistoryStore:
+    """Build a chat history store from a URL: memory:// or sqlite:///path/to.db.
+    
+    Both take max_messages and compact_every query options,
+    e.g. sqlite:///chatbot.db?max_messages=500. A cipher encrypts stored
+    messages (SQLite only; the memory store keeps nothing at rest).
+    """
+    parsed = urlparse(url)
+    options = {key: int(value) for key, value in parse_qsl(parsed.query)}
+    if parsed.scheme in ("", "memory"):
+        return MemoryChatHistory(**options)
+    if parsed.scheme == "sqlite":
+        return SQLiteChatHistory(parsed.netloc + parsed.path[1:], cipher=cipher, **options)
+    raise ValueError(f"Unsupported chat history URL: {url}")
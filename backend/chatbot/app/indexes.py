@@ -0,0 +1,112 @@
+import threading
+from typing import Callable, Dict, Iterable, Optional
+from .models import User
+
+class DuplicateValueError(ValueError):
+    def __init__(self, field: str, value: str):
+        super().__init__(f"A user with {field} {value!r} already exists")
+        self.field = field
+        self.value = value
+
+class UnwrittenUsersError(DuplicateValueError):
+    """Buffered user updates storage rejected when they were flushed; errors maps each user_id to its conflict."""
+    
+    def __init__(self, errors: Dict[str, DuplicateValueError]):
+        first = next(iter(errors.values()))
+        ValueError.__init__(self, f"Updates to {len(errors)} user(s) were not written: "
+                                  + "; ".join(f"{user_id} ({error})" for user_id, error in errors.items()))
+        self.field = first.field
+        self.value = first.value
+        self.errors = errors
+
+def normalize_email(email: str) -> str:
+    return email.strip().lower()
+
+# Unique user fields indexed by default, with the normalizer applied to both
+# stored values and lookups
+DEFAULT_UNIQUE_FIELDS = {"email": normalize_email}
+
+class UniqueIndexes:
+    """In-memory secondary indexes over unique User fields (value -> user_id).
+    
+    Each index also keeps the reverse user_id -> value map, so an update can
+    drop the user's old value without reading the previous record.
+    """
+    
+    def __init__(self, fields: Optional[Dict[str, Callable[[str], str]]] = None):
+        self.fields = dict(DEFAULT_UNIQUE_FIELDS if fields is None else fields)
+        self._values = {field: {} for field in self.fields}
+        self._owners = {field: {} for field in self.fields}
+        self._lock = threading.Lock()
+    
+    def _key(self, field: str, value) -> Optional[str]:
+        if value is None:
+            return None
+        normalize = self.fields[field]
+        return normalize(value) if normalize else value
+    
+    def check(self, user: User) -> None:
+        """Raise DuplicateValueError if another user already holds one of this user's unique values."""
+        with self._lock:
+            self._check(user)
+    
+    def _check(self, user: User) -> None:
+        for field in self.fields:
+            key = self._key(field, getattr(user, field))
+            owner = self._values[field].get(key)
+            if key is not None and owner is not None and owner != user.user_id:
+                raise DuplicateValueError(field, getattr(user, field))
+    
+    def add(self, user: User) -> None:
+        with self._lock:
+            self._check(user)
+            self._add(user)
+    
+    def _add(self, user: User) -> None:
+        for field in self.fields:
+            key = self._key(field, getattr(user, field))
+            values, owners = self._values[field], self._owners[field]
+            previous = owners.get(user.user_id)
+            if previous == key:
+                continue
+            if previous is not None:
+                values.pop(previous, None)
+            if key is None:
+                owners.pop(user.user_id, None)
+            else:
+                values[key] = user.user_id
+                owners[user.user_id] = key
+    
+    def add_many(self, users: Iterable[User]) -> None:
+        users = list(users)
+        with self._lock:
+            # Validate the whole batch, duplicates within it included, before touching the index
+            for field in self.fields:
+                seen = {}
+                for user in users:
+                    key = self._key(field, getattr(user, field))
+                    if key is not None and seen.setdefault(key, user.user_id) != user.user_id:
+                        raise DuplicateValueError(field, getattr(user, field))
+            for user in users:
+                self._check(user)
+            for user in users:
+                self._add(user)
+    
+    def load(self, users: Iterable[User]) -> None:
+        """Index existing records without validation (the stored data is taken as is)."""
+        with self._lock:
+            for user in users:
+                self._add(user)
+    
+    def remove(self, user_id: str) -> None:
+        with self._lock:
+            for field in self.fields:
+                key = self._owners[field].pop(user_id, None)
+                if key is not None:
+                    self._values[field].pop(key, None)
+    
+    def lookup(self, field: str, value: str) -> Optional[str]:
+        return self._values[field].get(self._key(field, value))
+    
+    def __len__(self) -> int:
+        return max((len(owners) for owners in self._owners.values()), default=0)
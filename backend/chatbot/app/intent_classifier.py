@@ -0,0 +1,162 @@
+import hashlib
+import math
+import os
+import random
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+from .codec import packb, unpackb
+
+# A small trained intent model: TF-IDF features and a softmax (multinomial
+# logistic regression) layer, in pure Python so it runs anywhere the
+# chatbot does.
+#
+# Features are word unigrams, word bigrams (with start/end markers) and
+# character trigrams of each word. The trigrams are what let it generalise
+# from a few examples per intent: "appointments", "appt" and "appointmnet"
+# share most of them with "appointment". Numbers collapse to one token.
+#
+# After training, the class weight vectors (the intent prototypes) are
+# stored as an inverted map feature -> per-intent weights, so scoring a
+# message touches only the features it contains. Trained models are
+# cached by a digest of their examples, in process and optionally on disk.
+
+_TOKEN = re.compile(r"[a-z]+(?:'[a-z]+)?|\d+(?:[.:/]\d+)*|[@?!]")
+MODEL_VERSION = 1
+
+def _tokens(message: str) -> List[str]:
+    return ["<num>" if token[0].isdigit() else token for token in _TOKEN.findall(message.lower())]
+
+def _raw_features(message: str) -> Dict[str, int]:
+    tokens = _tokens(message)
+    counts = {}
+    for token in tokens:
+        counts["w:" + token] = counts.get("w:" + token, 0) + 1
+        if len(token) > 2 and token[0].isalpha():
+            padded = f"<{token}>"
+            for i in range(len(padded) - 2):
+                gram = "c:" + padded[i:i + 3]
+                counts[gram] = counts.get(gram, 0) + 1
+    bounded = ["<s>"] + tokens + ["</s>"]
+    for first, second in zip(bounded, bounded[1:]):
+        bigram = f"b:{first} {second}"
+        counts[bigram] = counts.get(bigram, 0) + 1
+    return counts
+
+def examples_digest(examples: Dict[str, List[str]]) -> str:
+    return hashlib.sha256(packb([MODEL_VERSION, sorted((intent, list(messages)) for intent, messages in examples.items())])).hexdigest()
+
+class IntentClassifier:
+    """Intent detection with a TF-IDF + softmax model trained from labeled examples.
+    
+    A drop-in alternative to the regex IntentMatcher: match() returns
+    (intent, probability) and falls back to "unknown" when no intent
+    reaches the threshold. Build one with IntentClassifier.train().
+    """
+    
+    _trained = {}
+    
+    def __init__(self, intents: List[str], idf: Dict[str, float], weights: Dict[str, List[float]],
+                 bias: List[float], threshold: float = 0.45):
+        self.intents = intents
+        self.idf = idf
+        self.weights = weights
+        self.bias = bias
+        self.threshold = threshold
+    
+    @classmethod
+    def train(cls, examples: Dict[str, List[str]], epochs: int = 30, learning_rate: float = 0.5,
+              threshold: float = 0.45, cache_dir: Optional[str] = None, seed: int = 13) -> 'IntentClassifier':
+        """Fit a model to {intent: [example messages]}, reusing a cached one for the same examples."""
+        digest = examples_digest(examples)
+        key = (digest, epochs, learning_rate, seed)
+        model = cls._trained.get(key)
+        cache_path = os.path.join(cache_dir, f"intent-model-{digest[:16]}.bin") if cache_dir else None
+        if model is None and cache_path and os.path.exists(cache_path):
+            with open(cache_path, "rb") as f:
+                stored = unpackb(f.read())
+            if stored[0] == digest and stored[1] == [epochs, learning_rate, seed]:
+                model = tuple(stored[2:])
+        if model is None:
+            model = cls._fit(examples, epochs, learning_rate, seed)
+            if cache_path:
+                os.makedirs(cache_dir, exist_ok=True)
+                with open(cache_path, "wb") as f:
+                    f.write(packb([digest, [epochs, learning_rate, seed], *model]))
+        cls._trained[key] = model
+        return cls(*model, threshold=threshold)
+    
+    @staticmethod
+    def _fit(examples: Dict[str, List[str]], epochs: int, learning_rate: float, seed: int):
+        intents = sorted(examples)
+        samples = [(_raw_features(message), label) for label, intent in enumerate(intents) for message in examples[intent]]
+        
+        document_frequency = {}
+        for counts, _ in samples:
+            for feature in counts:
+                document_frequency[feature] = document_frequency.get(feature, 0) + 1
+        total = len(samples)
+        idf = {feature: math.log((1 + total) / (1 + df)) + 1.0 for feature, df in document_frequency.items()}
+        vectors = [(IntentClassifier._weigh(counts, idf), label) for counts, label in samples]
+        
+        classes = len(intents)
+        weights = {feature: [0.0] * classes for feature in idf}
+        bias = [0.0] * classes
+        rng = random.Random(seed)
+        for epoch in range(epochs):
+            rng.shuffle(vectors)
+            rate = learning_rate / (1 + epoch * 0.1)
+            for vector, label in vectors:
+                probabilities = IntentClassifier._softmax(IntentClassifier._logits(vector, weights, bias))
+                probabilities[label] -= 1.0
+                for k in range(classes):
+                    bias[k] -= rate * probabilities[k]
+                for feature, value in vector.items():
+                    row = weights[feature]
+                    for k in range(classes):
+                        row[k] -= rate * value * probabilities[k]
+        return intents, idf, weights, bias
+    
+    @staticmethod
+    def _weigh(counts: Dict[str, int], idf: Dict[str, float]) -> Dict[str, float]:
+        # Sublinear tf times idf, L2 normalised; features never seen in training are dropped
+        vector = {feature: (1.0 + math.log(count)) * idf[feature] for feature, count in counts.items() if feature in idf}
+        norm = math.sqrt(sum(value * value for value in vector.values()))
+        return {feature: value / norm for feature, value in vector.items()} if norm else vector
+    
+    @staticmethod
+    def _logits(vector: Dict[str, float], weights: Dict[str, List[float]], bias: List[float]) -> List[float]:
+        logits = list(bias)
+        for feature, value in vector.items():
+            row = weights[feature]
+            for k in range(len(logits)):
+                logits[k] += value * row[k]
+        return logits
+    
+    @staticmethod
+    def _softmax(logits: List[float]) -> List[float]:
+        top = max(logits)
+        exps = [math.exp(logit - top) for logit in logits]
+        total = sum(exps)
+        return [value / total for value in exps]
+    
+    def probabilities(self, message: str) -> Dict[str, float]:
+        vector = self._weigh(_raw_features(message), self.idf)
+        return dict(zip(self.intents, self._softmax(self._logits(vector, self.weights, self.bias))))
+    
+    def match(self, message: str) -> Tuple[str, float]:
+        probabilities = self._softmax(self._logits(self._weigh(_raw_features(message), self.idf), self.weights, self.bias))
+        best = max(range(len(probabilities)), key=probabilities.__getitem__)
+        if probabilities[best] < self.threshold:
+            return "unknown", probabilities[best]
+        return self.intents[best], probabilities[best]
+    
+    def match_many(self, messages: Iterable[str]) -> List[Tuple[str, float]]:
+        """match() for a batch; repeated messages are scored once."""
+        results = {}
+        matched = []
+        for message in messages:
+            result = results.get(message)
+            if result is None:
+                result = results[message] = self.match(message)
+            matched.append(result)
+        return matched
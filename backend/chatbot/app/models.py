@@ -1,17 +1,23 @@
 import datetime
+import os
+import time
 import uuid
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Union
+from .codec import packb, unpackb
 
 class User:
-    def __init__(self, user_id: str, name: str, email: str, dob: str):
+    __slots__ = ("user_id", "name", "email", "dob", "health_data", "appointments", "medications", "password_hash")
+    
+    def __init__(self, user_id: str, name: str, email: str, dob: str, password_hash: Optional[str] = None):
         self.user_id = user_id
         self.name = name
         self.email = email
         self.dob = dob
+        # None for accounts created in chat, which have no password to log in with
+        self.password_hash = password_hash
         self.health_data = {}
         self.appointments = []
         self.medications = []
-        self.chat_history = []
         
     def to_dict(self) -> Dict:
         return {
@@ -22,16 +28,37 @@ class User:
             "health_data": self.health_data,
             "appointments": self.appointments,
             "medications": self.medications,
-            "chat_history": [msg.to_dict() for msg in self.chat_history]
+            "password_hash": self.password_hash
         }
     
     @classmethod
     def from_dict(cls, data: Dict) -> 'User':
-        user = cls(data["user_id"], data["name"], data["email"], data["dob"])
+        user = cls(data["user_id"], data["name"], data["email"], data["dob"], data.get("password_hash"))
         user.health_data = data.get("health_data", {})
         user.appointments = data.get("appointments", [])
         user.medications = data.get("medications", [])
-        user.chat_history = [ChatMessage.from_dict(msg) for msg in data.get("chat_history", [])]
+        return user
+    
+    def to_bytes(self, cipher=None) -> bytes:
+        health = [self.health_data, self.appointments, self.medications]
+        if cipher is not None:
+            # Health fields are sealed as one blob; the rest stays readable for indexing
+            health = [cipher.seal(self.user_id, packb(health)), None, None]
+        return packb([self.user_id, self.name, self.email, self.dob, *health, self.password_hash])
+    
+    @classmethod
+    def from_bytes(cls, data: bytes, cipher=None) -> 'User':
+        # Records written before password hashes were stored have seven fields
+        fields = unpackb(data)
+        user_id, name, email, dob, health_data, appointments, medications = fields[:7]
+        if isinstance(health_data, bytes):
+            if cipher is None:
+                raise ValueError(f"User {user_id} is encrypted and no cipher was given")
+            health_data, appointments, medications = unpackb(cipher.open(user_id, health_data))
+        user = cls(user_id, name, email, dob, fields[7] if len(fields) > 7 else None)
+        user.health_data = health_data
+        user.appointments = appointments
+        user.medications = medications
         return user
 
 class Appointment:
@@ -71,12 +98,37 @@ class Medication:
         }
 
 class ChatMessage:
-    def __init__(self, sender: str, message: str, timestamp: datetime.datetime):
-        self.message_id = str(uuid.uuid4())
+    # Millions of these can be held at once, so: no per-instance __dict__,
+    # the id kept as a 128-bit int and only formatted as a UUID string when
+    # read, and the timestamp kept as integer epoch milliseconds
+    __slots__ = ("_id", "sender", "message", "created_at")
+    
+    def __init__(self, sender: str, message: str, timestamp: Union[datetime.datetime, int, None] = None):
+        # From the OS CSPRNG: unpredictable, and not shared by forked workers
+        self._id = int.from_bytes(os.urandom(16), "big")
         self.sender = sender
         self.message = message
-        self.timestamp = timestamp
-        
+        if timestamp is None:
+            self.created_at = time.time_ns() // 1_000_000
+        elif isinstance(timestamp, datetime.datetime):
+            self.created_at = round(timestamp.timestamp() * 1000)
+        else:
+            self.created_at = timestamp
+    
+    @property
+    def message_id(self) -> str:
+        if isinstance(self._id, int):
+            self._id = str(uuid.UUID(int=self._id, version=4))
+        return self._id
+    
+    @message_id.setter
+    def message_id(self, value: str) -> None:
+        self._id = value
+    
+    @property
+    def timestamp(self) -> datetime.datetime:
+        return datetime.datetime.fromtimestamp(self.created_at / 1000)
+    
     def to_dict(self) -> Dict:
         return {
             "message_id": self.message_id,
@@ -87,8 +139,23 @@ class ChatMessage:
     
     @classmethod
     def from_dict(cls, data: Dict) -> 'ChatMessage':
-        return cls(
+        message = cls(
             data["sender"],
             data["message"],
             datetime.datetime.fromisoformat(data["timestamp"])
-        )
\ No newline at end of file
+        )
+        if "message_id" in data:
+            message.message_id = data["message_id"]
+        return message
+    
+    def to_bytes(self) -> bytes:
+        # Unformatted ids travel as 16 raw bytes rather than a 36-char string
+        message_id = self._id.to_bytes(16, "big") if isinstance(self._id, int) else self._id
+        return packb([message_id, self.sender, self.message, self.created_at])
+    
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'ChatMessage':
+        message_id, sender, text, created_at = unpackb(data)
+        message = cls(sender, text, created_at)
+        message._id = int.from_bytes(message_id, "big") if isinstance(message_id, bytes) else message_id
+        return message
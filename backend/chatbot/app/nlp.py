@@ -1,30 +1,207 @@
 import re
-from typing import Dict, Tuple
+from typing import Dict, List, Optional, Tuple
 from .store import DataStore
+from .automaton import KeywordAutomaton
+from .intent_classifier import IntentClassifier
 
-class NLPEngine:
-    def __init__(self, data_store: DataStore):
-        self.data_store = data_store
+# Vital-sign metric names (see app.vitals.METRICS) as people say them, checked in order
+VITAL_PATTERNS = [
+    ("blood_pressure", re.compile(r"blood pressure|\bbp\b")),
+    ("glucose", re.compile(r"glucose|blood sugar|\bsugar\b")),
+    ("heart_rate", re.compile(r"heart rate|\bpulse\b|\bbpm\b")),
+    ("weight", re.compile(r"\bweigh"))
+]
+PERIOD_DAYS = {"today": 1, "day": 1, "week": 7, "month": 30}
+
+_INLINE_FLAGS = re.compile(r'^\(\?([aiLmsux]+)\)')
+_UNESCAPED_UPPER = re.compile(r'\\.|[A-Z]')
+
+def _scoped(pattern: str, fold_case: bool = False) -> str:
+    # Turn a leading global flag group like "(?i)" into a scoped "(?i:...)"
+    # so the pattern can be embedded in a larger regex. With fold_case the
+    # pattern is lowercased (escapes untouched) and the "i" flag dropped, for
+    # matching against an already lowercased message.
+    match = _INLINE_FLAGS.match(pattern)
+    flags, body = (match.group(1), pattern[match.end():]) if match else ("", pattern)
+    if fold_case:
+        flags = flags.replace("i", "")
+        body = _UNESCAPED_UPPER.sub(lambda m: m.group().lower(), body)
+    return f"(?{flags}:{body})" if flags else f"(?:{body})"
+
+class IntentMatcher:
+    """Scores every intent pattern and detects emergency terms in one scan.
     
-    def detect_intent(self, message: str) -> Tuple[str, float]:
-        best_intent = "unknown"
-        best_score = 0.0
+    A case-folded alternation of all patterns finds the candidate positions
+    (case-insensitive matching is what makes the per-pattern regexes slow),
+    then one anchored regex of lookaheads, a named group per pattern, reads
+    off exactly which patterns match there. Each pattern keeps its own "next
+    allowed position", which reproduces the non-overlapping counts of calling
+    re.findall once per pattern.
+    """
+    
+    def __init__(self, intent_patterns: Dict[str, List[str]], emergency_terms: List[str]):
+        self.pattern_intents = []
+        patterns = []
+        for intent, intent_pattern_list in intent_patterns.items():
+            for pattern in intent_pattern_list:
+                self.pattern_intents.append(intent)
+                patterns.append(pattern)
+        if emergency_terms:
+            patterns.append("(?i)" + "|".join(re.escape(term) for term in emergency_terms))
         
-        for intent, patterns in self.data_store.intent_patterns.items():
-            for pattern in patterns:
-                matches = re.findall(pattern, message)
-                if matches:
-                    score = len(matches) / len(message.split())
-                    if score > best_score:
-                        best_score = score
-                        best_intent = intent
-        
-        for emergency_term in self.data_store.knowledge_base["emergency_conditions"]:
-            if emergency_term in message.lower():
+        alternatives = [_scoped(pattern) for pattern in patterns]
+        self.candidates = re.compile("|".join(alternatives))
+        self.folded_candidates = re.compile("|".join(_scoped(pattern, fold_case=True) for pattern in patterns))
+        self.captures = re.compile("".join(f"(?:(?=(?P<p{i}>{alternative})))?" for i, alternative in enumerate(alternatives)))
+        self.group_numbers = [self.captures.groupindex[f"p{i}"] for i in range(len(alternatives))]
+        self.emergency_group = self.group_numbers.pop() if emergency_terms else None
+    
+    def match(self, message: str) -> Tuple[str, float]:
+        pattern_count = len(self.pattern_intents)
+        counts = [0] * pattern_count
+        next_allowed = [0] * pattern_count
+        group_numbers = self.group_numbers
+        emergency_group = self.emergency_group
+        
+        # Lowercasing is only length- and match-preserving for ASCII text
+        if message.isascii():
+            search, haystack = self.folded_candidates.search, message.lower()
+        else:
+            search, haystack = self.candidates.search, message
+        
+        position = 0
+        candidate = search(haystack)
+        while candidate:
+            position = candidate.start()
+            regs = self.captures.match(message, position).regs
+            if emergency_group is not None and regs[emergency_group][0] >= 0:
                 return "emergency", 1.0
-                
+            for i, group in enumerate(group_numbers):
+                start, end = regs[group]
+                if start >= next_allowed[i]:
+                    counts[i] += 1
+                    next_allowed[i] = end if end > start else start + 1
+            candidate = search(haystack, position + 1)
+        
+        best_intent = "unknown"
+        best_score = 0.0
+        word_count = None
+        for intent, count in zip(self.pattern_intents, counts):
+            if count:
+                if word_count is None:
+                    word_count = len(message.split())
+                score = count / word_count
+                if score > best_score:
+                    best_score = score
+                    best_intent = intent
         return best_intent, best_score
     
+    def match_many(self, messages: List[str]) -> List[Tuple[str, float]]:
+        return [self.match(message) for message in messages]
+
+class NLPEngine:
+    """Intent detection and entity extraction.
+    
+    Intents come from the regex IntentMatcher by default; pass a trained
+    IntentClassifier (see IntentClassifier.train) to use it instead. With
+    the classifier, emergency terms are still a hard rule checked first.
+    """
+    
+    def __init__(self, data_store: DataStore, intent_classifier: Optional[IntentClassifier] = None):
+        self.data_store = data_store
+        self.intent_classifier = intent_classifier
+        self.compile_patterns()
+        self.build_term_automaton()
+        data_store.subscribe_knowledge_base(self._on_knowledge_base_change)
+    
+    def compile_patterns(self) -> None:
+        self.intent_matcher = IntentMatcher(
+            self.data_store.intent_patterns,
+            self.data_store.knowledge_base["emergency_conditions"]
+        )
+    
+    def build_term_automaton(self) -> None:
+        # Symptom and emergency terms -> ("symptom", condition) / ("emergency", term) payloads
+        self.term_automaton = KeywordAutomaton()
+        for condition, condition_data in self.data_store.knowledge_base["common_conditions"].items():
+            for symptom in condition_data["symptoms"]:
+                self.term_automaton.add(symptom, ("symptom", condition))
+        for term in self.data_store.knowledge_base["emergency_conditions"]:
+            self.term_automaton.add(term, ("emergency", term))
+    
+    def _on_knowledge_base_change(self, change: str, name: str, data: Dict) -> None:
+        # Apply knowledge-base edits to the automaton's trie in place; its next search relinks it
+        if change == "add_condition":
+            for symptom in data["symptoms"]:
+                self.term_automaton.add(symptom, ("symptom", name))
+        elif change == "remove_condition":
+            for symptom in data["symptoms"]:
+                self.term_automaton.remove(symptom, ("symptom", name))
+        elif change == "add_emergency_condition":
+            self.term_automaton.add(name, ("emergency", name))
+            self.compile_patterns()
+        elif change == "remove_emergency_condition":
+            self.term_automaton.remove(name, ("emergency", name))
+            self.compile_patterns()
+    
+    def find_terms(self, message: str, fuzzy: bool = True) -> List[Dict]:
+        """Find every symptom and emergency mention in the message with its offsets.
+        
+        Exact mentions score 1.0. With fuzzy, the rest of the message is
+        also searched for misspelled symptoms ("feaver", "sore throught"),
+        reported under the KB term with their similarity score.
+        """
+        lowered = message.lower()
+        mentions = []
+        for start, end, term, payloads in self.term_automaton.find_all(lowered):
+            mentions.append({
+                "term": term,
+                "text": message[start:end],
+                "start": start,
+                "end": end,
+                "score": 1.0,
+                "conditions": sorted(name for kind, name in payloads if kind == "symptom"),
+                "emergency": any(kind == "emergency" for kind, _ in payloads)
+            })
+        if fuzzy:
+            exact_spans = [(mention["start"], mention["end"]) for mention in mentions]
+            postings = self.data_store.symptom_index.postings
+            for start, end, term, score in self.data_store.symptom_matcher.find_all(lowered, exact_spans):
+                mentions.append({
+                    "term": term,
+                    "text": message[start:end],
+                    "start": start,
+                    "end": end,
+                    "score": score,
+                    "conditions": sorted(postings.get(term, ())),
+                    "emergency": False
+                })
+            mentions.sort(key=lambda mention: mention["start"])
+        return mentions
+    
+    def mentions_emergency(self, message: str) -> bool:
+        return any(
+            kind == "emergency"
+            for _, _, _, payloads in self.term_automaton.find_all(message.lower())
+            for kind, _ in payloads
+        )
+    
+    def detect_intent(self, message: str) -> Tuple[str, float]:
+        if self.intent_classifier is None:
+            return self.intent_matcher.match(message)
+        if self.mentions_emergency(message):
+            return "emergency", 1.0
+        return self.intent_classifier.match(message)
+    
+    def detect_intents(self, messages: List[str]) -> List[Tuple[str, float]]:
+        """detect_intent for a batch of messages."""
+        if self.intent_classifier is None:
+            return self.intent_matcher.match_many(messages)
+        emergencies = [self.mentions_emergency(message) for message in messages]
+        matched = self.intent_classifier.match_many([message for message, emergency in zip(messages, emergencies) if not emergency])
+        matched.reverse()
+        return [("emergency", 1.0) if emergency else matched.pop() for emergency in emergencies]
+    
     def extract_entities(self, message: str, intent: str) -> Dict:
         entities = {}
         
@@ -44,13 +221,46 @@ class NLPEngine:
             if doctor_matches:
                 entities["doctor"] = doctor_matches[0]
         
-        elif intent == "symptom":
-            for condition in self.data_store.knowledge_base["common_conditions"]:
-                condition_data = self.data_store.knowledge_base["common_conditions"][condition]
-                for symptom in condition_data["symptoms"]:
-                    if symptom in message.lower():
-                        if "symptoms" not in entities:
-                            entities["symptoms"] = []
-                        entities["symptoms"].append(symptom)
+        elif intent == "health_data":
+            lowered = message.lower()
+            for metric, pattern in VITAL_PATTERNS:
+                if pattern.search(lowered):
+                    entities["metric"] = metric
+                    break
+            
+            # A period like "last 30 days" comes out first so its number isn't read as a value
+            period = re.search(r'(?i)\b(?:in the )?(?:last|past|previous) (\d+) (day|week|month)s?\b', message)
+            named_period = re.search(r'(?i)\b(today|this week|(?:the )?(?:last|past) week|this month|(?:the )?(?:last|past) month)\b', message)
+            if period:
+                entities["period_days"] = int(period.group(1)) * PERIOD_DAYS[period.group(2).lower()]
+                message = message[:period.start()] + message[period.end():]
+            elif named_period:
+                entities["period_days"] = PERIOD_DAYS[named_period.group(1).lower().split()[-1]]
+                message = message[:named_period.start()] + message[named_period.end():]
+            
+            if entities.get("metric") == "blood_pressure":
+                reading = re.search(r'(?i)(\d{2,3}) ?(?:/|over) ?(\d{2,3})', message)
+                if reading:
+                    entities["reading"] = [int(reading.group(1)), int(reading.group(2))]
+            elif "metric" in entities:
+                reading = re.search(r'(?i)(\d+(?:\.\d+)?) ?(kg|kgs|kilograms?|lbs?|pounds?)?\b', message)
+                if reading:
+                    value = float(reading.group(1))
+                    if reading.group(2) and reading.group(2).lower().startswith(("lb", "pound")):
+                        value = round(value * 0.45359237, 1)
+                    entities["reading"] = [value]
+        
+        elif intent in ("symptom", "emergency"):
+            symptoms = []
+            emergency_terms = []
+            for mention in self.find_terms(message):
+                if mention["conditions"] and mention["term"] not in symptoms:
+                    symptoms.append(mention["term"])
+                if mention["emergency"] and mention["term"] not in emergency_terms:
+                    emergency_terms.append(mention["term"])
+            if symptoms:
+                entities["symptoms"] = symptoms
+            if emergency_terms:
+                entities["emergency_terms"] = emergency_terms
         
         return entities
\ No newline at end of file
@@ -0,0 +1,409 @@
+import datetime
+import functools
+import logging
+import re
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlparse
+from .backends import SQLitePool
+from .codec import packb, unpackb
+from .models import ChatMessage
+from .timing_wheel import TimingWheel
+
+logger = logging.getLogger(__name__)
+
+HOUR = 3600
+DAY = 24 * HOUR
+
+# Default times of day (hours) for "n times a day"
+DAILY_HOURS = {1: [9], 2: [9, 21], 3: [8, 14, 20], 4: [8, 12, 16, 20], 5: [8, 11, 14, 17, 20], 6: [7, 10, 13, 16, 19, 22]}
+COUNT_WORDS = {"once": 1, "one": 1, "twice": 2, "two": 2, "thrice": 3, "three": 3, "four": 4, "five": 5, "six": 6}
+ABBREVIATIONS = {"qd": 1, "od": 1, "bid": 2, "bd": 2, "tid": 3, "tds": 3, "qid": 4, "qds": 4}
+PERIOD_UNITS = {"hour": HOUR, "day": DAY, "week": 7 * DAY}
+
+class Schedule:
+    """Reminder times: anchor + k * period + offset, for every k >= 0 and each offset.
+    
+    Daily-type schedules anchor at local midnight of the start date and
+    their offsets are wall-clock times of day. When the period is a whole
+    number of days the arithmetic is done on local dates, so "9 am" stays
+    9 am across daylight saving changes; hourly periods count elapsed time.
+    """
+    
+    __slots__ = ("anchor", "period", "offsets")
+    
+    def __init__(self, anchor: float, period: float, offsets: List[float]):
+        self.anchor = anchor
+        self.period = period
+        self.offsets = sorted(offsets)
+    
+    def next_after(self, timestamp: float) -> float:
+        if self.period % DAY == 0:
+            return self._next_local_after(timestamp)
+        # Offsets can exceed the period (every 6 hours from 8 am), so start from the last offset
+        k = max(0, int((timestamp - self.anchor - self.offsets[-1]) // self.period))
+        while True:
+            for offset in self.offsets:
+                due = self.anchor + k * self.period + offset
+                if due > timestamp:
+                    return due
+            k += 1
+    
+    def _next_local_after(self, timestamp: float) -> float:
+        start = datetime.date.fromtimestamp(self.anchor).toordinal()
+        days = int(self.period // DAY)
+        # Start a period early: an offset past midnight belongs to the previous period's date
+        elapsed = datetime.date.fromtimestamp(timestamp).toordinal() - start - int(self.offsets[-1] // DAY)
+        k = max(0, elapsed // days - 1)
+        while True:
+            for offset in self.offsets:
+                due = _local_time(start + k * days, offset)
+                if due > timestamp:
+                    return due
+            k += 1
+    
+    def describe(self) -> str:
+        times = ", ".join(_clock(offset) for offset in self.offsets)
+        if self.period == DAY:
+            count = {1: "every day", 2: "twice a day", 3: "three times a day"}.get(len(self.offsets), f"{len(self.offsets)} times a day")
+            return f"{count} at {times}"
+        if self.period % DAY == 0:
+            days = int(self.period // DAY)
+            return f"{'every week' if days == 7 else 'every other day' if days == 2 else f'every {days} days'} at {times}"
+        return f"every {self.period / HOUR:g} hours from {times}"
+    
+    def to_list(self) -> List:
+        return [self.anchor, self.period, self.offsets]
+    
+    @classmethod
+    def from_list(cls, data: List) -> 'Schedule':
+        return cls(*data)
+
+@functools.lru_cache(maxsize=4096)
+def _local_midnight(ordinal: int, zone: Tuple) -> float:
+    return time.mktime(datetime.date.fromordinal(ordinal).timetuple())
+
+def _local_time(ordinal: int, offset: float) -> float:
+    """The timestamp offset seconds of wall-clock time after local midnight on a date."""
+    zone = (time.timezone, time.altzone, time.tzname)
+    midnight = _local_midnight(ordinal, zone)
+    if _local_midnight(ordinal + 1, zone) - midnight == DAY:
+        return midnight + offset
+    # A daylight saving change that day: let mktime resolve the wall-clock time
+    date_time = datetime.datetime.fromordinal(ordinal) + datetime.timedelta(seconds=offset)
+    return time.mktime(date_time.timetuple())
+
+def _clock(offset: float) -> str:
+    hour, minute = divmod(int(offset // 60) % (24 * 60), 60)
+    return f"{hour % 12 or 12}:{minute:02d} {'am' if hour < 12 else 'pm'}"
+
+def parse_frequency(text: str, start: Optional[datetime.date] = None) -> Optional[Schedule]:
+    """Turn a frequency as people write it ("twice daily", "every 8 hours",
+    "at 8 am and 8 pm", "bid") into a Schedule starting on start (default
+    today). Returns None for "as needed" and anything unrecognised."""
+    text = text.lower()
+    start = start or datetime.date.today()
+    midnight = time.mktime(start.timetuple())
+    if re.search(r"\b(as needed|when needed|prn|if needed)\b", text):
+        return None
+    
+    clock_times = []
+    for hour, minute, meridiem in re.findall(r"\b(\d{1,2})(?::(\d{2}))? ?(am|pm)\b", text):
+        hour = int(hour) % 12 + (12 if meridiem == "pm" else 0)
+        clock_times.append(hour * HOUR + int(minute or 0) * 60)
+    for hour, minute in re.findall(r"\b(\d{1,2}):(\d{2})\b(?! ?[ap]m)", text):
+        clock_times.append(int(hour) * HOUR + int(minute) * 60)
+    
+    every = re.search(r"\bevery (\d+|other|\w+)? ?(hour|day|week)s?\b", text)
+    if every and every.group(2) == "hour":
+        hours = int(every.group(1)) if every.group(1) and every.group(1).isdigit() else 1
+        first = clock_times[0] if clock_times else 8 * HOUR
+        return Schedule(midnight, hours * HOUR, [first])
+    if every and every.group(1) and (every.group(1).isdigit() or every.group(1) == "other"):
+        days = 2 if every.group(1) == "other" else int(every.group(1))
+        return Schedule(midnight, days * PERIOD_UNITS[every.group(2)], clock_times or [9 * HOUR])
+    if re.search(r"\b(weekly|once a week|every week|each week)\b", text):
+        return Schedule(midnight, 7 * DAY, clock_times[:1] or [9 * HOUR])
+    
+    count = None
+    counted = re.search(r"\b(\d+|once|twice|thrice|one|two|three|four|five|six)(?: times| x|x)? ?(?:a|per|each|every)? ?(?:day|daily)\b", text)
+    if counted:
+        word = counted.group(1)
+        count = int(word) if word.isdigit() else COUNT_WORDS[word]
+    else:
+        for abbreviation, abbreviation_count in ABBREVIATIONS.items():
+            if re.search(rf"\b{abbreviation}\b", text):
+                count = abbreviation_count
+                break
+    if clock_times and (count is None or count == len(clock_times)):
+        return Schedule(midnight, DAY, clock_times)
+    if count is not None and count in DAILY_HOURS:
+        return Schedule(midnight, DAY, [hour * HOUR for hour in DAILY_HOURS[count]])
+    for pattern, hour in ((r"\b(bedtime|qhs|before bed|nightly|every night|at night)\b", 22),
+                          (r"\b(morning|breakfast)\b", 8), (r"\b(evening|dinner|supper)\b", 19),
+                          (r"\b(daily|every day|each day|a day)\b", 9)):
+        if re.search(pattern, text):
+            return Schedule(midnight, DAY, [hour * HOUR])
+    return None
+
+class Reminder:
+    __slots__ = ("reminder_id", "user_id", "medication_id", "medication", "dosage", "schedule", "next_due", "generation")
+    
+    def __init__(self, reminder_id: str, user_id: str, medication_id: str, medication: str, dosage: str,
+                 schedule: Schedule, next_due: float):
+        self.reminder_id = reminder_id
+        self.user_id = user_id
+        self.medication_id = medication_id
+        self.medication = medication
+        self.dosage = dosage
+        self.schedule = schedule
+        self.next_due = next_due
+        # Bumped on reschedule/cancel; wheel entries from older generations are ignored
+        self.generation = 0
+    
+    def to_list(self) -> List:
+        return [self.reminder_id, self.user_id, self.medication_id, self.medication, self.dosage,
+                self.schedule.to_list(), self.next_due]
+    
+    @classmethod
+    def from_list(cls, data: List) -> 'Reminder':
+        reminder_id, user_id, medication_id, medication, dosage, schedule, next_due = data
+        return cls(reminder_id, user_id, medication_id, medication, dosage, Schedule.from_list(schedule), next_due)
+
+class ReminderQueue:
+    """Where scheduled reminders and their next due time are kept; in memory by default."""
+    
+    def load(self) -> List[Reminder]:
+        return []
+    
+    def save_many(self, reminders: List[Reminder]) -> None:
+        pass
+    
+    def delete_many(self, reminder_ids: List[str]) -> None:
+        pass
+    
+    def close(self) -> None:
+        pass
+
+class SQLiteReminderQueue(ReminderQueue):
+    """Reminders as rows keyed by id, so the schedule survives restarts.
+    
+    Each dispatch round rewrites the next due time of the reminders it sent
+    in one transaction; a reminder that fell due while the process was down
+    is sent once on the first round after startup.
+    """
+    
+    def __init__(self, path: str, pool_size: int = 2):
+        self._pool = SQLitePool(path, pool_size)
+        with self._pool.connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS reminders ("
+                " reminder_id TEXT PRIMARY KEY,"
+                " user_id TEXT NOT NULL,"
+                " next_due REAL NOT NULL,"
+                " data BLOB NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS reminders_user ON reminders (user_id)")
+    
+    def load(self) -> List[Reminder]:
+        with self._pool.connection() as conn:
+            return [Reminder.from_list(unpackb(row[0])) for row in conn.execute("SELECT data FROM reminders")]
+    
+    def save_many(self, reminders: List[Reminder]) -> None:
+        if not reminders:
+            return
+        with self._pool.transaction() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO reminders (reminder_id, user_id, next_due, data) VALUES (?, ?, ?, ?)",
+                [(reminder.reminder_id, reminder.user_id, reminder.next_due, packb(reminder.to_list())) for reminder in reminders]
+            )
+    
+    def delete_many(self, reminder_ids: List[str]) -> None:
+        if not reminder_ids:
+            return
+        with self._pool.transaction() as conn:
+            conn.executemany("DELETE FROM reminders WHERE reminder_id = ?", [(reminder_id,) for reminder_id in reminder_ids])
+    
+    def close(self) -> None:
+        self._pool.close()
+
+def create_reminder_queue(url: str = "memory://") -> ReminderQueue:
+    """Build a reminder queue from a URL: memory:// (lost on restart) or sqlite:///path/to.db."""
+    parsed = urlparse(url)
+    options = {key: int(value) for key, value in parse_qsl(parsed.query)}
+    if parsed.scheme in ("", "memory"):
+        return ReminderQueue()
+    if parsed.scheme == "sqlite":
+        return SQLiteReminderQueue(parsed.netloc + parsed.path[1:], **options)
+    raise ValueError(f"Unsupported reminder queue URL: {url}")
+
+class NotificationSink(ABC):
+    """Delivers a due reminder. send() returns False if the user can no longer
+    be reached (e.g. the account is gone), which cancels the reminder."""
+    
+    @abstractmethod
+    def send(self, reminder: Reminder, due: float) -> bool:
+        ...
+
+class MemorySink(NotificationSink):
+    """Keeps the most recent notifications in memory, for development and tests."""
+    
+    def __init__(self, max_items: int = 10000):
+        self.sent = deque(maxlen=max_items)
+    
+    def send(self, reminder: Reminder, due: float) -> bool:
+        self.sent.append((reminder.user_id, reminder.medication, reminder.dosage, due))
+        return True
+
+class ChatHistorySink(NotificationSink):
+    """Posts the reminder into the user's chat history as a bot message."""
+    
+    def __init__(self, data_store):
+        self.data_store = data_store
+    
+    def send(self, reminder: Reminder, due: float) -> bool:
+        if self.data_store.get_user(reminder.user_id) is None:
+            return False
+        text = f"Reminder: time to take your {reminder.medication} ({reminder.dosage})."
+        self.data_store.append_chat_messages(reminder.user_id, [ChatMessage("bot", text, int(due * 1000))])
+        return True
+
+class ReminderScheduler:
+    """Medication reminders on a timing wheel, persisted through a ReminderQueue.
+    
+    schedule() parses a medication's frequency and puts its next dose on
+    the wheel (O(1)); run_due() advances the wheel to now, sends what fell
+    due through the sink, and puts each reminder back at its next time.
+    start() runs run_due() on a background thread.
+    """
+    
+    def __init__(self, queue: Optional[ReminderQueue] = None, sink: Optional[NotificationSink] = None,
+                 tick: float = 60.0, clock: Callable[[], float] = time.time):
+        self.queue = queue if queue is not None else ReminderQueue()
+        self.sink = sink if sink is not None else MemorySink()
+        self.clock = clock
+        self.reminders = {}
+        self._by_user = {}
+        self._lock = threading.Lock()
+        self._wheel = TimingWheel(clock(), tick)
+        self._thread = None
+        self._stop = threading.Event()
+        for reminder in self.queue.load():
+            self._track(reminder)
+    
+    def _track(self, reminder: Reminder) -> None:
+        self.reminders[reminder.reminder_id] = reminder
+        self._by_user.setdefault(reminder.user_id, set()).add(reminder.reminder_id)
+        self._wheel.add(reminder.next_due, (reminder, reminder.generation))
+    
+    def schedule(self, user_id: str, medication: Dict) -> Optional[Reminder]:
+        """Schedule reminders for a medication dict (see Medication.to_dict); None if its frequency can't be parsed."""
+        start = datetime.date.fromisoformat(medication["start_date"]) if medication.get("start_date") else None
+        schedule = parse_frequency(medication["frequency"], start)
+        if schedule is None:
+            return None
+        reminder = Reminder(str(uuid.uuid4()), user_id, medication.get("medication_id", ""), medication["name"],
+                            medication["dosage"], schedule, schedule.next_after(self.clock()))
+        with self._lock:
+            self.queue.save_many([reminder])
+            self._track(reminder)
+        return reminder
+    
+    def schedule_many(self, items: Iterable[Tuple[str, Dict]]) -> int:
+        """schedule() for (user_id, medication) pairs, persisted in one batch; returns how many were scheduled."""
+        now = self.clock()
+        reminders = []
+        for user_id, medication in items:
+            start = datetime.date.fromisoformat(medication["start_date"]) if medication.get("start_date") else None
+            schedule = parse_frequency(medication["frequency"], start)
+            if schedule is not None:
+                reminders.append(Reminder(str(uuid.uuid4()), user_id, medication.get("medication_id", ""),
+                                          medication["name"], medication["dosage"], schedule, schedule.next_after(now)))
+        with self._lock:
+            self.queue.save_many(reminders)
+            for reminder in reminders:
+                self._track(reminder)
+        return len(reminders)
+    
+    def _forget(self, reminder_ids: List[str]) -> None:
+        # Caller holds the lock; the wheel entries go stale and are skipped when they come up
+        for reminder_id in reminder_ids:
+            reminder = self.reminders.pop(reminder_id, None)
+            if reminder is not None:
+                reminder.generation += 1
+                user_reminders = self._by_user.get(reminder.user_id)
+                if user_reminders is not None:
+                    user_reminders.discard(reminder_id)
+                    if not user_reminders:
+                        del self._by_user[reminder.user_id]
+        self.queue.delete_many(reminder_ids)
+    
+    def cancel(self, reminder_id: str) -> None:
+        with self._lock:
+            self._forget([reminder_id])
+    
+    def cancel_user(self, user_id: str) -> None:
+        with self._lock:
+            self._forget(list(self._by_user.get(user_id, ())))
+    
+    def for_user(self, user_id: str) -> List[Reminder]:
+        with self._lock:
+            return sorted((self.reminders[reminder_id] for reminder_id in self._by_user.get(user_id, ())),
+                          key=lambda reminder: reminder.next_due)
+    
+    def run_due(self, now: Optional[float] = None) -> int:
+        """Send every reminder due by now and schedule each one's next time; returns the number sent."""
+        now = self.clock() if now is None else now
+        with self._lock:
+            due = [reminder for reminder, generation in self._wheel.advance(now) if generation == reminder.generation]
+        sent = []
+        unreachable = []
+        for reminder in due:
+            try:
+                delivered = self.sink.send(reminder, reminder.next_due)
+            except Exception:
+                # Leave it for the next round rather than losing the dose
+                logger.exception("Sending reminder %s failed", reminder.reminder_id)
+                with self._lock:
+                    self._wheel.add(now + self._wheel.tick, (reminder, reminder.generation))
+                continue
+            (sent if delivered else unreachable).append(reminder)
+        with self._lock:
+            for reminder in sent:
+                if reminder.reminder_id in self.reminders:
+                    # A dose missed while the process was down is sent once, not once per missed time
+                    reminder.next_due = reminder.schedule.next_after(max(now, reminder.next_due))
+                    reminder.generation += 1
+                    self._wheel.add(reminder.next_due, (reminder, reminder.generation))
+            self.queue.save_many([reminder for reminder in sent if reminder.reminder_id in self.reminders])
+            self._forget([reminder.reminder_id for reminder in unreachable])
+        return len(sent)
+    
+    def start(self, interval: Optional[float] = None) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        
+        def run():
+            while not self._stop.wait(interval or self._wheel.tick):
+                self.run_due()
+        
+        self._thread = threading.Thread(target=run, name="medication-reminders", daemon=True)
+        self._thread.start()
+    
+    def stop(self) -> None:
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+    
+    def close(self) -> None:
+        self.stop()
+        self.queue.close()
+    
+    def __len__(self) -> int:
+        return len(self.reminders)
@@ -0,0 +1,70 @@
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+CachedTurn = Tuple[str, Dict, str, str]
+
+def normalize_message(message: str) -> str:
+    # Whitespace only: case is kept because replies echo entities such as
+    # doctor names and dates as the user typed them
+    return " ".join(message.split())
+
+class ResponseCache:
+    """Bounded LRU of normalized message -> (intent, entities, response, next state).
+    
+    Only turns whose reply depends on nothing but the message text are
+    stored (DialogManager decides which). Hits, misses and bypasses are
+    counted for stats().
+    """
+    
+    def __init__(self, max_entries: int = 4096):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bypasses = 0
+    
+    def get(self, message: str) -> Optional[CachedTurn]:
+        with self._lock:
+            entry = self._entries.get(message)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(message)
+            self.hits += 1
+            return entry
+    
+    def put(self, message: str, intent: str, entities: Dict, response: str, next_state: str) -> None:
+        if not self.max_entries:
+            return
+        with self._lock:
+            self._entries[message] = (intent, entities, response, next_state)
+            self._entries.move_to_end(message)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def record_bypass(self) -> None:
+        with self._lock:
+            self.bypasses += 1
+    
+    def record_miss(self) -> None:
+        # A hit that turned out not to apply to this user
+        with self._lock:
+            self.hits -= 1
+            self.misses += 1
+    
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+    
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "bypasses": self.bypasses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+            }
@@ -0,0 +1,385 @@
+import datetime
+import threading
+from bisect import bisect_right
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+from urllib.parse import parse_qsl, urlparse
+from .backends import SQLitePool
+
+# Calendar times are whole minutes since EPOCH, in the same naive local time
+# the dialog's appointment datetimes use
+EPOCH = datetime.datetime(2000, 1, 1)
+EPOCH_WEEKDAY = EPOCH.weekday()
+MINUTES_PER_DAY = 24 * 60
+
+def to_minutes(date_time: datetime.datetime) -> int:
+    return int((date_time - EPOCH).total_seconds() // 60)
+
+def from_minutes(minutes: int) -> datetime.datetime:
+    return EPOCH + datetime.timedelta(minutes=minutes)
+
+def doctor_key(name: str) -> str:
+    """"Dr. Smith", "dr smith" and "Smith" all name the same calendar."""
+    words = name.strip().lower().replace(".", " ").split()
+    if words and words[0] in ("dr", "doctor"):
+        words = words[1:]
+    return " ".join(words)
+
+class SlotTakenError(ValueError):
+    def __init__(self, doctor: str, start: datetime.datetime, next_free: Optional[datetime.datetime]):
+        super().__init__(f"{doctor} is not available at {start.isoformat()}")
+        self.doctor = doctor
+        self.start = start
+        self.next_free = next_free
+
+class StaleCalendarError(RuntimeError):
+    """The calendar changed since the version the caller read; re-read and retry."""
+
+class DoctorCalendar:
+    """One doctor's bookings as a sorted index of busy intervals.
+    
+    Bookings that touch are merged into maximal busy runs, kept as two
+    parallel sorted lists (run starts, run ends), so whether a slot is free
+    is one bisect, and the next free slot after a time is a bisect per busy
+    run skipped. Each booking is also kept by id so it can be cancelled,
+    which splits its run again.
+    
+    Every change bumps version: a caller that read the calendar (say, to
+    offer a slot) can book with expected_version to fail fast with
+    StaleCalendarError if anything changed in between.
+    """
+    
+    def __init__(self, name: str, slot_minutes: int = 30, hours: Tuple[int, int] = (9, 17),
+                 weekdays: Iterable[int] = range(5)):
+        self.name = name
+        self.slot_minutes = slot_minutes
+        self.opens = hours[0] * 60
+        self.closes = hours[1] * 60
+        self.weekdays = frozenset(weekdays)
+        if not self.weekdays or self.closes - self.opens < slot_minutes:
+            raise ValueError(f"{name} has no bookable hours")
+        self._starts = []
+        self._ends = []
+        self.bookings = {}
+        self.version = 0
+        # Called as on_change(appointment_id, start, end, patient, booked) under the
+        # calendar's lock; Scheduler indexes and persists bookings with it
+        self.on_change: Optional[Callable[[str, int, int, str, bool], None]] = None
+        self._lock = threading.Lock()
+    
+    def _align(self, minutes: int) -> int:
+        return -(-minutes // self.slot_minutes) * self.slot_minutes
+    
+    def _open_at(self, minutes: int, duration: int) -> int:
+        """The first time at or after minutes when a booking of this length fits in working hours."""
+        while True:
+            day, minute_of_day = divmod(minutes, MINUTES_PER_DAY)
+            if (day + EPOCH_WEEKDAY) % 7 in self.weekdays and minute_of_day + duration <= self.closes:
+                if minute_of_day >= self.opens:
+                    return minutes
+                return day * MINUTES_PER_DAY + self.opens
+            minutes = (day + 1) * MINUTES_PER_DAY + self.opens
+    
+    def _conflict(self, start: int, end: int) -> Optional[int]:
+        # Index of a busy run overlapping [start, end), if any
+        i = bisect_right(self._starts, start) - 1
+        if i >= 0 and self._ends[i] > start:
+            return i
+        if i + 1 < len(self._starts) and self._starts[i + 1] < end:
+            return i + 1
+        return None
+    
+    def _next_free(self, start: int, duration: int) -> int:
+        candidate = start
+        while True:
+            candidate = self._open_at(self._align(candidate), duration)
+            busy = self._conflict(candidate, candidate + duration)
+            if busy is None:
+                return candidate
+            candidate = self._ends[busy]
+    
+    def is_free(self, start: datetime.datetime, duration: Optional[int] = None) -> bool:
+        duration = duration or self.slot_minutes
+        minutes = to_minutes(start)
+        with self._lock:
+            return self._open_at(minutes, duration) == minutes and self._conflict(minutes, minutes + duration) is None
+    
+    def next_free(self, start: datetime.datetime, duration: Optional[int] = None) -> datetime.datetime:
+        """The earliest bookable slot at or after start."""
+        with self._lock:
+            return from_minutes(self._next_free(to_minutes(start), duration or self.slot_minutes))
+    
+    def book(self, appointment_id: str, start: datetime.datetime, patient: str, duration: Optional[int] = None,
+             expected_version: Optional[int] = None) -> int:
+        """Book [start, start + duration) and return the new calendar version.
+        
+        Raises SlotTakenError (carrying the next free slot) if the time is
+        outside working hours or overlaps another booking, and
+        StaleCalendarError if expected_version is given and out of date.
+        """
+        duration = duration or self.slot_minutes
+        minutes = to_minutes(start)
+        end = minutes + duration
+        with self._lock:
+            if expected_version is not None and expected_version != self.version:
+                raise StaleCalendarError(f"{self.name}'s calendar is at version {self.version}, not {expected_version}")
+            if minutes % self.slot_minutes or self._open_at(minutes, duration) != minutes or self._conflict(minutes, end) is not None:
+                raise SlotTakenError(self.name, start, from_minutes(self._next_free(minutes, duration)))
+            starts, ends = self._starts, self._ends
+            i = bisect_right(starts, minutes)
+            # Merge with the run ending where this booking starts and/or the one starting where it ends
+            joins_previous = i > 0 and ends[i - 1] == minutes
+            joins_next = i < len(starts) and starts[i] == end
+            if joins_previous and joins_next:
+                ends[i - 1] = ends[i]
+                del starts[i], ends[i]
+            elif joins_previous:
+                ends[i - 1] = end
+            elif joins_next:
+                starts[i] = minutes
+            else:
+                starts.insert(i, minutes)
+                ends.insert(i, end)
+            self.bookings[appointment_id] = (minutes, end, patient)
+            self.version += 1
+            if self.on_change is not None:
+                self.on_change(appointment_id, minutes, end, patient, True)
+            return self.version
+    
+    def cancel(self, appointment_id: str) -> bool:
+        with self._lock:
+            booking = self.bookings.pop(appointment_id, None)
+            if booking is None:
+                return False
+            start, end, patient = booking
+            starts, ends = self._starts, self._ends
+            i = bisect_right(starts, start) - 1
+            run_start, run_end = starts[i], ends[i]
+            pieces = [(s, e) for s, e in ((run_start, start), (end, run_end)) if s < e]
+            starts[i:i + 1] = [s for s, _ in pieces]
+            ends[i:i + 1] = [e for _, e in pieces]
+            self.version += 1
+            if self.on_change is not None:
+                self.on_change(appointment_id, start, end, patient, False)
+            return True
+    
+    def busy(self, start: datetime.datetime, end: datetime.datetime) -> List[Tuple[datetime.datetime, datetime.datetime]]:
+        """Busy runs overlapping [start, end)."""
+        low, high = to_minutes(start), to_minutes(end)
+        with self._lock:
+            i = max(0, bisect_right(self._starts, low) - 1)
+            runs = []
+            while i < len(self._starts) and self._starts[i] < high:
+                if self._ends[i] > low:
+                    runs.append((from_minutes(self._starts[i]), from_minutes(self._ends[i])))
+                i += 1
+            return runs
+
+class BookingStore:
+    """Where bookings are kept between restarts; this base class keeps nothing.
+    
+    needs_import tells the owner to book back the appointments stored on
+    User records: always for this one, and for a persistent store only
+    when it was just created.
+    """
+    
+    needs_import = True
+    
+    def load(self) -> List[Tuple[str, str, int, int, str]]:
+        """Every booking as (appointment_id, doctor key, start, end, patient), in calendar minutes."""
+        return []
+    
+    def save(self, appointment_id: str, doctor: str, start: int, end: int, patient: str) -> None:
+        pass
+    
+    def delete(self, appointment_id: str) -> None:
+        pass
+    
+    def close(self) -> None:
+        pass
+
+class SQLiteBookingStore(BookingStore):
+    """Bookings as rows keyed by appointment id, so calendars load without reading any User record."""
+    
+    def __init__(self, path: str, pool_size: int = 2):
+        self._pool = SQLitePool(path, pool_size)
+        with self._pool.connection() as conn:
+            self.needs_import = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'bookings'").fetchone() is None
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS bookings ("
+                " appointment_id TEXT PRIMARY KEY,"
+                " doctor TEXT NOT NULL,"
+                " start INTEGER NOT NULL,"
+                " end INTEGER NOT NULL,"
+                " patient TEXT NOT NULL)"
+            )
+    
+    def load(self) -> List[Tuple[str, str, int, int, str]]:
+        with self._pool.connection() as conn:
+            return conn.execute("SELECT appointment_id, doctor, start, end, patient FROM bookings").fetchall()
+    
+    def save(self, appointment_id: str, doctor: str, start: int, end: int, patient: str) -> None:
+        with self._pool.connection() as conn:
+            conn.execute("INSERT OR REPLACE INTO bookings (appointment_id, doctor, start, end, patient) VALUES (?, ?, ?, ?, ?)",
+                         (appointment_id, doctor, start, end, patient))
+    
+    def delete(self, appointment_id: str) -> None:
+        with self._pool.connection() as conn:
+            conn.execute("DELETE FROM bookings WHERE appointment_id = ?", (appointment_id,))
+    
+    def close(self) -> None:
+        self._pool.close()
+
+def create_booking_store(url: str = "memory://") -> BookingStore:
+    """Build a booking store from a URL: memory:// (rebuilt from User records) or sqlite:///path/to.db."""
+    parsed = urlparse(url)
+    options = {key: int(value) for key, value in parse_qsl(parsed.query)}
+    if parsed.scheme in ("", "memory"):
+        return BookingStore()
+    if parsed.scheme == "sqlite":
+        return SQLiteBookingStore(parsed.netloc + parsed.path[1:], **options)
+    raise ValueError(f"Unsupported booking store URL: {url}")
+
+class _Shift:
+    """Doctors who share working hours, with who is booked in each slot."""
+    
+    def __init__(self, template: DoctorCalendar):
+        # Any member answers "when is this shift open", they all keep the same hours
+        self.template = template
+        self.members = []
+        self.busy: Dict[int, Set[str]] = {}
+    
+    def first_free(self, minutes: int, duration: int, slot_minutes: int) -> Optional[str]:
+        # The first member (in the order added) with no booking in any slot of [minutes, minutes + duration)
+        slots = [keys for keys in (self.busy.get(slot) for slot in range(minutes, minutes + duration, slot_minutes)) if keys]
+        if any(len(keys) >= len(self.members) for keys in slots):
+            return None
+        return next((key for key in self.members if not any(key in keys for keys in slots)), None)
+
+class Scheduler:
+    """Doctor calendars by name, plus booking across them.
+    
+    For searches across doctors, calendars with the same working hours are
+    grouped into shifts, each indexing its slots to the doctors booked in
+    them (calendars report bookings and cancellations as they happen). The
+    earliest free doctor is then found by walking slots from the requested
+    time and stopping at the first one where a shift isn't fully booked, so
+    the cost follows how many slots are full rather than how many doctors
+    there are.
+    
+    Bookings are written through to store as they are made and cancelled,
+    and read back from it when the scheduler is built.
+    """
+    
+    def __init__(self, doctors: Iterable[str] = (), slot_minutes: int = 30, store: Optional[BookingStore] = None):
+        self.slot_minutes = slot_minutes
+        self.calendars = {}
+        # Insertion order, for "first available doctor" searches
+        self._position = {}
+        self._shifts = {}
+        self._lock = threading.Lock()
+        self.store = store if store is not None else BookingStore()
+        self._persist = False
+        for name in doctors:
+            self.add_doctor(name)
+        for appointment_id, doctor, start, end, patient in self.store.load():
+            calendar = self.calendars.get(doctor)
+            if calendar is not None:
+                self._book_back(calendar, appointment_id, from_minutes(start), patient, end - start)
+        self._persist = True
+    
+    def add_doctor(self, name: str, hours: Tuple[int, int] = (9, 17), weekdays: Iterable[int] = range(5)) -> DoctorCalendar:
+        key = doctor_key(name)
+        with self._lock:
+            calendar = self.calendars.get(key)
+            if calendar is None:
+                calendar = self.calendars[key] = DoctorCalendar(name, self.slot_minutes, hours, weekdays)
+                self._position[key] = len(self._position)
+                shift_key = (calendar.opens, calendar.closes, calendar.weekdays)
+                shift = self._shifts.get(shift_key)
+                if shift is None:
+                    shift = self._shifts[shift_key] = _Shift(calendar)
+                shift.members.append(key)
+                calendar.on_change = lambda *change: self._changed(shift, key, *change)
+            return calendar
+    
+    def _changed(self, shift: _Shift, key: str, appointment_id: str, start: int, end: int, patient: str, booked: bool) -> None:
+        if self._persist:
+            if booked:
+                self.store.save(appointment_id, key, start, end, patient)
+            else:
+                self.store.delete(appointment_id)
+        first = start - start % self.slot_minutes
+        with self._lock:
+            for slot in range(first, end, self.slot_minutes):
+                if booked:
+                    shift.busy.setdefault(slot, set()).add(key)
+                else:
+                    keys = shift.busy.get(slot)
+                    if keys is not None:
+                        keys.discard(key)
+                        if not keys:
+                            del shift.busy[slot]
+    
+    def calendar(self, name: str) -> Optional[DoctorCalendar]:
+        return self.calendars.get(doctor_key(name))
+    
+    def first_available(self, start: datetime.datetime, duration: Optional[int] = None) -> Optional[DoctorCalendar]:
+        """The first doctor (in the order added) free at start."""
+        found = self.earliest_available(start, duration)
+        return found[0] if found is not None and found[1] == start else None
+    
+    def earliest_available(self, start: datetime.datetime,
+                           duration: Optional[int] = None) -> Optional[Tuple[DoctorCalendar, datetime.datetime]]:
+        """The earliest slot at or after start when some doctor is free, and the first such doctor.
+        
+        Ties between doctors free at the same time go to the one added
+        first. None only when there are no doctors.
+        """
+        duration = duration or self.slot_minutes
+        minutes = to_minutes(start)
+        best = None
+        with self._lock:
+            for shift in self._shifts.values():
+                candidate = minutes
+                while best is None or candidate <= best[0]:
+                    candidate = shift.template._open_at(shift.template._align(candidate), duration)
+                    if best is not None and candidate > best[0]:
+                        break
+                    key = shift.first_free(candidate, duration, self.slot_minutes)
+                    if key is not None:
+                        if best is None or (candidate, self._position[key]) < (best[0], self._position[best[1]]):
+                            best = (candidate, key)
+                        break
+                    candidate += self.slot_minutes
+        if best is None:
+            return None
+        return self.calendars[best[1]], from_minutes(best[0])
+    
+    @staticmethod
+    def _book_back(calendar: DoctorCalendar, appointment_id: str, start: datetime.datetime, patient: str,
+                   duration: Optional[int] = None) -> None:
+        try:
+            calendar.book(appointment_id, start, patient, duration)
+        except SlotTakenError:
+            # Booked before the calendar existed (or outside its hours): keep the record, don't block the slot
+            pass
+    
+    def load(self, users: Iterable) -> None:
+        """Book back the scheduled appointments stored on User records, writing them to the store.
+        
+        Only needed when store.needs_import: a fresh store, or the
+        in-memory one, which keeps nothing across restarts.
+        """
+        for user in users:
+            for appointment in user.appointments:
+                calendar = self.calendar(appointment["doctor"])
+                if calendar is None or appointment.get("status") != "scheduled":
+                    continue
+                self._book_back(calendar, appointment["appointment_id"], datetime.datetime.fromisoformat(appointment["date_time"]), user.user_id)
+    
+    def close(self) -> None:
+        self.store.close()
+    
+    def __len__(self) -> int:
+        return len(self.calendars)
@@ -1,22 +1,201 @@
+import base64
+import collections
 import hashlib
+import hmac
+import multiprocessing
+import os
+import threading
+import time
 import uuid
-from typing import Optional
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Iterable, Iterator, List, Optional
+
+# scrypt cost: N (CPU/memory, a power of two), r (block size), p (parallelism).
+# Memory per hash is 128 * N * r bytes, 16 MiB for the defaults.
+SCRYPT_N = 2 ** 14
+SCRYPT_R = 8
+SCRYPT_P = 1
+SALT_BYTES = 16
+KEY_BYTES = 32
+
+class AuthBusyError(RuntimeError):
+    """Raised when the password hashing pool already has its maximum of queued jobs."""
+
+def _b64encode(data: bytes) -> str:
+    return base64.b64encode(data).decode().rstrip("=")
+
+def _b64decode(data: str) -> bytes:
+    return base64.b64decode(data + "=" * (-len(data) % 4))
+
+def _scrypt(password: str, salt: bytes, n: int, r: int, p: int) -> bytes:
+    # Runs in the worker processes, so it has to be a picklable module-level function
+    return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p,
+                          maxmem=256 * n * r + 1024 * 1024, dklen=KEY_BYTES)
+
+def _worker_init() -> None:
+    # Logins yield the CPU to chat traffic when the two compete for cores
+    if hasattr(os, "nice"):
+        os.nice(10)
+
+def _hash(password: str, n: int, r: int, p: int) -> str:
+    salt = os.urandom(SALT_BYTES)
+    return f"scrypt${n}${r}${p}${_b64encode(salt)}${_b64encode(_scrypt(password, salt, n, r, p))}"
+
+def _verify(password: str, stored: str) -> bool:
+    if stored.startswith("scrypt$"):
+        _, n, r, p, salt, key = stored.split("$")
+        return hmac.compare_digest(_scrypt(password, _b64decode(salt), int(n), int(r), int(p)), _b64decode(key))
+    # Hashes from before scrypt: unsalted SHA-256 hex
+    return hmac.compare_digest(hashlib.sha256(password.encode()).hexdigest(), stored)
+
+class RateLimiter:
+    """Token bucket per key (a client IP): up to `burst` attempts at once, refilled at `rate` per second.
+    
+    Only the `max_keys` most recently seen keys are tracked; the least
+    recently seen bucket is dropped beyond that.
+    """
+    
+    def __init__(self, rate: float = 10 / 60, burst: int = 10, max_keys: int = 100_000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets = collections.OrderedDict()
+        self._lock = threading.Lock()
+    
+    def allow(self, key: str) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.pop(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - last) * self.rate)
+            allowed = tokens >= 1
+            self._buckets[key] = (tokens - 1 if allowed else tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            return allowed
+    
+    def reset(self, key: str) -> None:
+        with self._lock:
+            self._buckets.pop(key, None)
 
 class SecurityManager:
-    @staticmethod
-    def hash_password(password: str) -> str:
-        return hashlib.sha256(password.encode()).hexdigest()
+    """Session tokens, password hashing, login throttling and field encryption.
+    
+    scrypt is deliberately slow, so hashing and verification run in a small
+    process pool rather than on the thread (or event loop) serving chat
+    turns. At most `max_pending` jobs may be queued; past that submissions
+    fail fast with AuthBusyError instead of building an unbounded backlog.
+    
+    Encryption goes through `cipher`, an EnvelopeCipher built from the
+    configured master key; without one the encrypt methods raise.
+    """
+    
+    def __init__(self, n: int = SCRYPT_N, r: int = SCRYPT_R, p: int = SCRYPT_P, workers: int = 2,
+                 max_pending: int = 64, rate_limiter: Optional[RateLimiter] = None, cipher=None):
+        self.n = n
+        self.r = r
+        self.p = p
+        self.workers = workers
+        # None: no per-client limit on login attempts
+        self.rate_limiter = rate_limiter
+        self.cipher = cipher
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        # Checked for unknown emails, so they cost as much as a wrong password
+        self._dummy_hash = f"scrypt${n}${r}${p}${_b64encode(bytes(SALT_BYTES))}${_b64encode(bytes(KEY_BYTES))}"
+    
+    def _executor(self) -> ProcessPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None:
+                # spawn: the servers run background threads, which fork doesn't mix with
+                self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"),
+                                                 initializer=_worker_init)
+            return self._pool
+    
+    def _submit(self, fn, *args) -> Future:
+        if not self._slots.acquire(blocking=False):
+            raise AuthBusyError("Too many password checks in progress")
+        try:
+            try:
+                future = self._executor().submit(fn, *args)
+            except BrokenProcessPool:
+                # A worker died (e.g. killed for memory); start a fresh pool
+                self._discard_pool()
+                future = self._executor().submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+    
+    def submit_hash(self, password: str) -> Future:
+        return self._submit(_hash, password, self.n, self.r, self.p)
+    
+    def submit_verify(self, password: str, stored: Optional[str]) -> Future:
+        """Check a password in the pool; a missing hash is checked against a dummy and always fails."""
+        return self._submit(_verify, password, stored or self._dummy_hash)
+    
+    def hash_password(self, password: str) -> str:
+        return self.submit_hash(password).result()
+    
+    def verify_password(self, password: str, stored: Optional[str]) -> bool:
+        return self.submit_verify(password, stored).result()
+    
+    def needs_rehash(self, stored: str) -> bool:
+        """True for hashes made with older (or legacy SHA-256) parameters than the configured cost."""
+        if not stored.startswith("scrypt$"):
+            return True
+        _, n, r, p, _, _ = stored.split("$")
+        return (int(n), int(r), int(p)) != (self.n, self.r, self.p)
+    
+    def allow_login(self, client: str) -> bool:
+        return self.rate_limiter is None or self.rate_limiter.allow(client)
+    
+    def _discard_pool(self) -> None:
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False)
+    
+    def close(self) -> None:
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=True)
+                self._pool = None
     
     @staticmethod
     def generate_session_token() -> str:
         return str(uuid.uuid4())
     
-    @staticmethod
-    def encrypt_sensitive_data(data: str) -> str:
-        return f"ENCRYPTED_{data}"
+    def _require_cipher(self):
+        if self.cipher is None:
+            raise RuntimeError("No encryption key configured (set CHATBOT_ENCRYPTION_KEY)")
+        return self.cipher
     
-    @staticmethod
-    def decrypt_sensitive_data(encrypted_data: str) -> str:
-        if encrypted_data.startswith("ENCRYPTED_"):
-            return encrypted_data[10:]
-        return encrypted_data
\ No newline at end of file
+    def encrypt_sensitive_data(self, data: str, user_id: str = "") -> str:
+        """Encrypt one value for a user (AES-GCM under the user's data key), base64 encoded."""
+        return self.encrypt_many([data], user_id)[0]
+    
+    def encrypt_many(self, values: Iterable[str], user_id: str = "") -> List[str]:
+        """Encrypt many values for one user with a single key lookup and cipher context."""
+        sealed = self._require_cipher().seal_many(user_id, [value.encode() for value in values])
+        return [base64.b64encode(blob).decode() for blob in sealed]
+    
+    def decrypt_sensitive_data(self, encrypted_data: str, user_id: str = "") -> str:
+        return self.decrypt_many([encrypted_data], user_id)[0]
+    
+    def decrypt_many(self, values: Iterable[str], user_id: str = "") -> List[str]:
+        values = list(values)
+        # Values from the old placeholder scheme were never actually encrypted
+        legacy = [value[10:] if value.startswith("ENCRYPTED_") else None for value in values]
+        sealed = [base64.b64decode(value) for value, plain in zip(values, legacy) if plain is None]
+        opened = iter(self._require_cipher().open_many(user_id, sealed) if sealed else [])
+        return [plain if plain is not None else next(opened).decode() for plain in legacy]
+    
+    def encrypt_export(self, user_id: str, chunks: Iterable[bytes]) -> Iterator[bytes]:
+        """Encrypt a large export (e.g. DataStore.export_user) as a stream of fixed-size frames."""
+        return self._require_cipher().seal_stream(user_id, chunks)
+    
+    def decrypt_export(self, user_id: str, chunks: Iterable[bytes]) -> Iterator[bytes]:
+        return self._require_cipher().open_stream(user_id, chunks)
@@ -0,0 +1,216 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+from urllib.parse import parse_qsl, urlparse
+from .backends import SQLitePool
+
+class MemorySessionBackend:
+    """Sessions in an OrderedDict kept in access order.
+    
+    Expiry is sliding (every access pushes it out by the TTL), so access
+    order is also expiry order: the sweeper pops from the front until it
+    meets a live session, and LRU eviction pops the same end.
+    """
+    
+    def __init__(self):
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key: str, now: float, ttl: float) -> Optional[Any]:
+        with self._lock:
+            entry = self._sessions.get(key)
+            if entry is None or entry[1] <= now:
+                return None
+            self._sessions[key] = (entry[0], now + ttl)
+            self._sessions.move_to_end(key)
+            return entry[0]
+    
+    def put(self, key: str, value: Any, expires_at: float) -> None:
+        with self._lock:
+            self._sessions[key] = (value, expires_at)
+            self._sessions.move_to_end(key)
+    
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._sessions.pop(key, None)
+    
+    def expire(self, now: float) -> int:
+        expired = 0
+        with self._lock:
+            while self._sessions:
+                key, (_, expires_at) = next(iter(self._sessions.items()))
+                if expires_at > now:
+                    break
+                del self._sessions[key]
+                expired += 1
+        return expired
+    
+    def trim(self, max_sessions: int) -> int:
+        evicted = 0
+        with self._lock:
+            while len(self._sessions) > max_sessions:
+                self._sessions.popitem(last=False)
+                evicted += 1
+        return evicted
+    
+    def __len__(self) -> int:
+        return len(self._sessions)
+    
+    def close(self) -> None:
+        pass
+
+class SQLiteSessionBackend:
+    """Sessions in a SQLite table so several worker processes share them.
+    
+    Values are stored as JSON. LRU trimming here is done by the sweeper
+    rather than on every write, so the cap is enforced approximately.
+    """
+    
+    def __init__(self, path: str, namespace: str = "sessions", pool_size: int = 4):
+        if not namespace.isidentifier():
+            raise ValueError(f"Invalid session namespace: {namespace}")
+        self.table = f"{namespace}_store"
+        self._pool = SQLitePool(path, pool_size)
+        with self._pool.connection() as conn:
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} ("
+                " key TEXT PRIMARY KEY,"
+                " value TEXT NOT NULL,"
+                " expires_at REAL NOT NULL)"
+            )
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {self.table}_expiry ON {self.table} (expires_at)")
+    
+    def get(self, key: str, now: float, ttl: float) -> Optional[Any]:
+        with self._pool.connection() as conn:
+            row = conn.execute(
+                f"SELECT value FROM {self.table} WHERE key = ? AND expires_at > ?", (key, now)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(f"UPDATE {self.table} SET expires_at = ? WHERE key = ?", (now + ttl, key))
+        return json.loads(row[0])
+    
+    def put(self, key: str, value: Any, expires_at: float) -> None:
+        with self._pool.connection() as conn:
+            conn.execute(
+                f"INSERT INTO {self.table} (key, value, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at",
+                (key, json.dumps(value), expires_at)
+            )
+    
+    def delete(self, key: str) -> None:
+        with self._pool.connection() as conn:
+            conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+    
+    def expire(self, now: float) -> int:
+        with self._pool.connection() as conn:
+            return conn.execute(f"DELETE FROM {self.table} WHERE expires_at <= ?", (now,)).rowcount
+    
+    def trim(self, max_sessions: int) -> int:
+        # With a uniform TTL the earliest expiry is the least recently used
+        with self._pool.connection() as conn:
+            return conn.execute(
+                f"DELETE FROM {self.table} WHERE key IN ("
+                f" SELECT key FROM {self.table} ORDER BY expires_at ASC"
+                f" LIMIT max(0, (SELECT COUNT(*) FROM {self.table}) - ?))",
+                (max_sessions,)
+            ).rowcount
+    
+    def __len__(self) -> int:
+        with self._pool.connection() as conn:
+            return conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+    
+    def close(self) -> None:
+        self._pool.close()
+
+class SessionStore:
+    """Key -> session mapping with sliding TTL expiry and an LRU size cap.
+    
+    An expired session is invisible as soon as it expires and is removed in
+    bulk by sweep(), which start_sweeper() runs on a background thread.
+    """
+    
+    def __init__(self, ttl: float = 1800, max_sessions: int = 10000, backend=None):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.backend = backend if backend is not None else MemorySessionBackend()
+        self.expired_evictions = 0
+        self.lru_evictions = 0
+        self._metrics_lock = threading.Lock()
+        self._sweeper = None
+        self._stop_sweeper = threading.Event()
+    
+    def get(self, key: str) -> Optional[Any]:
+        return self.backend.get(key, time.time(), self.ttl)
+    
+    def set(self, key: str, value: Any) -> None:
+        self.backend.put(key, value, time.time() + self.ttl)
+        if isinstance(self.backend, MemorySessionBackend):
+            self._count(lru=self.backend.trim(self.max_sessions))
+    
+    def delete(self, key: str) -> None:
+        self.backend.delete(key)
+    
+    def __contains__(self, key: str) -> bool:
+        return self.get(key) is not None
+    
+    def __len__(self) -> int:
+        return len(self.backend)
+    
+    def _count(self, expired: int = 0, lru: int = 0) -> None:
+        if expired or lru:
+            with self._metrics_lock:
+                self.expired_evictions += expired
+                self.lru_evictions += lru
+    
+    def sweep(self) -> int:
+        """Drop expired sessions and enforce the size cap; returns the number evicted."""
+        expired = self.backend.expire(time.time())
+        lru = self.backend.trim(self.max_sessions)
+        self._count(expired, lru)
+        return expired + lru
+    
+    def start_sweeper(self, interval: float = 60) -> None:
+        if self._sweeper is not None:
+            return
+        self._stop_sweeper.clear()
+        
+        def run():
+            while not self._stop_sweeper.wait(interval):
+                self.sweep()
+        
+        self._sweeper = threading.Thread(target=run, name="session-sweeper", daemon=True)
+        self._sweeper.start()
+    
+    def stop_sweeper(self) -> None:
+        if self._sweeper is not None:
+            self._stop_sweeper.set()
+            self._sweeper.join()
+            self._sweeper = None
+    
+    def metrics(self) -> Dict[str, int]:
+        with self._metrics_lock:
+            return {
+                "live_sessions": len(self.backend),
+                "expired_evictions": self.expired_evictions,
+                "lru_evictions": self.lru_evictions
+            }
+    
+    def close(self) -> None:
+        self.stop_sweeper()
+        self.backend.close()
+
+def create_session_store(url: str = "memory://", namespace: str = "sessions", ttl: float = 1800,
+                         max_sessions: int = 10000) -> SessionStore:
+    """Build a session store from a URL: memory:// (per process) or sqlite:///path/to.db (shared)."""
+    parsed = urlparse(url)
+    if parsed.scheme in ("", "memory"):
+        backend = MemorySessionBackend()
+    elif parsed.scheme == "sqlite":
+        options = {key: int(value) for key, value in parse_qsl(parsed.query)}
+        backend = SQLiteSessionBackend(parsed.netloc + parsed.path[1:], namespace, **options)
+    else:
+        raise ValueError(f"Unsupported session store URL: {url}")
+    return SessionStore(ttl, max_sessions, backend)
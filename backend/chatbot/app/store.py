@@ -1,12 +1,63 @@
-from typing import Dict, List, Optional
-from .models import User
+import logging
+import struct
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+from .codec import packb, unpackb
+from .models import User, ChatMessage
+from .symptom_index import SymptomIndex
+from .fuzzy import FuzzyPhraseIndex
+from .backends import UserBackend, MemoryUserBackend
+from .history import ChatHistoryStore, MemoryChatHistory, HistoryPage
+from .indexes import DuplicateValueError, UniqueIndexes, UnwrittenUsersError
+from .vitals import VitalsStore
+from .scheduling import BookingStore, Scheduler
+
+logger = logging.getLogger(__name__)
 
 class DataStore:
-    def __init__(self):
-        self.users = {}
+    def __init__(self, backend: Optional[UserBackend] = None, cache_size: int = 1024, cache_ttl: Optional[float] = None,
+                 history: Optional[ChatHistoryStore] = None, unique_fields: Optional[Dict[str, Callable]] = None,
+                 vitals: Optional[VitalsStore] = None, scheduler: Optional[Scheduler] = None,
+                 bookings: Optional[BookingStore] = None):
+        # Users live in a pluggable backend; persistent ones get a bounded
+        # read-through LRU cache in front (cache_ttl bounds staleness when
+        # several processes write to the same database)
+        self.users = backend if backend is not None else MemoryUserBackend()
+        self.cache_size = cache_size if not isinstance(self.users, MemoryUserBackend) else 0
+        self.cache_ttl = cache_ttl
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        # Chat history is an append-only log of its own, not part of the User record
+        self.chat_history = history if history is not None else MemoryChatHistory()
+        # So are vital-sign readings, kept as time series with daily/weekly rollups
+        self.vitals = vitals if vitals is not None else VitalsStore()
+        # Secondary indexes over unique fields (email by default), kept current
+        # by create_user/update_user/delete_user. They only see this process's
+        # writes, so they're built from the stored users only when the backend
+        # doesn't enforce those fields itself (a shared SQLite table does, and
+        # get_user_by falls back to it)
+        self.indexes = UniqueIndexes(unique_fields)
+        if not set(self.indexes.fields) <= self.users.unique_fields:
+            self.indexes.load(self.users)
+        # Doctor calendars, loaded from their own booking store; the appointments
+        # on user records are booked back only into a store that has none yet
+        self.scheduler = scheduler if scheduler is not None else Scheduler(self._load_doctors(), store=bookings)
+        if self.scheduler.store.needs_import:
+            self.scheduler.load(self.users)
         self.knowledge_base = self._load_knowledge_base()
         self.intent_patterns = self._load_intent_patterns()
-        
+        self.intent_examples = self._load_intent_examples()
+        self.symptom_index = SymptomIndex(self.knowledge_base["common_conditions"])
+        # Trigram index over every KB symptom phrase for typo-tolerant matching
+        self.symptom_matcher = FuzzyPhraseIndex(
+            symptom
+            for data in self.knowledge_base["common_conditions"].values()
+            for symptom in data["symptoms"]
+        )
+        self.knowledge_base_listeners = []
+    
     def _load_knowledge_base(self) -> Dict:
         return {
             "common_conditions": {
@@ -22,6 +73,9 @@ class DataStore:
             "emergency_conditions": ["chest pain", "difficulty breathing", "severe bleeding", "sudden severe headache"]
         }
     
+    def _load_doctors(self) -> List[str]:
+        return ["Dr. Smith", "Dr. Patel", "Dr. Jones", "Dr. Kim", "Dr. Brown", "Dr. Garcia"]
+    
     def _load_intent_patterns(self) -> Dict[str, List[str]]:
         return {
             "greeting": [
@@ -42,15 +96,249 @@ class DataStore:
             ],
             "health_data": [
                 r"(?i)track|record|log|monitor|update.*(blood pressure|weight|glucose|exercise)",
-                r"(?i)my health (data|information|stats|numbers)"
+                r"(?i)my health (data|information|stats|numbers)",
+                r"(?i)blood pressure|blood sugar|glucose|weight|heart rate"
+            ]
+        }
+    
+    def _load_intent_examples(self) -> Dict[str, List[str]]:
+        # Labeled messages for the trained intent classifier; "unknown" covers
+        # small talk and the replies the dialog flows collect (names, emails, dates)
+        return {
+            "greeting": [
+                "hello", "hi", "hey", "hey there", "hello there", "hi, how are you?", "greetings",
+                "good morning", "good afternoon", "good evening", "morning!", "hiya", "hello again",
+                "hey, is anyone there?", "hi, I'm back", "good morning, hope you're well", "howdy",
+                "hello, nice to meet you", "hi assistant", "yo"
+            ],
+            "appointment": [
+                "I want to book an appointment", "can I schedule a visit with my doctor",
+                "I need to see a doctor", "book me in with Dr. Patel on Friday at 2pm",
+                "set up an appointment for next Tuesday", "I'd like a consultation",
+                "is there a slot available tomorrow morning", "can I get an appointment this week",
+                "schedule a checkup for me", "I need to make an appointment with a specialist",
+                "reschedule my appointment", "when can I see Dr. Jones", "arrange a visit on May 5 at 9am",
+                "I'd like to come in and see someone", "book a doctor's appointment for my back pain",
+                "do you have any openings on Monday", "I want to talk to a physician in person",
+                "can you book me with a nurse", "make a booking for a blood test", "cancel my appointment"
+            ],
+            "medication": [
+                "I need a refill", "refill my prescription please", "what medications am I taking",
+                "remind me to take my pills", "add a new medication", "I started a new medicine",
+                "what's my current dosage", "can you list my prescriptions", "I ran out of my tablets",
+                "when should I take my medicine", "set a reminder for my insulin", "update my medication list",
+                "my doctor prescribed amoxicillin", "how often do I take lisinopril",
+                "I forgot to take my pills this morning", "do I need a new prescription",
+                "track my medications", "I take metformin twice a day", "which drugs am I on", "medication reminder"
+            ],
+            "symptom": [
+                "I have a headache", "I've been coughing all week", "my throat is sore", "I feel nauseous",
+                "I have a fever", "I'm experiencing chest tightness and fatigue", "my stomach hurts",
+                "I feel dizzy when I stand up", "I have a rash on my arm", "I've had diarrhea since yesterday",
+                "my back has been aching", "I keep sneezing and my nose is runny", "I feel feverish and tired",
+                "there's a sharp pain in my knee", "I have body aches and chills", "my ear hurts",
+                "I can't stop coughing", "I've got a migraine", "I'm feeling really unwell", "my joints are swollen"
+            ],
+            "health_data": [
+                "log my blood pressure", "record my weight", "my blood pressure is 120 over 80",
+                "track my glucose", "I walked 5000 steps today", "update my weight to 70 kg",
+                "show my health stats", "what was my last blood pressure reading", "log 30 minutes of exercise",
+                "my blood sugar was 110 this morning", "record my heart rate", "show me my weight trend",
+                "monitor my cholesterol", "I weigh 82 kilograms", "my health information please",
+                "log my sleep hours", "add a glucose reading of 95", "how has my blood pressure changed this month",
+                "enter today's temperature 37.5", "track my exercise"
+            ],
+            "unknown": [
+                "thanks", "thank you", "ok", "what does this do?", "am I in the right place?", "who are you",
+                "Priya Raman", "john.smith@example.com", "07/22/1985", "01/02/1980", "Alex", "yes", "no",
+                "what's the weather like", "tell me a joke", "never mind", "this is fine", "that's all",
+                "bye", "what can you do"
             ]
         }
     
+    def subscribe_knowledge_base(self, listener: Callable[[str, str, Dict], None]) -> None:
+        self.knowledge_base_listeners.append(listener)
+    
+    def _notify_knowledge_base(self, change: str, name: str, data: Dict) -> None:
+        for listener in self.knowledge_base_listeners:
+            listener(change, name, data)
+    
+    def add_condition(self, condition: str, symptoms: List[str], self_care: str) -> None:
+        if condition in self.knowledge_base["common_conditions"]:
+            self.remove_condition(condition)
+        data = {"symptoms": list(symptoms), "self_care": self_care}
+        self.knowledge_base["common_conditions"][condition] = data
+        self.symptom_index.add_condition(condition, data["symptoms"])
+        for symptom in data["symptoms"]:
+            self.symptom_matcher.add(symptom)
+        self._notify_knowledge_base("add_condition", condition, data)
+    
+    def remove_condition(self, condition: str) -> None:
+        data = self.knowledge_base["common_conditions"].pop(condition, None)
+        if data is not None:
+            self.symptom_index.remove_condition(condition)
+            for symptom in data["symptoms"]:
+                self.symptom_matcher.remove(symptom)
+            self._notify_knowledge_base("remove_condition", condition, data)
+    
+    def add_emergency_condition(self, term: str) -> None:
+        if term not in self.knowledge_base["emergency_conditions"]:
+            self.knowledge_base["emergency_conditions"].append(term)
+            self._notify_knowledge_base("add_emergency_condition", term, {})
+    
+    def remove_emergency_condition(self, term: str) -> None:
+        if term in self.knowledge_base["emergency_conditions"]:
+            self.knowledge_base["emergency_conditions"].remove(term)
+            self._notify_knowledge_base("remove_emergency_condition", term, {})
+    
+    def _cache_get(self, user_id: str) -> Optional[User]:
+        with self._cache_lock:
+            entry = self._cache.get(user_id)
+            if entry is None:
+                return None
+            user, cached_at = entry
+            if self.cache_ttl is not None and time.monotonic() - cached_at > self.cache_ttl:
+                del self._cache[user_id]
+                return None
+            self._cache.move_to_end(user_id)
+            return user
+    
+    def _cache_put(self, user: User) -> None:
+        if not self.cache_size:
+            return
+        with self._cache_lock:
+            self._cache[user.user_id] = (user, time.monotonic())
+            self._cache.move_to_end(user.user_id)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+    
     def create_user(self, user: User) -> None:
-        self.users[user.user_id] = user
+        self.create_users([user])
+    
+    def create_users(self, users: List[User]) -> None:
+        self.indexes.add_many(users)
+        try:
+            self.users.insert_many(users)
+        except DuplicateValueError:
+            # Taken in storage, e.g. by another process: undo this batch's index entries
+            self._reindex_stored(user.user_id for user in users)
+            raise
+        for user in users:
+            self._cache_put(user)
     
     def get_user(self, user_id: str) -> Optional[User]:
-        return self.users.get(user_id)
+        user = self._cache_get(user_id)
+        if user is None:
+            user = self.users.get(user_id)
+            if user is not None:
+                self._cache_put(user)
+        return user
+    
+    def get_user_by(self, field: str, value: str) -> Optional[User]:
+        """Look a user up by a unique indexed field."""
+        user_id = self.indexes.lookup(field, value)
+        if user_id is not None:
+            return self.get_user(user_id)
+        if field == "email" and not isinstance(self.users, MemoryUserBackend):
+            # Another process may have created the user; persistent backends index email themselves
+            user = self.users.get_by_email(value)
+            if user is not None:
+                self.indexes.add(user)
+                self._cache_put(user)
+            return user
+        return None
+    
+    def get_user_by_email(self, email: str) -> Optional[User]:
+        return self.get_user_by("email", email)
     
     def update_user(self, user: User) -> None:
-        self.users[user.user_id] = user
\ No newline at end of file
+        self.indexes.add(user)
+        try:
+            self.users.put(user)
+        except UnwrittenUsersError as e:
+            # A batched flush: the updates it couldn't write may be other users'
+            self._reindex_stored(e.errors)
+            if user.user_id in e.errors:
+                raise
+            logger.warning("%s", e)
+        except DuplicateValueError:
+            self._reindex_stored([user.user_id])
+            raise
+        self._cache_put(user)
+    
+    def _reindex_stored(self, user_ids: Iterable[str]) -> None:
+        # Index the records as stored, not the change the backend rejected
+        for user_id in user_ids:
+            with self._cache_lock:
+                self._cache.pop(user_id, None)
+            self.indexes.remove(user_id)
+            stored = self.users.get(user_id)
+            if stored is not None:
+                self.indexes.load([stored])
+    
+    def append_chat_messages(self, user_id: str, messages: List[ChatMessage]) -> None:
+        self.chat_history.append(user_id, messages)
+    
+    def get_chat_history(self, user_id: str, limit: int = 50, before: Optional[int] = None) -> HistoryPage:
+        return self.chat_history.page(user_id, limit, before)
+    
+    def export_user(self, user_id: str, page_size: int = 500) -> Iterator[bytes]:
+        """Stream a user's record and whole chat history, one page in memory at a time.
+        
+        Yields length-prefixed MessagePack records: the user dict first, then
+        a list of message dicts per history page, newest page first. Feed it
+        to SecurityManager.encrypt_export for an encrypted export.
+        """
+        user = self.get_user(user_id)
+        if user is None:
+            return
+        yield _export_record(user.to_dict())
+        before = None
+        while True:
+            messages, before = self.chat_history.page(user_id, page_size, before)
+            if messages:
+                yield _export_record([message.to_dict() for message in messages])
+            if before is None:
+                break
+    
+    def delete_user(self, user_id: str) -> None:
+        self.indexes.remove(user_id)
+        self.users.delete(user_id)
+        self.chat_history.delete(user_id)
+        self.vitals.delete(user_id)
+        if self.users.cipher is not None:
+            self.users.cipher.forget(user_id)
+        with self._cache_lock:
+            self._cache.pop(user_id, None)
+    
+    def flush(self) -> None:
+        try:
+            self.users.flush()
+        except UnwrittenUsersError as e:
+            self._reindex_stored(e.errors)
+            raise
+    
+    def close(self) -> None:
+        self.users.close()
+        self.chat_history.close()
+        self.vitals.close()
+        self.scheduler.close()
+
+def _export_record(record) -> bytes:
+    data = packb(record)
+    return struct.pack(">I", len(data)) + data
+
+def read_export(chunks: Iterable[bytes]) -> Iterator:
+    """Parse the records of an export_user stream (however it was chunked)."""
+    buffer = bytearray()
+    for chunk in chunks:
+        buffer += chunk
+        while len(buffer) >= 4:
+            size = struct.unpack_from(">I", buffer)[0]
+            if len(buffer) < 4 + size:
+                break
+            record = unpackb(bytes(buffer[4:4 + size]))
+            del buffer[:4 + size]
+            yield record
+    if buffer:
+        raise ValueError("Export stream is truncated")
@@ -0,0 +1,85 @@
+import heapq
+import math
+from typing import Dict, Iterable, List, Tuple
+
+class SymptomIndex:
+    """Inverted index from symptom to conditions with TF-IDF ranked lookups.
+    
+    Only the postings of the queried symptoms are visited, so a lookup costs
+    O(matching conditions) rather than O(all conditions). Symptoms shared by
+    many conditions (cough) get a low IDF weight and specific ones (rash) a
+    high one; each condition's vector norm is precomputed so the cosine score
+    needs no pass over the condition's own symptom list.
+    """
+    
+    def __init__(self, conditions: Dict[str, Dict] = None):
+        self.postings = {}
+        self.condition_symptoms = {}
+        self.condition_order = {}
+        self._next_order = 0
+        self.idf = {}
+        self.norms = {}
+        self._dirty = False
+        for condition, data in (conditions or {}).items():
+            self.add_condition(condition, data["symptoms"])
+    
+    def add_condition(self, condition: str, symptoms: Iterable[str]) -> None:
+        self.remove_condition(condition)
+        symptom_set = frozenset(symptoms)
+        self.condition_symptoms[condition] = symptom_set
+        self.condition_order[condition] = self._next_order
+        self._next_order += 1
+        for symptom in symptom_set:
+            self.postings.setdefault(symptom, set()).add(condition)
+        self._dirty = True
+    
+    def remove_condition(self, condition: str) -> None:
+        symptom_set = self.condition_symptoms.pop(condition, None)
+        if symptom_set is None:
+            return
+        del self.condition_order[condition]
+        for symptom in symptom_set:
+            conditions = self.postings[symptom]
+            conditions.discard(condition)
+            if not conditions:
+                del self.postings[symptom]
+        self._dirty = True
+    
+    def _reweight(self) -> None:
+        # IDF depends on the number of conditions, so any change re-weights every symptom
+        condition_count = len(self.condition_symptoms)
+        self.idf = {
+            symptom: math.log((condition_count + 1) / (len(conditions) + 1)) + 1.0
+            for symptom, conditions in self.postings.items()
+        }
+        self.norms = {
+            condition: math.sqrt(sum(self.idf[symptom] ** 2 for symptom in symptom_set)) or 1.0
+            for condition, symptom_set in self.condition_symptoms.items()
+        }
+        self._dirty = False
+    
+    def rank(self, symptoms: Iterable[str], top_k: int = 3, min_matches: int = 1) -> List[Tuple[str, float, int]]:
+        """Return up to top_k (condition, score, match_count) tuples, best first."""
+        if self._dirty:
+            self._reweight()
+        
+        query = [symptom for symptom in set(symptoms) if symptom in self.postings]
+        if not query:
+            return []
+        query_norm = math.sqrt(sum(self.idf[symptom] ** 2 for symptom in query))
+        
+        scores = {}
+        match_counts = {}
+        for symptom in query:
+            weight = self.idf[symptom] ** 2
+            for condition in self.postings[symptom]:
+                scores[condition] = scores.get(condition, 0.0) + weight
+                match_counts[condition] = match_counts.get(condition, 0) + 1
+        
+        ranked = (
+            (condition, score / (self.norms[condition] * query_norm), match_counts[condition])
+            for condition, score in scores.items()
+            if match_counts[condition] >= min_matches
+        )
+        # Ties go to the condition added first, as in the knowledge base order
+        return heapq.nlargest(top_k, ranked, key=lambda item: (item[1], item[2], -self.condition_order[item[0]]))
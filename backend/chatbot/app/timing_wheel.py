@@ -0,0 +1,88 @@
+import heapq
+from typing import Any, List
+
+class TimingWheel:
+    """Hierarchical timing wheel: O(1) insertion, work per tick proportional to what expires.
+    
+    Time is counted in ticks of tick seconds. Level 0 has one slot per tick
+    for the next `slots` ticks; each level above covers `slots` times the
+    span of the one below with slots just as coarse. An item goes into the
+    coarsest level that still distinguishes its expiry; when the wheel's
+    clock reaches the start of a coarse slot, that slot's items cascade
+    down to finer levels, reaching level 0 in their final tick. Items due
+    beyond the top level's span wait in a heap until they come in range.
+    
+    Not thread-safe; callers serialize add() and advance().
+    """
+    
+    def __init__(self, start: float, tick: float = 60.0, slot_bits: int = 6, levels: int = 4):
+        self.tick = tick
+        self.slot_bits = slot_bits
+        self.mask = (1 << slot_bits) - 1
+        self.levels = levels
+        self.horizon = 1 << (slot_bits * levels)
+        self.current = int(start // tick)
+        self.wheels = [[[] for _ in range(1 << slot_bits)] for _ in range(levels)]
+        self._overflow = []
+        self._overdue = []
+        self._size = 0
+    
+    def add(self, when: float, item: Any) -> None:
+        self._size += 1
+        expires = int(when // self.tick)
+        delta = expires - self.current
+        if 0 < delta < self.horizon:
+            # _insert's common case, inlined: this is the hot path when scheduling in bulk
+            level = (delta.bit_length() - 1) // self.slot_bits
+            self.wheels[level][(expires >> (self.slot_bits * level)) & self.mask].append((expires, item))
+        else:
+            self._insert(expires, item)
+    
+    def _insert(self, expires: int, item: Any) -> None:
+        delta = expires - self.current
+        if delta <= 0:
+            self._overdue.append(item)
+            return
+        if delta >= self.horizon:
+            heapq.heappush(self._overflow, (expires, id(item), item))
+            return
+        # The coarsest level whose slots are no wider than delta
+        level = (delta.bit_length() - 1) // self.slot_bits
+        self.wheels[level][(expires >> (self.slot_bits * level)) & self.mask].append((expires, item))
+    
+    def advance(self, now: float) -> List[Any]:
+        """Move the clock to now and return every item that expired, in expiry-tick order."""
+        target = int(now // self.tick)
+        expired = self._overdue
+        self._overdue = []
+        while self.current < target:
+            self.current += 1
+            current = self.current
+            # Cascade from the coarsest level whose slot boundary this tick is on
+            if not current & self.mask:
+                top = 1
+                while top < self.levels - 1 and not (current >> (self.slot_bits * top)) & self.mask:
+                    top += 1
+                if top == self.levels - 1 and not (current >> (self.slot_bits * top)) & self.mask:
+                    while self._overflow and self._overflow[0][0] - current < self.horizon:
+                        expires, _, item = heapq.heappop(self._overflow)
+                        self._insert(expires, item)
+                for level in range(top, 0, -1):
+                    bucket = self.wheels[level][(current >> (self.slot_bits * level)) & self.mask]
+                    if bucket:
+                        self.wheels[level][(current >> (self.slot_bits * level)) & self.mask] = []
+                        for expires, item in bucket:
+                            self._insert(expires, item)
+                # Items due exactly now land in _overdue as they come down
+                if self._overdue:
+                    expired.extend(self._overdue)
+                    self._overdue = []
+            bucket = self.wheels[0][current & self.mask]
+            if bucket:
+                self.wheels[0][current & self.mask] = []
+                expired.extend(item for _, item in bucket)
+        self._size -= len(expired)
+        return expired
+    
+    def __len__(self) -> int:
+        return self._size
@@ -0,0 +1,368 @@
+import math
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from urllib.parse import parse_qsl, urlparse
+from .backends import SQLitePool
+from .codec import packb, unpackb
+
+# metric -> (field names, unit)
+METRICS = {
+    "blood_pressure": (("systolic", "diastolic"), "mmHg"),
+    "weight": (("weight",), "kg"),
+    "glucose": (("glucose",), "mg/dL"),
+    "heart_rate": (("heart_rate",), "bpm"),
+}
+
+DAY = 86400
+WEEK = 7 * DAY
+# The epoch was a Thursday; weeks start on Monday (UTC)
+WEEK_OFFSET = -3 * DAY
+
+# A point is (timestamp, values), one value per field of its metric
+Point = Tuple[float, Sequence[float]]
+
+class _Rollup:
+    """Fixed-width buckets (count, sum, min, max per field) in parallel arrays, ordered by start."""
+    
+    __slots__ = ("width", "offset", "starts", "counts", "sums", "mins", "maxs")
+    
+    def __init__(self, width: int, offset: int, fields: int):
+        self.width = width
+        self.offset = offset
+        self.starts = array("q")
+        self.counts = array("q")
+        self.sums = [array("d") for _ in range(fields)]
+        self.mins = [array("d") for _ in range(fields)]
+        self.maxs = [array("d") for _ in range(fields)]
+    
+    def floor(self, timestamp: float) -> int:
+        return int((timestamp - self.offset) // self.width) * self.width + self.offset
+    
+    def ceil(self, timestamp: float) -> int:
+        return int(math.ceil((timestamp - self.offset) / self.width)) * self.width + self.offset
+    
+    def add(self, timestamp: float, values: Sequence[float]) -> None:
+        start = self.floor(timestamp)
+        starts = self.starts
+        # Points almost always land in the newest bucket or open the next one
+        if starts and starts[-1] == start:
+            i = len(starts) - 1
+        else:
+            i = len(starts) if not starts or start > starts[-1] else bisect_left(starts, start)
+            if i == len(starts) or starts[i] != start:
+                starts.insert(i, start)
+                self.counts.insert(i, 0)
+                for field, value in enumerate(values):
+                    self.sums[field].insert(i, 0.0)
+                    self.mins[field].insert(i, value)
+                    self.maxs[field].insert(i, value)
+        self.counts[i] += 1
+        for field, value in enumerate(values):
+            self.sums[field][i] += value
+            if value < self.mins[field][i]:
+                self.mins[field][i] = value
+            if value > self.maxs[field][i]:
+                self.maxs[field][i] = value
+    
+    def buckets(self, start: int, end: int) -> Tuple[int, int]:
+        """Index range of the buckets starting in [start, end)."""
+        return bisect_left(self.starts, start), bisect_left(self.starts, end)
+
+class _Stats:
+    __slots__ = ("count", "sums", "mins", "maxs")
+    
+    def __init__(self, fields: int):
+        self.count = 0
+        self.sums = [0.0] * fields
+        self.mins = [math.inf] * fields
+        self.maxs = [-math.inf] * fields
+    
+    def add_buckets(self, rollup: _Rollup, i: int, j: int) -> None:
+        if i >= j:
+            return
+        self.count += sum(rollup.counts[i:j])
+        for field in range(len(self.sums)):
+            self.sums[field] += sum(rollup.sums[field][i:j])
+            self.mins[field] = min(self.mins[field], min(rollup.mins[field][i:j]))
+            self.maxs[field] = max(self.maxs[field], max(rollup.maxs[field][i:j]))
+    
+    def add_points(self, columns: List[array], i: int, j: int) -> None:
+        if i >= j:
+            return
+        self.count += j - i
+        for field, column in enumerate(columns):
+            values = column[i:j]
+            self.sums[field] += sum(values)
+            self.mins[field] = min(self.mins[field], min(values))
+            self.maxs[field] = max(self.maxs[field], max(values))
+
+class _Series:
+    """One user's readings of one metric: a timestamp column, a column per
+    field, and daily and weekly rollups kept current on every append."""
+    
+    __slots__ = ("times", "columns", "daily", "weekly")
+    
+    def __init__(self, fields: int):
+        self.times = array("d")
+        self.columns = [array("d") for _ in range(fields)]
+        self.daily = _Rollup(DAY, 0, fields)
+        self.weekly = _Rollup(WEEK, WEEK_OFFSET, fields)
+    
+    def append(self, timestamp: float, values: Sequence[float]) -> None:
+        times = self.times
+        if not times or timestamp >= times[-1]:
+            times.append(timestamp)
+            for column, value in zip(self.columns, values):
+                column.append(value)
+        else:
+            # Late (backdated) readings are rare; keep the columns sorted
+            i = bisect_right(times, timestamp)
+            times.insert(i, timestamp)
+            for column, value in zip(self.columns, values):
+                column.insert(i, value)
+        self.daily.add(timestamp, values)
+        self.weekly.add(timestamp, values)
+    
+    def _add_raw(self, stats: _Stats, start: float, end: float) -> None:
+        stats.add_points(self.columns, bisect_left(self.times, start), bisect_left(self.times, end))
+    
+    def summarize(self, start: float, end: float) -> _Stats:
+        """Aggregate [start, end): whole weeks from the weekly rollup, whole
+        days around them from the daily one, raw points only for the
+        partial days at either end."""
+        stats = _Stats(len(self.columns))
+        day_start, day_end = self.daily.ceil(start), self.daily.floor(end)
+        if day_start >= day_end:
+            self._add_raw(stats, start, end)
+            return stats
+        self._add_raw(stats, start, day_start)
+        self._add_raw(stats, day_end, end)
+        week_start, week_end = self.weekly.ceil(day_start), self.weekly.floor(day_end)
+        if week_start < week_end:
+            stats.add_buckets(self.daily, *self.daily.buckets(day_start, week_start))
+            stats.add_buckets(self.weekly, *self.weekly.buckets(week_start, week_end))
+            stats.add_buckets(self.daily, *self.daily.buckets(week_end, day_end))
+        else:
+            stats.add_buckets(self.daily, *self.daily.buckets(day_start, day_end))
+        return stats
+
+def _describe(metric: str, stats: _Stats, start: float, end: float) -> Dict:
+    fields, unit = METRICS[metric]
+    summary = {"metric": metric, "unit": unit, "start": start, "end": end, "count": stats.count}
+    if stats.count:
+        summary["fields"] = {
+            name: {"mean": stats.sums[i] / stats.count, "min": stats.mins[i], "max": stats.maxs[i]}
+            for i, name in enumerate(fields)
+        }
+    return summary
+
+class _UserVitals:
+    """A user's series (None until loaded), their lock, and how many callers are using them."""
+    
+    __slots__ = ("series", "lock", "active")
+    
+    def __init__(self):
+        self.series = None
+        self.lock = threading.Lock()
+        self.active = 0
+
+class VitalsStore:
+    """Per-user time series of vital signs (see METRICS), held in memory.
+    
+    Readings are appended to columnar arrays per user and metric, and each
+    append also updates that series' daily and weekly rollups, so a range
+    query ("my glucose over the last 30 days") is answered from a handful
+    of precomputed buckets instead of a scan of every reading. Days and
+    weeks are UTC; weeks start on Monday.
+    
+    Each user's series has its own lock; the store-wide one only guards
+    the user map, so loading, persisting and sealing one user's readings
+    never waits on another's. With max_users, the least recently used
+    users' series are dropped from memory past that many (only stores
+    that can load them back should set it).
+    """
+    
+    def __init__(self, max_users: Optional[int] = None):
+        self.max_users = max_users
+        self._series = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def _load(self, user_id: str) -> Iterable[Tuple[str, float, Sequence[float]]]:
+        return ()
+    
+    def _persist(self, user_id: str, metric: str, points: List[Point]) -> None:
+        pass
+    
+    @contextmanager
+    def _user_series(self, user_id: str) -> Iterator[Dict[str, _Series]]:
+        """Hold the user's lock and yield their series, loaded on first use."""
+        with self._lock:
+            user = self._series.get(user_id)
+            if user is None:
+                user = self._series[user_id] = _UserVitals()
+                self._evict()
+            else:
+                self._series.move_to_end(user_id)
+            # Series in use are never evicted, so an append can't land in a dropped copy
+            user.active += 1
+        try:
+            with user.lock:
+                if user.series is None:
+                    series = {}
+                    for metric, timestamp, values in self._load(user_id):
+                        self._append(series, metric, timestamp, values)
+                    user.series = series
+                yield user.series
+        finally:
+            with self._lock:
+                user.active -= 1
+    
+    def _evict(self) -> None:
+        # Caller holds the lock
+        if self.max_users is None:
+            return
+        excess = len(self._series) - self.max_users
+        idle = []
+        for user_id, user in self._series.items():
+            if len(idle) >= excess:
+                break
+            if not user.active:
+                idle.append(user_id)
+        for user_id in idle:
+            del self._series[user_id]
+    
+    @staticmethod
+    def _append(series: Dict[str, _Series], metric: str, timestamp: float, values: Sequence[float]) -> None:
+        metric_series = series.get(metric)
+        if metric_series is None:
+            metric_series = series[metric] = _Series(len(METRICS[metric][0]))
+        metric_series.append(timestamp, values)
+    
+    def record(self, user_id: str, metric: str, values: Sequence[float], timestamp: Optional[float] = None) -> None:
+        self.record_many(user_id, metric, [(time.time() if timestamp is None else timestamp, values)])
+    
+    def record_many(self, user_id: str, metric: str, points: Iterable[Point]) -> None:
+        if metric not in METRICS:
+            raise ValueError(f"Unknown metric: {metric}")
+        fields = len(METRICS[metric][0])
+        points = [(float(timestamp), [float(value) for value in values]) for timestamp, values in points]
+        for _, values in points:
+            if len(values) != fields:
+                raise ValueError(f"{metric} readings have {fields} value(s), got {len(values)}")
+        if not points:
+            return
+        with self._user_series(user_id) as series:
+            self._persist(user_id, metric, points)
+            for timestamp, values in points:
+                self._append(series, metric, timestamp, values)
+    
+    def summary(self, user_id: str, metric: str, start: float, end: Optional[float] = None) -> Dict:
+        """Count and per-field mean/min/max of the readings in [start, end) (end defaults to now)."""
+        end = time.time() if end is None else end
+        with self._user_series(user_id) as series:
+            metric_series = series.get(metric)
+            stats = metric_series.summarize(start, end) if metric_series else _Stats(len(METRICS[metric][0]))
+            return _describe(metric, stats, start, end)
+    
+    def rollup(self, user_id: str, metric: str, start: float, end: Optional[float] = None,
+               resolution: str = "day") -> List[Dict]:
+        """Per-day or per-week summaries of the buckets starting in [start, end), oldest first."""
+        end = time.time() if end is None else end
+        with self._user_series(user_id) as series:
+            metric_series = series.get(metric)
+            if metric_series is None:
+                return []
+            rollup = metric_series.daily if resolution == "day" else metric_series.weekly
+            first, last = rollup.buckets(rollup.floor(start), end)
+            summaries = []
+            for i in range(first, last):
+                stats = _Stats(len(rollup.sums))
+                stats.add_buckets(rollup, i, i + 1)
+                summaries.append(_describe(metric, stats, rollup.starts[i], rollup.starts[i] + rollup.width))
+            return summaries
+    
+    def latest(self, user_id: str, metric: str) -> Optional[Point]:
+        with self._user_series(user_id) as series:
+            metric_series = series.get(metric)
+            if not metric_series or not metric_series.times:
+                return None
+            return metric_series.times[-1], [column[-1] for column in metric_series.columns]
+    
+    def metrics(self, user_id: str) -> List[str]:
+        with self._user_series(user_id) as series:
+            return sorted(series)
+    
+    def delete(self, user_id: str) -> None:
+        with self._lock:
+            self._series.pop(user_id, None)
+    
+    def close(self) -> None:
+        pass
+
+class SQLiteVitalsStore(VitalsStore):
+    """Vitals persisted as an insert-only SQLite table indexed by (user_id, ts).
+    
+    A user's series and rollups are built in memory from their rows on
+    first access and kept current by later appends, so queries never go
+    back to SQLite while the user stays among the max_users most recently
+    used. With a cipher (an EnvelopeCipher) reading values are stored
+    encrypted.
+    """
+    
+    def __init__(self, path: str, pool_size: int = 4, cipher=None, max_users: int = 10_000):
+        super().__init__(max_users)
+        self.cipher = cipher
+        self._pool = SQLitePool(path, pool_size)
+        with self._pool.connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS vitals ("
+                " user_id TEXT NOT NULL,"
+                " metric TEXT NOT NULL,"
+                " ts REAL NOT NULL,"
+                " vals BLOB NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS vitals_user ON vitals (user_id, ts)")
+    
+    def _load(self, user_id: str) -> Iterable[Tuple[str, float, Sequence[float]]]:
+        with self._pool.connection() as conn:
+            rows = conn.execute("SELECT metric, ts, vals FROM vitals WHERE user_id = ? ORDER BY ts", (user_id,)).fetchall()
+        blobs = [row[2] for row in rows]
+        if self.cipher is not None and blobs:
+            blobs = self.cipher.open_many(user_id, blobs)
+        return [(metric, timestamp, unpackb(blob)) for (metric, timestamp, _), blob in zip(rows, blobs)]
+    
+    def _persist(self, user_id: str, metric: str, points: List[Point]) -> None:
+        blobs = [packb(values) for _, values in points]
+        if self.cipher is not None:
+            blobs = self.cipher.seal_many(user_id, blobs)
+        with self._pool.transaction() as conn:
+            conn.executemany(
+                "INSERT INTO vitals (user_id, metric, ts, vals) VALUES (?, ?, ?, ?)",
+                [(user_id, metric, timestamp, blob) for (timestamp, _), blob in zip(points, blobs)]
+            )
+    
+    def delete(self, user_id: str) -> None:
+        with self._pool.connection() as conn:
+            conn.execute("DELETE FROM vitals WHERE user_id = ?", (user_id,))
+        super().delete(user_id)
+    
+    def close(self) -> None:
+        self._pool.close()
+
+def create_vitals(url: str = "memory://", cipher=None) -> VitalsStore:
+    """Build a vitals store from a URL: memory:// or sqlite:///path/to.db (cipher encrypts SQLite rows).
+    
+    SQLite URLs take pool_size and max_users query options.
+    """
+    parsed = urlparse(url)
+    options = {key: int(value) for key, value in parse_qsl(parsed.query)}
+    if parsed.scheme in ("", "memory"):
+        return VitalsStore()
+    if parsed.scheme == "sqlite":
+        return SQLiteVitalsStore(parsed.netloc + parsed.path[1:], cipher=cipher, **options)
+    raise ValueError(f"Unsupported vitals store URL: {url}")
@@ -0,0 +1,144 @@
+"""Cost of encrypting health data and chat history at rest.
+  
+  update_user  SQLite-backed DataStore.update_user: plaintext, sealed under
+               the cached envelope data key, and with the key cache
+               disabled (a fresh data key wrapped per write)
+  bulk         sealing a page of chat messages: seal_many (one key lookup,
+               one cipher context) vs one seal call per message vs a new
+               AESGCM context per message
+  export       DataStore.export_user through SecurityManager.encrypt_export
+               for a long history: throughput and peak memory
+
+Run from backend/chatbot:  python benchmarks/bench_encryption.py [updates]
+"""
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from app.backends import SQLiteUserBackend
+from app.crypto import EnvelopeCipher
+from app.history import SQLiteChatHistory
+from app.models import ChatMessage, User
+from app.security import SecurityManager
+from app.store import DataStore, read_export
+
+USERS = 1000
+
+def sample_user(i: int) -> User:
+    user = User(f"user-{i}", f"User {i}", f"user{i}@example.com", "01/01/1990")
+    user.health_data = {"blood_pressure": [[1700000000 + day, 120, 80] for day in range(30)], "weight": 72.5}
+    user.appointments = [{"appointment_id": f"appointment-{i}", "doctor": "Dr. Smith", "date_time": "2026-11-02T10:00:00", "reason": "checkup", "status": "scheduled"}]
+    user.medications = [{"name": "lisinopril", "dosage": "10 mg", "frequency": "once daily", "start_date": "2026-01-01"}]
+    return user
+
+def time_updates(directory: str, label: str, cipher, updates: int) -> float:
+    data_store = DataStore(SQLiteUserBackend(os.path.join(directory, f"{label}.db"), cipher=cipher))
+    users = [sample_user(i) for i in range(USERS)]
+    data_store.create_users(users)
+    start = time.perf_counter()
+    for n in range(updates):
+        user = users[n % USERS]
+        user.health_data["weight"] = 70 + n % 10
+        data_store.update_user(user)
+    elapsed = (time.perf_counter() - start) / updates
+    # Round trip: what was written reads back intact
+    assert DataStore(SQLiteUserBackend(os.path.join(directory, f"{label}.db"), cipher=cipher)).get_user("user-0").medications == users[0].medications
+    data_store.close()
+    return elapsed
+
+def bench_updates(updates: int) -> None:
+    master_key = EnvelopeCipher.generate_master_key()
+    with tempfile.TemporaryDirectory() as directory:
+        plain = time_updates(directory, "plain", None, updates)
+        cached = time_updates(directory, "cached", EnvelopeCipher.from_base64(master_key), updates)
+        uncached = time_updates(directory, "uncached", EnvelopeCipher.from_base64(master_key, cache_size=0), updates)
+    print(f"update_user (SQLite, {updates:,} writes)")
+    print(f"  plaintext            {plain * 1e6:8.1f} us")
+    print(f"  sealed, cached key   {cached * 1e6:8.1f} us  (+{(cached - plain) * 1e6:.1f} us, {cached / plain - 1:+.0%})")
+    print(f"  sealed, no key cache {uncached * 1e6:8.1f} us  (+{(uncached - plain) * 1e6:.1f} us, {uncached / plain - 1:+.0%})")
+    
+    # The serialization step alone, without SQLite's share of the write
+    user = sample_user(0)
+    for label, cipher in (("plaintext", None), ("sealed, cached key", EnvelopeCipher.from_base64(master_key)),
+                          ("sealed, no key cache", EnvelopeCipher.from_base64(master_key, cache_size=0))):
+        start = time.perf_counter()
+        for _ in range(updates):
+            user.to_bytes(cipher)
+        print(f"  to_bytes, {label:20} {(time.perf_counter() - start) / updates * 1e6:6.1f} us")
+
+def bench_bulk(messages: int = 100_000, page: int = 100) -> None:
+    cipher = EnvelopeCipher.from_base64(EnvelopeCipher.generate_master_key())
+    texts = [f"Message {i}: I have had a cough and a mild fever since Tuesday".encode() for i in range(messages)]
+    key = os.urandom(32)
+    
+    start = time.perf_counter()
+    for i in range(0, messages, page):
+        cipher.seal_many("user-1", texts[i:i + page])
+    bulk = (time.perf_counter() - start) / messages
+    
+    start = time.perf_counter()
+    for text in texts:
+        cipher.seal("user-1", text)
+    single = (time.perf_counter() - start) / messages
+    
+    start = time.perf_counter()
+    for text in texts:
+        nonce = os.urandom(12)
+        AESGCM(key).encrypt(nonce, text, b"user-1")
+    fresh = (time.perf_counter() - start) / messages
+    
+    print(f"sealing {messages:,} chat messages")
+    print(f"  seal_many, pages of {page}   {bulk * 1e6:6.2f} us/message")
+    print(f"  seal per message          {single * 1e6:6.2f} us/message")
+    print(f"  new AESGCM per message    {fresh * 1e6:6.2f} us/message")
+
+def bench_export(messages: int = 200_000) -> None:
+    cipher = EnvelopeCipher.from_base64(EnvelopeCipher.generate_master_key())
+    security_manager = SecurityManager(cipher=cipher)
+    with tempfile.TemporaryDirectory() as directory:
+        history = SQLiteChatHistory(os.path.join(directory, "history.db"), max_messages=None, cipher=cipher)
+        data_store = DataStore(history=history)
+        data_store.create_user(sample_user(1))
+        batch = [ChatMessage("user" if i % 2 == 0 else "bot", f"Message {i}: how is the cough today?") for i in range(messages)]
+        for i in range(0, messages, 10_000):
+            data_store.append_chat_messages("user-1", batch[i:i + 10_000])
+        del batch
+        
+        export_path = os.path.join(directory, "export.bin")
+        
+        def export() -> int:
+            size = 0
+            with open(export_path, "wb") as out:
+                for frame in security_manager.encrypt_export("user-1", data_store.export_user("user-1")):
+                    out.write(frame)
+                    size += len(frame)
+            return size
+        
+        start = time.perf_counter()
+        size = export()
+        elapsed = time.perf_counter() - start
+        tracemalloc.start()
+        export()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        
+        with open(export_path, "rb") as f:
+            chunks = iter(lambda: f.read(64 * 1024), b"")
+            records = list(read_export(security_manager.decrypt_export("user-1", chunks)))
+        assert sum(len(record) for record in records[1:]) == messages
+        data_store.close()
+    print(f"encrypted export of {messages:,} messages: {size / 1e6:.1f} MB in {elapsed:.2f}s "
+          f"({size / 1e6 / elapsed:.1f} MB/s), peak memory {peak / 1e6:.1f} MB")
+
+def main(updates: int = 20_000):
+    bench_updates(updates)
+    bench_bulk()
+    bench_export()
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20_000)
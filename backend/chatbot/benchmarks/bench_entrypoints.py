@@ -0,0 +1,115 @@
+"""Replay scripted conversations through every chatbot entry point and report turns/sec.
+
+Entry points: the CLI facade (HealthcareChatbot), the Flask routes
+(init_routes, through the WSGI test client) and the asyncio server
+(AsyncChatServer, through aiohttp's in-process test server). All three run
+on the same app package, so the numbers differ only by serving overhead.
+
+Every conversation starts as a guest and onboards in chat, the way a new
+user would; email addresses get a per-copy "+n" tag so each copy creates
+its own account. Turns with a "reply_contains" field are checked against
+the reply, so an entry point that drops the session after onboarding
+fails the run rather than just posting a turn rate.
+
+Run from backend/chatbot:  python benchmarks/bench_entrypoints.py [repeat]
+"""
+import asyncio
+import json
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Turn throughput is what's measured here: make password hashing in
+# onboarding cheap (bench_login_storm.py covers the cost of real hashing)
+os.environ.setdefault("CHATBOT_SCRYPT_N", "16")
+
+from flask import Flask
+from aiohttp.test_utils import TestClient, TestServer
+from app import create_services
+from app.async_server import AsyncChatServer
+from healthcare_chatbot import HealthcareChatbot
+from main import init_routes
+
+CONVERSATIONS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "conversations.jsonl")
+
+EMAIL = re.compile(r"^([^@\s]+)@([^@\s]+)$")
+
+def load_conversations(path: str = CONVERSATIONS_PATH):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def scripted_turns(conversation, copy: int):
+    for turn in conversation["turns"]:
+        message = EMAIL.sub(rf"\1+{copy}@\2", turn["message"]) if copy else turn["message"]
+        yield message, turn.get("reply_contains")
+
+def check_reply(conversation, message, expected, reply):
+    if expected is not None and expected not in reply:
+        raise AssertionError(f"{conversation['id']}: {message!r} got {reply!r}, expected it to contain {expected!r}")
+
+def replay_cli(conversations, repeat):
+    chatbot = HealthcareChatbot()
+    turns = 0
+    start = time.perf_counter()
+    for round_number in range(repeat):
+        for index, conversation in enumerate(conversations):
+            session_token = chatbot.start_guest_session()
+            for message, expected in scripted_turns(conversation, round_number * len(conversations) + index):
+                check_reply(conversation, message, expected, chatbot.process_message(session_token, message))
+                turns += 1
+    return turns / (time.perf_counter() - start)
+
+def replay_flask(conversations, repeat):
+    app = Flask(__name__)
+    init_routes(app, *create_services())
+    client = app.test_client()
+    turns = 0
+    start = time.perf_counter()
+    for round_number in range(repeat):
+        for index, conversation in enumerate(conversations):
+            # The first turn has no token; the guest token it returns carries the rest
+            headers = {}
+            for message, expected in scripted_turns(conversation, round_number * len(conversations) + index):
+                data = client.post("/api/message", json={"message": message}, headers=headers).get_json()
+                headers = {"X-Session-Token": data["session_token"]}
+                check_reply(conversation, message, expected, data["response"])
+                turns += 1
+    return turns / (time.perf_counter() - start)
+
+async def _replay_async(conversations, repeat):
+    server = AsyncChatServer(*create_services())
+    async with TestClient(TestServer(server.make_app())) as client:
+        async def conversation_turns(copy, conversation):
+            headers = {}
+            for message, expected in scripted_turns(conversation, copy):
+                response = await client.post("/api/message", json={"message": message}, headers=headers)
+                data = await response.json()
+                headers = {"X-Session-Token": data["session_token"]}
+                check_reply(conversation, message, expected, data["response"])
+            return len(conversation["turns"])
+        
+        start = time.perf_counter()
+        # Conversations run concurrently within a round, one round at a time
+        turns = 0
+        for round_number in range(repeat):
+            counts = await asyncio.gather(*(
+                conversation_turns(round_number * len(conversations) + index, conversation)
+                for index, conversation in enumerate(conversations)
+            ))
+            turns += sum(counts)
+        return turns / (time.perf_counter() - start)
+
+def replay_async(conversations, repeat):
+    return asyncio.run(_replay_async(conversations, repeat))
+
+def main(repeat: int = 200):
+    conversations = load_conversations()
+    turn_count = sum(len(conversation["turns"]) for conversation in conversations)
+    print(f"{len(conversations)} conversations, {turn_count} turns, x{repeat}")
+    for label, replay in (("cli", replay_cli), ("flask", replay_flask), ("async", replay_async)):
+        print(f"  {label:6} {replay(conversations, repeat):10,.0f} turns/s")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
@@ -0,0 +1,133 @@
+"""Typo-tolerant symptom matching: trigram index vs brute-force edit distance.
+
+Builds a synthetic knowledge base of symptom phrases, misspells one of them
+inside each of a set of chat-like messages and finds it two ways:
+FuzzyPhraseIndex (trigram candidates per word, bounded distance, memoized)
+and the naive approach of computing the edit distance from every message
+window to every KB phrase. Reports time per message and how often each
+recovers the phrase that was misspelled.
+
+Run from backend/chatbot:  python benchmarks/bench_fuzzy_symptoms.py [phrase_count]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.fuzzy import FuzzyPhraseIndex, _WORD, edit_distance, similarity
+from app.nlp import NLPEngine
+from app.store import DataStore
+
+QUALIFIERS = ["sore", "sharp", "dull", "chronic", "mild", "severe", "itchy", "swollen", "stiff", "burning",
+              "lower", "upper", "persistent", "sudden", "recurring", "dry", "painful", "tender", "numb", "aching"]
+PARTS = ["throat", "back", "knee", "shoulder", "stomach", "chest", "ankle", "wrist", "neck", "eyes", "skin",
+         "joints", "muscles", "head", "ears", "gums", "feet", "hands", "hip", "elbow", "jaw", "spine", "scalp"]
+NOUNS = ["pain", "rash", "swelling", "cramps", "ache", "stiffness", "tingling", "weakness", "bruising", "redness"]
+FILLER = "i have had a since yesterday and it is getting worse my feels really bad today also some".split()
+
+def synthetic_phrases(count: int, rng: random.Random):
+    phrases = set()
+    while len(phrases) < count:
+        shape = rng.random()
+        if shape < 0.4:
+            phrase = f"{rng.choice(QUALIFIERS)} {rng.choice(PARTS)}"
+        elif shape < 0.8:
+            phrase = f"{rng.choice(PARTS)} {rng.choice(NOUNS)}"
+        else:
+            phrase = f"{rng.choice(QUALIFIERS)} {rng.choice(PARTS)} {rng.choice(NOUNS)}"
+        phrases.add(phrase)
+    return sorted(phrases)
+
+def misspell(phrase: str, rng: random.Random) -> str:
+    chars = list(phrase)
+    i = rng.randrange(len(chars) - 1)
+    edit = rng.choice(("swap", "drop", "double", "replace"))
+    if edit == "swap":
+        chars[i], chars[i + 1] = chars[i + 1], chars[i]
+    elif edit == "drop":
+        del chars[i]
+    elif edit == "double":
+        chars.insert(i, chars[i])
+    else:
+        chars[i] = rng.choice("aeiou")
+    return "".join(chars)
+
+def brute_force_find_all(phrases, max_words, message, min_score=0.75, min_length=4):
+    # Same windows and selection as FuzzyPhraseIndex.find_all, but every window against every phrase
+    text = message.lower()
+    words = [(match.start(), match.end()) for match in _WORD.finditer(text)]
+    found = []
+    for i in range(len(words)):
+        for j in range(i, min(i + max_words, len(words))):
+            start, end = words[i][0], words[j][1]
+            window = " ".join(text[word_start:word_end] for word_start, word_end in words[i:j + 1])
+            if len(window) < min_length:
+                continue
+            scored = [(similarity(window, phrase, edit_distance(window, phrase)), phrase) for phrase in phrases]
+            matches = [(score, phrase) for score, phrase in scored if score >= min_score - 1e-9]
+            if matches:
+                score, phrase = min(matches, key=lambda match: (-match[0], match[1]))
+                found.append((score, end - start, start, end, phrase))
+    chosen = []
+    for score, _, start, end, phrase in sorted(found, key=lambda item: (-item[0] * item[1], -item[0], item[2])):
+        if all(end <= other_start or other_end <= start for other_start, other_end, _, _ in chosen):
+            chosen.append((start, end, phrase, score))
+    chosen.sort()
+    return chosen
+
+def main(phrase_count: int = 2000, message_count: int = 200):
+    rng = random.Random(7)
+    phrases = synthetic_phrases(phrase_count, rng)
+    start = time.perf_counter()
+    index = FuzzyPhraseIndex(phrases)
+    build = time.perf_counter() - start
+    
+    messages = []
+    planted = []
+    for _ in range(message_count):
+        words = rng.sample(FILLER, 6)
+        planted.append(rng.choice(phrases))
+        words.insert(rng.randrange(len(words)), misspell(planted[-1], rng))
+        messages.append(" ".join(words))
+    
+    start = time.perf_counter()
+    indexed = [index.find_all(message) for message in messages]
+    indexed_time = (time.perf_counter() - start) / message_count
+    
+    # Without the per-word memo: every message starts cold
+    start = time.perf_counter()
+    for message in messages:
+        index._memo.clear()
+        index.find_all(message)
+    cold_time = (time.perf_counter() - start) / message_count
+    
+    sample = messages[:20]
+    start = time.perf_counter()
+    brute = [brute_force_find_all(phrases, index.max_words, message) for message in sample]
+    brute_time = (time.perf_counter() - start) / len(sample)
+    
+    def recall(results):
+        return sum(1 for found, phrase in zip(results, planted) if any(match[2] == phrase for match in found)) / len(results)
+    
+    sample_recall = f"recovers {recall(brute):.0%} vs index {recall(indexed[:len(sample)]):.0%} on the first {len(sample)}"
+    
+    print(f"{len(phrases):,} KB phrases, index built in {build * 1000:.1f} ms; {message_count} messages with one misspelled symptom each")
+    print(f"  brute-force edit distance {brute_time * 1000:10.2f} ms/message   {sample_recall}")
+    print(f"  trigram index             {indexed_time * 1000:10.3f} ms/message   recovers {recall(indexed):.0%} of {message_count}   "
+          f"({brute_time / indexed_time:,.0f}x faster)")
+    print(f"  trigram index, no memo    {cold_time * 1000:10.3f} ms/message")
+    
+    # The real knowledge base, through the NLP engine
+    nlp_engine = NLPEngine(DataStore())
+    message = "I have a feaver, a sore throught and a runy nose"
+    rounds = 2000
+    start = time.perf_counter()
+    for _ in range(rounds):
+        entities = nlp_engine.extract_entities(message, "symptom")
+    print(f"  extract_entities({message!r}): {entities['symptoms']} "
+          f"in {(time.perf_counter() - start) / rounds * 1e6:.0f} us")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
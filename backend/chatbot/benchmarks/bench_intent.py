@@ -0,0 +1,69 @@
+"""Benchmark NLPEngine.detect_intent against the original per-pattern implementation.
+
+Run from backend/chatbot:  python benchmarks/bench_intent.py
+"""
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.store import DataStore
+from app.nlp import NLPEngine
+
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "intent_corpus.txt")
+
+def legacy_detect_intent(data_store: DataStore, message: str):
+    # The original implementation: re.findall per pattern, then a substring scan per emergency term
+    best_intent = "unknown"
+    best_score = 0.0
+    
+    for intent, patterns in data_store.intent_patterns.items():
+        for pattern in patterns:
+            matches = re.findall(pattern, message)
+            if matches:
+                score = len(matches) / len(message.split())
+                if score > best_score:
+                    best_score = score
+                    best_intent = intent
+    
+    for emergency_term in data_store.knowledge_base["emergency_conditions"]:
+        if emergency_term in message.lower():
+            return "emergency", 1.0
+            
+    return best_intent, best_score
+
+def load_corpus():
+    with open(CORPUS_PATH) as f:
+        return [line.rstrip("\n") for line in f if line.strip()]
+
+def messages_per_second(detect, corpus, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for message in corpus:
+            detect(message)
+    return repeat * len(corpus) / (time.perf_counter() - start)
+
+def main(repeat: int = 2000):
+    data_store = DataStore()
+    nlp_engine = NLPEngine(data_store)
+    corpus = load_corpus()
+    
+    mismatches = [
+        (message, legacy_detect_intent(data_store, message), nlp_engine.detect_intent(message))
+        for message in corpus
+        if legacy_detect_intent(data_store, message) != nlp_engine.detect_intent(message)
+    ]
+    for message, expected, actual in mismatches:
+        print(f"MISMATCH {message!r}: legacy={expected} compiled={actual}")
+    
+    legacy = messages_per_second(lambda m: legacy_detect_intent(data_store, m), corpus, repeat)
+    compiled = messages_per_second(nlp_engine.detect_intent, corpus, repeat)
+    print(f"corpus: {len(corpus)} messages, {len(corpus) - len(mismatches)} identical outputs")
+    print(f"legacy:   {legacy:12,.0f} messages/sec")
+    print(f"compiled: {compiled:12,.0f} messages/sec ({compiled / legacy:.2f}x)")
+    return not mismatches
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,86 @@
+"""Trained intent classifier vs the regex IntentMatcher.
+
+Accuracy on held-out labeled messages (fixtures/intent_eval.jsonl, none of
+them in DataStore.intent_examples) and on the labeled turns of
+fixtures/conversations.jsonl, per-message latency (p50/p99) and batch
+throughput through NLPEngine.detect_intent / detect_intents, and the cost
+of training a model versus loading the cached one.
+
+Run from backend/chatbot:  python benchmarks/bench_intent_classifier.py [repeat]
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.intent_classifier import IntentClassifier
+from app.nlp import NLPEngine
+from app.store import DataStore
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+def load_labeled():
+    with open(os.path.join(FIXTURES, "intent_eval.jsonl")) as f:
+        held_out = [(row["message"], row["intent"]) for row in map(json.loads, f)]
+    with open(os.path.join(FIXTURES, "conversations.jsonl")) as f:
+        # Flow replies (names, dates, yes/no) are labeled null: the flow, not intent detection, handles them
+        turns = [(turn["message"], turn["intent"]) for conversation in map(json.loads, f)
+                 for turn in conversation["turns"] if turn["intent"]]
+    return held_out, turns
+
+def accuracy(nlp_engine: NLPEngine, labeled) -> float:
+    return sum(1 for message, intent in labeled if nlp_engine.detect_intent(message)[0] == intent) / len(labeled)
+
+def latencies(nlp_engine: NLPEngine, messages, repeat: int):
+    samples = []
+    for _ in range(repeat):
+        for message in messages:
+            start = time.perf_counter()
+            nlp_engine.detect_intent(message)
+            samples.append(time.perf_counter() - start)
+    samples.sort()
+    return samples[len(samples) // 2], samples[int(len(samples) * 0.99)]
+
+def batch_rate(nlp_engine: NLPEngine, messages, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        nlp_engine.detect_intents(messages)
+    return repeat * len(messages) / (time.perf_counter() - start)
+
+def main(repeat: int = 200):
+    data_store = DataStore()
+    with tempfile.TemporaryDirectory() as cache_dir:
+        start = time.perf_counter()
+        classifier = IntentClassifier.train(data_store.intent_examples, cache_dir=cache_dir)
+        trained = time.perf_counter() - start
+        IntentClassifier._trained.clear()
+        start = time.perf_counter()
+        IntentClassifier.train(data_store.intent_examples, cache_dir=cache_dir)
+        loaded = time.perf_counter() - start
+    examples = sum(len(messages) for messages in data_store.intent_examples.values())
+    print(f"classifier: {examples} examples, {len(classifier.idf):,} features; "
+          f"trained in {trained * 1000:.0f} ms, loaded from cache in {loaded * 1000:.1f} ms")
+    
+    held_out, turns = load_labeled()
+    messages = [message for message, _ in held_out]
+    engines = [("regex", NLPEngine(data_store)), ("classifier", NLPEngine(data_store, classifier))]
+    print(f"{'':12}{'held-out':>10}{'turns':>8}{'p50 us':>9}{'p99 us':>9}{'batch msg/s':>14}")
+    for label, nlp_engine in engines:
+        p50, p99 = latencies(nlp_engine, messages, repeat)
+        print(f"{label:12}{accuracy(nlp_engine, held_out):>10.0%}{accuracy(nlp_engine, turns):>8.0%}"
+              f"{p50 * 1e6:>9.1f}{p99 * 1e6:>9.1f}{batch_rate(nlp_engine, messages, repeat):>14,.0f}")
+    print(f"  ({len(held_out)} held-out messages, {len(turns)} labeled conversation turns)")
+    
+    # Where the two disagree with the label
+    regex, trained_engine = engines[0][1], engines[1][1]
+    for message, intent in held_out:
+        regex_intent = regex.detect_intent(message)[0]
+        classifier_intent = trained_engine.detect_intent(message)[0]
+        if intent not in (regex_intent, classifier_intent) or regex_intent != classifier_intent:
+            print(f"  {message!r:50} label={intent:12} regex={regex_intent:12} classifier={classifier_intent}")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
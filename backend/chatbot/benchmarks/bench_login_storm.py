@@ -0,0 +1,95 @@
+"""Chat latency during a login storm: scrypt in the process pool vs hashed on the event loop.
+
+Chat sessions send messages back to back through the asyncio server while
+a crowd of clients hammers /api/authenticate. Message latency is measured
+with no logins, during a storm with hashing in the SecurityManager pool,
+and during a storm with scrypt run inline on the loop (the naive port of
+the old single-SHA-256 hash_password).
+
+Run from backend/chatbot:  python benchmarks/bench_login_storm.py [seconds]
+"""
+import asyncio
+import os
+import sys
+import time
+from concurrent.futures import Future
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aiohttp.test_utils import TestClient, TestServer
+from app import create_services
+from app.async_server import AsyncChatServer
+from app.models import User
+from app.security import SecurityManager
+
+CHAT_SESSIONS = 20
+STORM_CLIENTS = 50
+USERS = 100
+
+class InlineSecurityManager(SecurityManager):
+    """Hashes on the calling thread, i.e. on the event loop."""
+    
+    def _submit(self, fn, *args) -> Future:
+        future = Future()
+        future.set_result(fn(*args))
+        return future
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] if ordered else float("nan")
+
+async def run_phase(security_manager, storm: bool, seconds: float):
+    dialog_manager, _, active_sessions = create_services()
+    server = AsyncChatServer(dialog_manager, security_manager, active_sessions)
+    password_hash = security_manager.hash_password("correct horse")
+    dialog_manager.data_store.create_users([
+        User(f"user-{i}", f"User {i}", f"user{i}@example.com", "01/01/1990", password_hash) for i in range(USERS)
+    ])
+    
+    latencies = []
+    logins = {}
+    async with TestClient(TestServer(server.make_app())) as client:
+        tokens = []
+        for i in range(CHAT_SESSIONS):
+            response = await client.post("/api/authenticate", json={"email": f"user{i}@example.com", "password": "correct horse"})
+            tokens.append((await response.json())["session_token"])
+        deadline = time.perf_counter() + seconds
+        
+        async def chat(token):
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                response = await client.post("/api/message", json={"message": "What are the symptoms of flu?"},
+                                             headers={"X-Session-Token": token})
+                await response.read()
+                latencies.append(time.perf_counter() - start)
+        
+        async def login(index):
+            while time.perf_counter() < deadline:
+                # Mostly wrong passwords, as in a credential-stuffing burst
+                password = "correct horse" if index % 5 == 0 else "guess"
+                response = await client.post("/api/authenticate", json={"email": f"user{index % USERS}@example.com", "password": password})
+                await response.read()
+                logins[response.status] = logins.get(response.status, 0) + 1
+                if response.status == 503:
+                    await asyncio.sleep(0.01)
+        
+        await asyncio.gather(*(chat(token) for token in tokens),
+                             *(login(index) for index in range(STORM_CLIENTS) if storm))
+    security_manager.close()
+    return latencies, logins
+
+def main(seconds: float = 5.0):
+    phases = (
+        ("no logins", SecurityManager(), False),
+        ("storm, process pool", SecurityManager(), True),
+        ("storm, inline scrypt", InlineSecurityManager(), True),
+    )
+    print(f"{CHAT_SESSIONS} chat sessions, {STORM_CLIENTS} login clients, {seconds:.0f}s per phase, {os.cpu_count()} CPU(s)")
+    for label, security_manager, storm in phases:
+        latencies, logins = asyncio.run(run_phase(security_manager, storm, seconds))
+        statuses = ", ".join(f"{status}: {count}" for status, count in sorted(logins.items())) or "-"
+        print(f"  {label:22} {len(latencies) / seconds:8,.0f} msg/s   p50 {percentile(latencies, 0.50) * 1000:7.1f} ms   "
+              f"p99 {percentile(latencies, 0.99) * 1000:7.1f} ms   logins {statuses}")
+
+if __name__ == "__main__":
+    main(float(sys.argv[1]) if len(sys.argv) > 1 else 5.0)
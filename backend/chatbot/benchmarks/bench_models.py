@@ -0,0 +1,81 @@
+"""Measure memory for holding chat messages, original model vs the slotted one.
+
+Run from backend/chatbot:  python benchmarks/bench_models.py [message_count]
+"""
+import datetime
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.models import ChatMessage
+
+class LegacyChatMessage:
+    # The original model: a __dict__ per instance, a uuid4 string and a datetime
+    def __init__(self, sender: str, message: str, timestamp: datetime.datetime):
+        self.message_id = str(uuid.uuid4())
+        self.sender = sender
+        self.message = message
+        self.timestamp = timestamp
+    
+    def to_dict(self):
+        return {
+            "message_id": self.message_id,
+            "sender": self.sender,
+            "message": self.message,
+            "timestamp": self.timestamp.isoformat()
+        }
+
+SENDERS = ("user", "bot")
+TEXTS = ("I have a cough and a fever", "I'm sorry to hear you're not feeling well.")
+
+def measure(build, count):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    messages = build(count)
+    elapsed = time.perf_counter() - start
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return messages, current, elapsed
+
+def build_legacy(count):
+    return [LegacyChatMessage(SENDERS[i & 1], TEXTS[i & 1], datetime.datetime.now()) for i in range(count)]
+
+def build_slotted(count):
+    return [ChatMessage(SENDERS[i & 1], TEXTS[i & 1]) for i in range(count)]
+
+def codec_rate(messages, encode, decode):
+    start = time.perf_counter()
+    encoded = [encode(message) for message in messages]
+    encode_time = time.perf_counter() - start
+    start = time.perf_counter()
+    for data in encoded:
+        decode(data)
+    decode_time = time.perf_counter() - start
+    size = sum(len(data) for data in encoded) / len(encoded)
+    return len(messages) / encode_time, len(messages) / decode_time, size
+
+def main(count: int = 1_000_000):
+    legacy, legacy_bytes, legacy_time = measure(build_legacy, count)
+    del legacy
+    slotted, slotted_bytes, slotted_time = measure(build_slotted, count)
+    
+    print(f"{count:,} messages")
+    print(f"  original: {legacy_bytes / 2**20:8.1f} MiB  {legacy_bytes / count:6.1f} B/message  built in {legacy_time:.2f}s")
+    print(f"  slotted:  {slotted_bytes / 2**20:8.1f} MiB  {slotted_bytes / count:6.1f} B/message  built in {slotted_time:.2f}s")
+    print(f"  reduction: {legacy_bytes / slotted_bytes:.2f}x")
+    
+    sample = slotted[:100_000]
+    json_rate = codec_rate(sample, lambda m: json.dumps(m.to_dict()), lambda d: ChatMessage.from_dict(json.loads(d)))
+    binary_rate = codec_rate(sample, ChatMessage.to_bytes, ChatMessage.from_bytes)
+    for label, (encode, decode, size) in (("json", json_rate), ("binary", binary_rate)):
+        print(f"  {label:6}  encode {encode:10,.0f}/s  decode {decode:10,.0f}/s  {size:5.1f} B/message")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
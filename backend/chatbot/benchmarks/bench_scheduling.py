@@ -0,0 +1,154 @@
+"""Appointment scheduling: slot queries against the sorted busy-interval index.
+  
+  doctors   Scheduler with 100 / 1,000 / 10,000 doctors and a few weeks of
+            random bookings each: is_free, next_free and book+cancel on a
+            random doctor, against a conflict check that scans a flat list of
+            every appointment (what storing them only on User records allows)
+  any       the no-doctor-named request: Scheduler.earliest_available on
+            random weekday slots and on Saturdays (nobody works, so the
+            answer is Monday's first opening), against asking every
+            calendar's is_free and then next_free as the dialog used to
+  busy      one doctor with a growing calendar: next_free from the start of
+            a fully booked stretch has to skip busy runs, a bisect each
+  threads   8 threads booking random slots with optimistic locking (read the
+            version, pick a free slot, book with expected_version, retry on
+            StaleCalendarError); checks nothing was double booked
+
+Run from backend/chatbot:  python benchmarks/bench_scheduling.py
+"""
+import datetime
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.scheduling import Scheduler, SlotTakenError, StaleCalendarError
+
+MONDAY = datetime.datetime(2026, 1, 5, 9)
+SLOT = datetime.timedelta(minutes=30)
+DAYS = 28
+
+def random_slot(rng: random.Random) -> datetime.datetime:
+    # A weekday slot between 9:00 and 16:30
+    day = rng.randrange(DAYS)
+    day += 2 if (MONDAY.weekday() + day) % 7 == 5 else 1 if (MONDAY.weekday() + day) % 7 == 6 else 0
+    return MONDAY + datetime.timedelta(days=day) + SLOT * rng.randrange(16)
+
+def per_call(function, args, rounds=1):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for arg in args:
+            function(*arg)
+    return (time.perf_counter() - start) / (rounds * len(args)) * 1e6
+
+def bench_doctors(doctor_count: int, bookings_per_doctor: int, rng: random.Random) -> None:
+    scheduler = Scheduler(f"Dr. Doctor{i}" for i in range(doctor_count))
+    flat = []
+    for i in range(doctor_count):
+        calendar = scheduler.calendar(f"Doctor{i}")
+        for n in range(bookings_per_doctor):
+            start = random_slot(rng)
+            try:
+                calendar.book(f"{i}-{n}", start, "patient")
+                flat.append((calendar.name, start, start + SLOT))
+            except SlotTakenError:
+                pass
+    
+    queries = [(scheduler.calendar(f"Doctor{rng.randrange(doctor_count)}"), random_slot(rng)) for _ in range(2000)]
+    is_free = per_call(lambda calendar, start: calendar.is_free(start), queries)
+    next_free = per_call(lambda calendar, start: calendar.next_free(start), queries)
+    
+    def book_cancel(calendar, start):
+        try:
+            calendar.book("probe", start, "patient")
+            calendar.cancel("probe")
+        except SlotTakenError:
+            pass
+    book = per_call(book_cancel, queries)
+    
+    def scan(calendar, start):
+        end = start + SLOT
+        return not any(name == calendar.name and begin < end and start < finish for name, begin, finish in flat)
+    scan_time = per_call(scan, queries[:20])
+    print(f"{doctor_count:>9,} {len(flat):>10,} {is_free:>9.2f} {next_free:>11.2f} {book:>13.2f} {scan_time:>11.0f}")
+    
+    def every_calendar(start):
+        calendar = next((calendar for calendar in scheduler.calendars.values() if calendar.is_free(start)), None)
+        if calendar is None:
+            calendar = min(scheduler.calendars.values(), key=lambda candidate: candidate.next_free(start))
+        return calendar.name, calendar.next_free(start)
+    
+    weekdays = [(start,) for _, start in queries[:200]]
+    saturdays = [(MONDAY + datetime.timedelta(days=5 + 7 * (n % 4), minutes=30 * (n % 16)),) for n in range(200)]
+    for start, in weekdays[:20] + saturdays[:20]:
+        calendar, slot = scheduler.earliest_available(start)
+        assert (calendar.name, slot) == every_calendar(start)
+    rows = []
+    for label, probes in (("weekday", weekdays), ("saturday", saturdays)):
+        indexed = per_call(scheduler.earliest_available, probes)
+        linear = per_call(every_calendar, probes[:20])
+        rows.append(f"{label} {indexed:.1f} us vs {linear:,.0f} us")
+    print(f"{'':>9} any doctor, earliest_available vs every calendar: {'; '.join(rows)}")
+
+def bench_busy_calendar() -> None:
+    print("one doctor, first N slots booked solid (busy runs broken by one free slot every 10):")
+    for booked in (100, 1_000, 10_000, 100_000):
+        scheduler = Scheduler(["Dr. Busy"])
+        calendar = scheduler.calendar("Busy")
+        slot = MONDAY
+        for n in range(booked):
+            slot = calendar.next_free(slot)
+            calendar.book(str(n), slot, "patient")
+            if n % 10 == 9:
+                slot = calendar.next_free(slot + SLOT) + SLOT
+        probes = [(MONDAY + datetime.timedelta(days=rng_day),) for rng_day in range(0, max(1, booked // 16), max(1, booked // 1600))]
+        is_free = per_call(lambda start: calendar.is_free(start), probes, 10)
+        next_free = per_call(lambda start: calendar.next_free(start), probes, 10)
+        print(f"  {booked:>8,} bookings, {len(calendar._starts):>6,} busy runs: is_free {is_free:6.2f} us, next_free {next_free:6.2f} us")
+
+def bench_threads(doctors: int = 100, threads: int = 8, attempts: int = 5_000) -> None:
+    scheduler = Scheduler(f"Dr. Doctor{i}" for i in range(doctors))
+    booked = []
+    retries = [0]
+    lock = threading.Lock()
+    
+    def worker(seed):
+        rng = random.Random(seed)
+        for n in range(attempts):
+            calendar = scheduler.calendar(f"Doctor{rng.randrange(doctors)}")
+            while True:
+                version = calendar.version
+                start = calendar.next_free(random_slot(rng))
+                try:
+                    calendar.book(f"{seed}-{n}", start, f"patient-{seed}", expected_version=version)
+                    break
+                except StaleCalendarError:
+                    with lock:
+                        retries[0] += 1
+            with lock:
+                booked.append((calendar.name, start))
+    
+    start = time.perf_counter()
+    workers = [threading.Thread(target=worker, args=(seed,)) for seed in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    assert len(set(booked)) == len(booked) == threads * attempts, "double booking"
+    print(f"{threads} threads, {len(booked):,} optimistic bookings over {doctors} doctors: "
+          f"{len(booked) / elapsed:,.0f} bookings/s, {retries[0]:,} version retries, no slot booked twice")
+
+def main():
+    rng = random.Random(11)
+    print(f"{'doctors':>9} {'bookings':>10} {'is_free us':>9} {'next_free us':>11} {'book+cancel us':>13} {'scan us':>11}")
+    for doctor_count in (100, 1_000, 10_000):
+        bench_doctors(doctor_count, 100, rng)
+    bench_busy_calendar()
+    bench_threads()
+
+if __name__ == "__main__":
+    main()
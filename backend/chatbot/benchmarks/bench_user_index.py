@@ -0,0 +1,56 @@
+"""Login lookup cost with 1M users: the original linear email scan vs the DataStore email index.
+
+Run from backend/chatbot:  python benchmarks/bench_user_index.py [user_count]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.models import User
+from healthcare_chatbot import HealthcareChatbot
+
+def legacy_find_user_id(users, email):
+    # What authenticate_user used to do: scan every user comparing emails
+    for user_id, user in users.items():
+        if user.email == email:
+            return user_id
+    return None
+
+def main(user_count: int = 1_000_000, lookups: int = 20):
+    chatbot = HealthcareChatbot()
+    data_store = chatbot.data_store
+    
+    start = time.perf_counter()
+    batch = []
+    for i in range(user_count):
+        batch.append(User(f"user-{i}", f"User {i}", f"user{i}@example.com", "01/01/1990"))
+        if len(batch) == 10_000:
+            data_store.create_users(batch)
+            batch = []
+    data_store.create_users(batch)
+    print(f"{user_count:,} users created and indexed in {time.perf_counter() - start:.1f}s")
+    
+    rng = random.Random(42)
+    emails = [f"user{rng.randrange(user_count)}@example.com" for _ in range(lookups)]
+    
+    start = time.perf_counter()
+    for email in emails:
+        legacy_find_user_id(data_store.users.users, email)
+    scan = (time.perf_counter() - start) / lookups
+    
+    start = time.perf_counter()
+    rounds = 10_000
+    for _ in range(rounds // lookups):
+        for email in emails:
+            data_store.get_user_by_email(email)
+    indexed = (time.perf_counter() - start) / rounds
+    
+    print(f"  linear scan:     {scan * 1000:10.3f} ms/login")
+    print(f"  email index:     {indexed * 1000:10.3f} ms/login (get_user_by_email; authenticate_user adds the scrypt check)")
+    print(f"  speedup:         {scan / indexed:10,.0f}x")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
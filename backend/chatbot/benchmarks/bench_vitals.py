@@ -0,0 +1,84 @@
+"""Vitals time series: append throughput and rollup-backed range queries.
+
+For series of growing length (one glucose reading every few minutes,
+going back further each time), times:
+  
+  append    VitalsStore.record_many, which also updates the daily and weekly rollups
+  rollups   VitalsStore.summary over the last 30 and 365 days
+  scan      the same summary computed from the raw points (as a list of
+            reading dicts, the way User.health_data would hold them)
+
+and compares memory per reading for the columnar arrays against that list.
+
+Run from backend/chatbot:  python benchmarks/bench_vitals.py
+"""
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.vitals import DAY, VitalsStore
+
+NOW = 1_760_000_000
+
+def scan_summary(readings, start, end):
+    values = [reading["glucose"] for reading in readings if start <= reading["timestamp"] < end]
+    return len(values), sum(values) / len(values), min(values), max(values)
+
+def time_queries(query, windows, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for window in windows:
+            query(window)
+    return (time.perf_counter() - start) / (rounds * len(windows))
+
+def bench(points: int, rng: random.Random) -> None:
+    interval = 5 * 60
+    readings = [(NOW - i * interval + rng.random() * 60, [rng.uniform(70, 180)]) for i in range(points)][::-1]
+    
+    vitals = VitalsStore()
+    start = time.perf_counter()
+    for i in range(0, points, 1000):
+        vitals.record_many("user-1", "glucose", readings[i:i + 1000])
+    append = (time.perf_counter() - start) / points
+    
+    as_dicts = [{"timestamp": timestamp, "glucose": values[0]} for timestamp, values in readings]
+    # Windows ending at slightly different times, so the partial days at the edges vary
+    rounds = 5 if points >= 100_000 else 50
+    row = [f"{points:>10,}", f"{append * 1e6:8.2f}"]
+    for days in (30, 365):
+        windows = [(NOW - days * DAY - offset, NOW - offset) for offset in range(0, DAY, DAY // 10)]
+        rollup = time_queries(lambda window: vitals.summary("user-1", "glucose", *window), windows, 200)
+        scan = time_queries(lambda window: scan_summary(as_dicts, *window), windows, rounds)
+        expected = scan_summary(as_dicts, *windows[3])
+        summary = vitals.summary("user-1", "glucose", *windows[3])
+        assert summary["count"] == expected[0] and abs(summary["fields"]["glucose"]["mean"] - expected[1]) < 1e-6
+        row += [f"{rollup * 1e6:9.1f}", f"{scan * 1e6:12.1f}"]
+    print("  ".join(row))
+
+def memory_per_reading(points: int = 200_000) -> None:
+    readings = [(NOW - i * 300.0, [100.0 + i % 50]) for i in range(points)][::-1]
+    tracemalloc.start()
+    vitals = VitalsStore()
+    vitals.record_many("user-1", "glucose", readings)
+    columnar = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    tracemalloc.start()
+    as_dicts = [{"timestamp": timestamp, "glucose": values[0]} for timestamp, values in readings]
+    dicts = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print(f"memory per reading ({points:,}): columnar + rollups {columnar / points:.1f} B, list of dicts {dicts / points:.1f} B")
+    del as_dicts
+
+def main():
+    rng = random.Random(3)
+    print(f"{'readings':>10}  {'append us':>8}  {'30d rollup us':>9}  {'30d scan us':>12}  {'365d rollup us':>9}  {'365d scan us':>12}")
+    for points in (1_000, 10_000, 100_000, 1_000_000):
+        bench(points, rng)
+    memory_per_reading()
+
+if __name__ == "__main__":
+    main()
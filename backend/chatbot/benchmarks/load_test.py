@@ -0,0 +1,112 @@
+"""Load-test the chatbot API with many concurrent conversations.
+
+Each simulated session registers an account, then sends a scripted conversation
+one turn at a time; all sessions run at once. Reports p50/p99 latency per
+endpoint and overall throughput.
+
+Run from backend/chatbot:
+    python benchmarks/load_test.py                      # starts the async server itself
+    python benchmarks/load_test.py --url http://host:5000 --sessions 1000 --turns 10
+"""
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+import aiohttp
+
+CHATBOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CORPUS_PATH = os.path.join(CHATBOT_DIR, "benchmarks", "fixtures", "intent_corpus.txt")
+
+def load_corpus():
+    with open(CORPUS_PATH) as f:
+        return [line.rstrip("\n") for line in f if line.strip()]
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+async def run_session(http, url, run_id, index, corpus, turns, latencies, errors):
+    account = {"name": f"Load {index}", "email": f"load{index}.{run_id}@example.com", "dob": "01/01/1990", "password": "x"}
+    start = time.perf_counter()
+    async with http.post(f"{url}/api/register", json=account) as response:
+        if response.status != 201:
+            errors.append(response.status)
+            return
+        token = (await response.json())["session_token"]
+    latencies["register"].append(time.perf_counter() - start)
+    
+    for turn in range(turns):
+        message = corpus[(index + turn) % len(corpus)]
+        start = time.perf_counter()
+        async with http.post(f"{url}/api/message", json={"message": message}, headers={"X-Session-Token": token}) as response:
+            if response.status != 200:
+                errors.append(response.status)
+            await response.read()
+        latencies["message"].append(time.perf_counter() - start)
+
+async def load_test(url, sessions, turns):
+    corpus = load_corpus()
+    latencies = {"register": [], "message": []}
+    run_id = int(time.time())
+    errors = []
+    connector = aiohttp.TCPConnector(limit=0)
+    async with aiohttp.ClientSession(connector=connector) as http:
+        start = time.perf_counter()
+        await asyncio.gather(*(
+            run_session(http, url, run_id, index, corpus, turns, latencies, errors) for index in range(sessions)
+        ))
+        elapsed = time.perf_counter() - start
+    
+    requests = sum(len(samples) for samples in latencies.values())
+    print(f"{sessions} concurrent sessions x {turns} turns: {requests} requests in {elapsed:.2f}s "
+          f"({requests / elapsed:,.0f} req/s), {len(errors)} errors")
+    for endpoint, samples in latencies.items():
+        print(f"  {endpoint:13} p50 {percentile(samples, 0.50) * 1000:7.1f} ms   p99 {percentile(samples, 0.99) * 1000:7.1f} ms")
+
+def start_server():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = subprocess.Popen(
+        [sys.executable, "-m", "app.async_server"],
+        cwd=CHATBOT_DIR,
+        # Every session registers from 127.0.0.1 at once: lift the login rate
+        # limit and keep hashing cheap (bench_login_storm.py measures real cost)
+        env={"CHATBOT_LOGIN_RATE": "0", "CHATBOT_SCRYPT_N": "16", "CHATBOT_AUTH_MAX_PENDING": "100000",
+             **os.environ, "PORT": str(port)},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return server, f"http://127.0.0.1:{port}"
+        except OSError:
+            time.sleep(0.1)
+    server.kill()
+    raise RuntimeError("Async server did not start")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="server to test (default: start app.async_server locally)")
+    parser.add_argument("--sessions", type=int, default=1000)
+    parser.add_argument("--turns", type=int, default=10)
+    args = parser.parse_args()
+    
+    server = None
+    url = args.url
+    if url is None:
+        server, url = start_server()
+    try:
+        asyncio.run(load_test(url.rstrip("/"), args.sessions, args.turns))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+if __name__ == "__main__":
+    main()
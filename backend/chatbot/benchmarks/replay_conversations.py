@@ -0,0 +1,173 @@
+"""Replay scripted conversations through DialogManager and check the results.
+
+Loads multi-turn conversations from JSONL (one {"id", "turns": [{"message",
+"intent"}]} object per line, e.g. fixtures/conversations.jsonl) and drives
+--sessions of them, cycling through the file, through
+DialogManager.process_message from a pool of worker threads. Each replayed
+conversation is its own session; email addresses get a per-copy "+n" tag
+so onboarding flows don't collide on the unique email index.
+
+Reports:
+  intent accuracy   turns with a non-null "intent" label, compared with the
+                    intent the turn was routed as (a turn swallowed by a flow
+                    counts as routed to no intent)
+  turn latency      p50/p90/p99/max of process_message
+  memory            a second, traced replay: bytes held per live session,
+                    and per session still held after the sessions are deleted
+                    (users created by onboarding account for some; steady
+                    growth beyond that is a leak)
+
+With --min-accuracy, --max-p99-ms or --max-retained-kb the exit status is 1
+when a threshold is missed, so CI can run it as a check.
+
+Run from backend/chatbot:
+    python benchmarks/replay_conversations.py --sessions 5000 --workers 8
+    python benchmarks/replay_conversations.py --intent-backend classifier --min-accuracy 0.85
+"""
+import argparse
+import gc
+import json
+import os
+import re
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.dialog import DialogManager
+from app.intent_classifier import IntentClassifier
+from app.nlp import NLPEngine
+from app.security import SecurityManager
+from app.sessions import SessionStore
+from app.store import DataStore
+
+CONVERSATIONS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "conversations.jsonl")
+EMAIL = re.compile(r"^([^@\s]+)@([^@\s]+)$")
+
+def load_conversations(path: str):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def build_dialog_manager(intent_backend: str, sessions: int) -> DialogManager:
+    data_store = DataStore()
+    classifier = IntentClassifier.train(data_store.intent_examples) if intent_backend == "classifier" else None
+    # Room for every replayed session, so none is evicted before it finishes;
+    # onboarding passwords are hashed at a token cost (bench_login_storm.py
+    # measures real scrypt)
+    return DialogManager(data_store, NLPEngine(data_store, classifier), SessionStore(max_sessions=sessions + 1000),
+                         security_manager=SecurityManager(n=16))
+
+def replay_session(dialog_manager: DialogManager, session_id: str, copy: int, conversation):
+    """Play one conversation; returns [(expected intent, routed intent, seconds)] per turn."""
+    results = []
+    for turn in conversation["turns"]:
+        message = EMAIL.sub(rf"\1+{copy}@\2", turn["message"]) if copy else turn["message"]
+        # last_intent is only written when a turn goes through intent detection
+        session = dialog_manager.session_data.get(session_id)
+        if session is not None:
+            session["last_intent"] = None
+            dialog_manager.session_data.set(session_id, session)
+        start = time.perf_counter()
+        dialog_manager.process_message(session_id, message)
+        elapsed = time.perf_counter() - start
+        routed = dialog_manager.session_data.get(session_id)["last_intent"]
+        results.append((turn.get("intent"), routed, elapsed))
+    return results
+
+def replay(dialog_manager: DialogManager, conversations, sessions: int, workers: int, label: str = "replay"):
+    def run(index):
+        conversation = conversations[index % len(conversations)]
+        return replay_session(dialog_manager, f"{label}-{index}-{conversation['id']}", index // len(conversations), conversation)
+    
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(run, range(sessions), chunksize=16))
+
+def measure_memory(conversations, sessions: int, intent_backend: str):
+    dialog_manager = build_dialog_manager(intent_backend, sessions)
+    # Warm the response cache and lazily built state before the baseline
+    replay(dialog_manager, conversations, len(conversations), 1, label="warmup")
+    for index, conversation in enumerate(conversations):
+        dialog_manager.session_data.delete(f"warmup-{index}-{conversation['id']}")
+    
+    gc.collect()
+    tracemalloc.start()
+    baseline = tracemalloc.take_snapshot()
+    base_bytes = tracemalloc.get_traced_memory()[0]
+    replay(dialog_manager, conversations, sessions, 1)
+    gc.collect()
+    live_bytes = tracemalloc.get_traced_memory()[0] - base_bytes
+    
+    for index in range(sessions):
+        dialog_manager.session_data.delete(f"replay-{index}-{conversations[index % len(conversations)]['id']}")
+    gc.collect()
+    retained_bytes = tracemalloc.get_traced_memory()[0] - base_bytes
+    growth = tracemalloc.take_snapshot().compare_to(baseline, "filename")
+    tracemalloc.stop()
+    return live_bytes / sessions, retained_bytes / sessions, [stat for stat in growth if stat.size_diff > 0][:5]
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("path", nargs="?", default=CONVERSATIONS_PATH, help="conversations JSONL")
+    parser.add_argument("--sessions", type=int, default=2000, help="conversations to replay (cycles through the file)")
+    parser.add_argument("--workers", type=int, default=8, help="threads replaying sessions concurrently")
+    parser.add_argument("--intent-backend", choices=("regex", "classifier"), default="regex")
+    parser.add_argument("--memory-sessions", type=int, default=500, help="sessions in the traced replay (0 skips it)")
+    parser.add_argument("--min-accuracy", type=float, help="fail below this intent accuracy (0-1)")
+    parser.add_argument("--max-p99-ms", type=float, help="fail above this p99 turn latency")
+    parser.add_argument("--max-retained-kb", type=float, help="fail above this much memory kept per deleted session")
+    args = parser.parse_args(argv)
+    
+    conversations = load_conversations(args.path)
+    dialog_manager = build_dialog_manager(args.intent_backend, args.sessions)
+    start = time.perf_counter()
+    results = replay(dialog_manager, conversations, args.sessions, args.workers)
+    elapsed = time.perf_counter() - start
+    
+    turns = [turn for session in results for turn in session]
+    latencies = sorted(seconds for _, _, seconds in turns)
+    labeled = [(expected, routed) for expected, routed, _ in turns if expected]
+    correct = sum(1 for expected, routed in labeled if expected == routed)
+    accuracy = correct / len(labeled) if labeled else 1.0
+    p99_ms = percentile(latencies, 0.99) * 1000
+    
+    print(f"{args.sessions:,} sessions, {len(turns):,} turns from {len(conversations)} scripted conversations, "
+          f"{args.workers} workers, {args.intent_backend} intents")
+    print(f"  throughput  {len(turns) / elapsed:,.0f} turns/s ({elapsed:.2f}s)")
+    print(f"  latency     p50 {percentile(latencies, 0.5) * 1000:.3f} ms  p90 {percentile(latencies, 0.9) * 1000:.3f} ms  "
+          f"p99 {p99_ms:.3f} ms  max {latencies[-1] * 1000:.3f} ms")
+    print(f"  intents     {accuracy:.1%} of {len(labeled):,} labeled turns")
+    misses = {}
+    for expected, routed in labeled:
+        if expected != routed:
+            misses[(expected, routed)] = misses.get((expected, routed), 0) + 1
+    for (expected, routed), count in sorted(misses.items(), key=lambda item: -item[1])[:8]:
+        print(f"    {count:6,}  {expected} -> {routed}")
+    print(f"  sessions    {dialog_manager.session_data.metrics()}")
+    
+    retained_kb = None
+    if args.memory_sessions:
+        live, retained, growth = measure_memory(conversations, args.memory_sessions, args.intent_backend)
+        retained_kb = retained / 1024
+        print(f"  memory      {live / 1024:.2f} KiB per live session, {retained_kb:.2f} KiB per session after deletion "
+              f"({args.memory_sessions:,} traced sessions)")
+        for stat in growth:
+            print(f"    {stat.size_diff / args.memory_sessions:8.0f} B/session  {stat.traceback[0].filename}")
+    
+    failures = []
+    if args.min_accuracy is not None and accuracy < args.min_accuracy:
+        failures.append(f"intent accuracy {accuracy:.1%} < {args.min_accuracy:.1%}")
+    if args.max_p99_ms is not None and p99_ms > args.max_p99_ms:
+        failures.append(f"p99 latency {p99_ms:.3f} ms > {args.max_p99_ms} ms")
+    if args.max_retained_kb is not None and retained_kb is not None and retained_kb > args.max_retained_kb:
+        failures.append(f"retained memory {retained_kb:.2f} KiB/session > {args.max_retained_kb} KiB")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
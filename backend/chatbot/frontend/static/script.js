@@ -22,6 +22,10 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     };
 
+    // Issued by the server on the first message; keeps the conversation (and
+    // an account created by onboarding) in one session
+    let sessionToken = null;
+
     async function sendMessage() {
         const message = chatInput.value.trim();
         if (!message) return;
@@ -29,12 +33,15 @@ document.addEventListener('DOMContentLoaded', () => {
         chatMessages.innerHTML += `<div class="bg-blue-100 p-2 rounded-lg mb-2 self-end">You: ${message}</div>`;
         chatInput.value = '';
 
+        const headers = { 'Content-Type': 'application/json' };
+        if (sessionToken) headers['X-Session-Token'] = sessionToken;
         const response = await fetch('/api/message', {
             method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
+            headers,
             body: JSON.stringify({ message })
         });
         const data = await response.json();
+        sessionToken = data.session_token || sessionToken;
         chatMessages.innerHTML += `<div class="bg-gray-100 p-2 rounded-lg mb-2 self-start">Bot: ${data.response}</div>`;
         chatMessages.scrollTop = chatMessages.scrollHeight;
     }
@@ -1,11 +1,16 @@
+import uuid
 from flask import Flask, request, jsonify
 from app.dialog import DialogManager  # Changed from .dialog to app.dialog
-from app.security import SecurityManager  # Changed from .security to app.security
-from app.models import ChatMessage  # Changed from .models to app.models
-import datetime
+from app.security import SecurityManager, AuthBusyError  # Changed from .security to app.security
+from app.models import ChatMessage, User  # Changed from .models to app.models
+from app.sessions import SessionStore
+from app.indexes import DuplicateValueError
 
-def init_routes(app: Flask, dialog_manager: DialogManager, security_manager: SecurityManager):
-    active_sessions = {}
+def init_routes(app: Flask, dialog_manager: DialogManager, security_manager: SecurityManager, active_sessions: SessionStore = None):
+    # Session token -> user id, expired after inactivity
+    if active_sessions is None:
+        active_sessions = SessionStore()
+        active_sessions.start_sweeper()
 
     @app.route('/api/message', methods=['POST'])
     def process_message():
@@ -13,34 +18,74 @@ def init_routes(app: Flask, dialog_manager: DialogManager, security_manager: Sec
         session_token = request.headers.get('X-Session-Token')
         message = data.get('message', '')
 
-        if not session_token or session_token not in active_sessions:
-            temp_user_id = f"temp_{security_manager.generate_session_token()}"
-            response = dialog_manager.process_message(temp_user_id, message)
-            user = dialog_manager.data_store.get_user(temp_user_id)
-            if user:
-                user.chat_history.append(ChatMessage("user", message, datetime.datetime.now()))
-                user.chat_history.append(ChatMessage("bot", response, datetime.datetime.now()))
-                dialog_manager.data_store.update_user(user)
-        else:
-            user_id = active_sessions[session_token]
-            response = dialog_manager.process_message(user_id, message)
-            user = dialog_manager.data_store.get_user(user_id)
-            if user:
-                user.chat_history.append(ChatMessage("user", message, datetime.datetime.now()))
-                user.chat_history.append(ChatMessage("bot", response, datetime.datetime.now()))
-                dialog_manager.data_store.update_user(user)
+        user_id = active_sessions.get(session_token) if session_token else None
+        if user_id is None:
+            # A guest conversation: hand back a token so its next turns (and the
+            # account it may create by onboarding) continue in the same session
+            session_token = security_manager.generate_session_token()
+            user_id = f"temp_{security_manager.generate_session_token()}"
+            active_sessions.set(session_token, user_id)
 
-        return jsonify({'response': response})
+        response = dialog_manager.process_message(user_id, message)
+        if dialog_manager.data_store.get_user(user_id):
+            dialog_manager.data_store.append_chat_messages(user_id, [
+                ChatMessage("user", message),
+                ChatMessage("bot", response)
+            ])
+
+        return jsonify({'response': response, 'session_token': session_token})
 
     @app.route('/api/authenticate', methods=['POST'])
     def authenticate():
+        # Hashing runs in the security manager's process pool; this thread
+        # only waits on it, so other threads keep serving chat turns
+        if not security_manager.allow_login(request.remote_addr or 'unknown'):
+            return jsonify({'error': 'Too many login attempts'}), 429
         data = request.get_json()
         email = data.get('email')
-        password = data.get('password')
+        password = data.get('password') or ''
+        user = dialog_manager.data_store.get_user_by_email(email) if email else None
+        try:
+            valid = security_manager.verify_password(password, user.password_hash if user else None)
+            if valid and security_manager.needs_rehash(user.password_hash):
+                user.password_hash = security_manager.hash_password(password)
+                dialog_manager.data_store.update_user(user)
+        except AuthBusyError:
+            return jsonify({'error': 'Authentication is busy, try again shortly'}), 503
+        if not valid:
+            return jsonify({'error': 'Invalid email or password'}), 401
         session_token = security_manager.generate_session_token()
-        active_sessions[session_token] = f"user_{email}"
+        active_sessions.set(session_token, user.user_id)
         return jsonify({'session_token': session_token})
 
+    @app.route('/api/register', methods=['POST'])
+    def register():
+        if not security_manager.allow_login(request.remote_addr or 'unknown'):
+            return jsonify({'error': 'Too many login attempts'}), 429
+        data = request.get_json()
+        if not all(data.get(field) for field in ('name', 'email', 'dob', 'password')):
+            return jsonify({'error': 'name, email, dob and password are required'}), 400
+        try:
+            password_hash = security_manager.hash_password(data['password'])
+        except AuthBusyError:
+            return jsonify({'error': 'Authentication is busy, try again shortly'}), 503
+        user = User(str(uuid.uuid4()), data['name'], data['email'], data['dob'], password_hash)
+        try:
+            dialog_manager.data_store.create_user(user)
+        except DuplicateValueError:
+            return jsonify({'error': f"An account with {data['email']} already exists"}), 409
+        session_token = security_manager.generate_session_token()
+        active_sessions.set(session_token, user.user_id)
+        return jsonify({'session_token': session_token}), 201
+
+    @app.route('/api/sessions/metrics', methods=['GET'])
+    def session_metrics():
+        return jsonify({
+            'active_sessions': active_sessions.metrics(),
+            'dialog_sessions': dialog_manager.session_data.metrics(),
+            'response_cache': dialog_manager.response_cache.stats()
+        })
+
 if __name__ == '__main__':
     from app import create_app  # Changed from . to app
     app = create_app()
@@ -0,0 +1,29 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.dialog import DialogManager
+from app.nlp import NLPEngine
+from app.security import SecurityManager
+from app.store import DataStore
+
+
+@pytest.fixture
+def security_manager():
+    # Token scrypt cost: these tests are about the dialog, not hashing strength
+    manager = SecurityManager(n=16)
+    yield manager
+    manager.close()
+
+
+@pytest.fixture
+def dialog(security_manager):
+    data_store = DataStore()
+    return DialogManager(data_store, NLPEngine(data_store), security_manager=security_manager)
+
+
+def converse(dialog, user_id, messages):
+    return [dialog.process_message(user_id, message) for message in messages]
@@ -0,0 +1,63 @@
+import datetime
+
+import pytest
+
+from app.dialog import DialogManager
+from app.models import User
+from app.nlp import NLPEngine
+from app.store import DataStore
+
+from conftest import converse
+
+# A Monday afternoon in a year whose February has 28 days
+NOW = datetime.datetime(2026, 3, 2, 14, 30)
+
+
+@pytest.fixture
+def dialog(security_manager):
+    data_store = DataStore()
+    return DialogManager(data_store, NLPEngine(data_store), security_manager=security_manager,
+                         clock=lambda: NOW.timestamp())
+
+
+@pytest.mark.parametrize("message, reply", [
+    ("book an appointment on february 30 at 3 pm",
+     "I couldn't find February 30 on the calendar. What day would work instead?"),
+    ("book an appointment on february 29 at 3 pm",
+     "I couldn't find February 29 on the calendar. What day would work instead?"),
+    ("book an appointment on march 5 at 13:00 pm",
+     "13:00 pm isn't a valid time. What time would work instead?"),
+    ("book an appointment on march 2 at 9 am",
+     "9:00 am today has already passed. What time would work instead?"),
+])
+def test_an_unbookable_date_or_time_is_asked_for_again(dialog, message, reply):
+    assert dialog.process_message("guest", message) == reply
+    assert dialog.session_data.get("guest")["conversation_state"] == "appointment_when"
+
+
+def test_the_booking_continues_with_the_part_that_was_kept(dialog):
+    replies = converse(dialog, "guest", ["book an appointment on march 5 at 13:00 pm", "at 1 pm"])
+    assert replies[1] == "Dr. Smith is available on march 5 at 1:00 pm. Would you like me to book this appointment for you?"
+    replies = converse(dialog, "other", ["book an appointment on february 30 at 3 pm", "on march 3"])
+    assert replies[1] == "Dr. Smith is available on march 3 at 3:00 pm. Would you like me to book this appointment for you?"
+
+
+def test_later_today_and_dates_gone_this_year_are_still_bookable(dialog):
+    dialog.data_store.create_user(User("ana", "Ana", "ana@example.com", "01/02/1990"))
+    converse(dialog, "ana", ["book an appointment on march 2 at 4 pm", "yes"])
+    converse(dialog, "ana", ["book an appointment on january 12 at 10 am", "yes"])
+    booked = [appointment["date_time"] for appointment in dialog.data_store.get_user("ana").appointments]
+    assert booked == ["2026-03-02T16:00:00", "2027-01-12T10:00:00"]
+
+
+def test_a_slot_that_passes_before_the_yes_is_asked_for_again(security_manager):
+    now = [NOW]
+    data_store = DataStore()
+    data_store.create_user(User("ana", "Ana", "ana@example.com", "01/02/1990"))
+    dialog = DialogManager(data_store, NLPEngine(data_store), security_manager=security_manager,
+                           clock=lambda: now[0].timestamp())
+    dialog.process_message("ana", "book an appointment on march 2 at 3 pm")
+    now[0] = NOW.replace(hour=15, minute=5)
+    assert dialog.process_message("ana", "yes") == "3:00 pm today has already passed. What time would work instead?"
+    assert dialog.process_message("ana", "at 4 pm") == "Dr. Smith is available on march 2 at 4:00 pm. Would you like me to book this appointment for you?"
+    assert data_store.get_user("ana").appointments == []
@@ -0,0 +1,42 @@
+import asyncio
+import time
+
+from aiohttp.test_utils import TestClient, TestServer
+
+from app.async_server import AsyncChatServer
+from app.sessions import SessionStore
+
+
+def test_the_loop_keeps_serving_while_an_onboarding_password_is_hashed(dialog, security_manager):
+    server = AsyncChatServer(dialog, security_manager, SessionStore())
+    assert server.executor is None
+    hash_password = security_manager.hash_password
+    
+    def slow_hash(password):
+        # Stands in for a costly scrypt run: blocks the calling thread
+        time.sleep(0.5)
+        return hash_password(password)
+    security_manager.hash_password = slow_hash
+    
+    async def run():
+        async with TestClient(TestServer(server.make_app())) as client:
+            async def say(message, token=None):
+                response = await client.post("/api/message", json={"message": message},
+                                             headers={"X-Session-Token": token} if token else {})
+                return await response.json()
+            
+            token = (await say("hello"))["session_token"]
+            await say("Maria Lopez", token)
+            await say("maria@example.com", token)
+            started = time.perf_counter()
+            password = asyncio.ensure_future(say("correct horse battery", token))
+            await asyncio.sleep(0.05)
+            # Another guest is answered while the first one's password is still hashing
+            other = await say("hello")
+            other_done = time.perf_counter() - started
+            return other, other_done, await password, time.perf_counter() - started
+    
+    other, other_done, password, password_done = asyncio.run(run())
+    assert other["response"].startswith("Welcome to Healthcare Assistant!")
+    assert password["response"] == "Thank you! For your health records, I need your date of birth (MM/DD/YYYY):"
+    assert other_done < 0.3 < password_done
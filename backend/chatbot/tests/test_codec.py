@@ -0,0 +1,96 @@
+import pytest
+
+from app import codec
+from app.codec import packb, unpackb
+
+
+@pytest.fixture(autouse=True)
+def pure_python(monkeypatch):
+    # Exercise the fallback even where the msgpack package is installed
+    monkeypatch.setattr(codec, "msgpack", None)
+
+
+INTS = [0, 1, 127, 128, 255, 256, 65535, 65536, 2 ** 32 - 1, 2 ** 32, 2 ** 63 - 1, 2 ** 63, 2 ** 64 - 1,
+        -1, -32, -33, -128, -129, -32768, -32769, -2 ** 31, -2 ** 31 - 1, -2 ** 63]
+
+
+@pytest.mark.parametrize("value", INTS)
+def test_ints_round_trip_at_every_size_boundary(value):
+    data = packb(value)
+    assert unpackb(data) == value
+    # Positive and negative fixints take one byte, everything else nine
+    assert len(data) == (1 if -32 <= value < 128 else 9)
+
+
+@pytest.mark.parametrize("value", [2 ** 64, -2 ** 63 - 1])
+def test_ints_past_64_bits_are_refused(value):
+    with pytest.raises(OverflowError):
+        packb(value)
+
+
+@pytest.mark.parametrize("size, header", [
+    (0, b"\xa0"), (31, b"\xbf"), (32, b"\xd9\x20"), (255, b"\xd9\xff"),
+    (256, b"\xda\x01\x00"), (65535, b"\xda\xff\xff"), (65536, b"\xdb\x00\x01\x00\x00"),
+])
+def test_str_headers_follow_the_utf8_length(size, header):
+    ascii_text = "a" * size
+    assert packb(ascii_text) == header + ascii_text.encode()
+    assert unpackb(packb(ascii_text)) == ascii_text
+    # Lengths are counted in encoded bytes, not characters
+    if size % 2 == 0:
+        text = "é" * (size // 2)
+        assert packb(text).startswith(header)
+        assert unpackb(packb(text)) == text
+
+
+@pytest.mark.parametrize("size, header", [
+    (0, b"\xc4\x00"), (255, b"\xc4\xff"), (256, b"\xc5\x01\x00"), (65535, b"\xc5\xff\xff"),
+    (65536, b"\xc6\x00\x01\x00\x00"),
+])
+def test_bin_round_trips_as_bytes(size, header):
+    data = bytes(range(256)) * (size // 256) + bytes(size % 256)
+    assert packb(data) == header + data
+    assert unpackb(packb(data)) == data
+    assert unpackb(packb(bytearray(data))) == data
+
+
+@pytest.mark.parametrize("size", [0, 15, 16, 65535, 65536])
+def test_arrays_and_maps_round_trip_at_every_size_boundary(size):
+    items = list(range(size))
+    assert unpackb(packb(items)) == items
+    assert unpackb(packb(tuple(items))) == items
+    mapping = {f"k{n}": n for n in range(size)}
+    assert unpackb(packb(mapping)) == mapping
+
+
+def test_nested_records_round_trip():
+    record = {"user_id": "ana", "vitals": [[1700000000.5, 120.0, 80.0]], "active": True, "deleted": False,
+              "note": None, "blob": b"\x00\xff", 7: {"nested": ["é", -1, 2 ** 40]}}
+    assert unpackb(packb(record)) == record
+
+
+@pytest.mark.parametrize("data, value", [
+    # Encodings msgpack itself writes, which the fallback never does
+    (b"\xcc\xc8", 200), (b"\xcd\x01\x00", 256), (b"\xce\x00\x01\x00\x00", 65536),
+    (b"\xd0\x9c", -100), (b"\xd1\xff\x00", -256), (b"\xd2\xff\xff\x00\x00", -65536),
+    (b"\xca\x3f\xc0\x00\x00", 1.5), (b"\xe0", -32), (b"\xa2hi", "hi"),
+    (b"\x92\x01\xa1a", [1, "a"]), (b"\x81\xa1k\xc0", {"k": None}),
+])
+def test_other_msgpack_encodings_unpack(data, value):
+    assert unpackb(data) == value
+
+
+def test_bad_input_is_refused():
+    with pytest.raises(ValueError, match="Trailing data"):
+        unpackb(packb(1) + b"\x00")
+    with pytest.raises(ValueError, match="Unsupported MessagePack type 0xc1"):
+        unpackb(b"\xc1")
+    with pytest.raises(TypeError, match="Cannot encode set"):
+        packb({1, 2})
+
+
+def test_the_msgpack_package_reads_what_the_fallback_writes():
+    msgpack = pytest.importorskip("msgpack")
+    record = {"ints": INTS, "text": "é" * 300, "blob": bytes(70000), "items": list(range(20))}
+    assert msgpack.unpackb(packb(record), raw=False, strict_map_key=False) == record
+    assert unpackb(msgpack.packb(record, use_bin_type=True)) == record
@@ -0,0 +1,114 @@
+import os
+import random
+import struct
+
+import pytest
+
+from app.crypto import KEY_BYTES, STREAM_PREFIX_BYTES, WRAPPED_KEY_BYTES, DecryptionError, EnvelopeCipher
+
+HEADER_BYTES = 1 + WRAPPED_KEY_BYTES + STREAM_PREFIX_BYTES
+DATA = bytes(random.Random(7).getrandbits(8) for _ in range(100))
+
+
+@pytest.fixture
+def cipher():
+    return EnvelopeCipher(os.urandom(KEY_BYTES))
+
+
+def rechunk(data, seed=1):
+    # Feed bytes back in pieces that don't line up with frames
+    rng = random.Random(seed)
+    i = 0
+    while i < len(data):
+        size = rng.randint(1, 40)
+        yield data[i:i + size]
+        i += size
+
+
+def sealed_frames(cipher, user_id="ana", data=DATA, chunk_size=16):
+    """The header and the frames of a sealed stream, separately."""
+    sealed = b"".join(cipher.seal_stream(user_id, rechunk(data), chunk_size))
+    header, rest = sealed[:HEADER_BYTES], sealed[HEADER_BYTES:]
+    frames = []
+    while rest:
+        size = struct.unpack_from(">I", rest)[0]
+        frames.append(rest[:5 + size])
+        rest = rest[5 + size:]
+    return header, frames
+
+
+def opened(cipher, user_id, data):
+    return b"".join(cipher.open_stream(user_id, rechunk(data, seed=2)))
+
+
+@pytest.mark.parametrize("size", [0, 1, 15, 16, 17, 32, 100])
+def test_streams_round_trip_whatever_the_chunking(cipher, size):
+    header, frames = sealed_frames(cipher, data=DATA[:size])
+    assert len(frames) == max(1, -(-size // 16))
+    assert opened(cipher, "ana", header + b"".join(frames)) == DATA[:size]
+
+
+def test_a_tampered_frame_fails(cipher):
+    header, frames = sealed_frames(cipher)
+    tampered = bytearray(frames[2])
+    tampered[-1] ^= 1
+    frames[2] = bytes(tampered)
+    with pytest.raises(DecryptionError, match="Frame 2 failed authentication"):
+        opened(cipher, "ana", header + b"".join(frames))
+
+
+def test_a_truncated_stream_fails(cipher):
+    header, frames = sealed_frames(cipher)
+    sealed = header + b"".join(frames)
+    # Without the final frame, part way through a frame, and header only
+    for cut in (sealed[:-len(frames[-1])], sealed[:-3], sealed[:HEADER_BYTES], sealed[:10], b""):
+        with pytest.raises(DecryptionError, match="Stream is truncated"):
+            opened(cipher, "ana", cut)
+
+
+@pytest.mark.parametrize("order", [[1, 0, 2, 3, 4, 5, 6], [0, 1, 3, 2, 4, 5, 6], [0, 1, 2, 3, 4, 6, 5], [0, 2, 3, 4, 5, 6]])
+def test_reordered_or_dropped_frames_fail(cipher, order):
+    header, frames = sealed_frames(cipher)
+    assert len(frames) == 7
+    with pytest.raises(DecryptionError, match="failed authentication"):
+        opened(cipher, "ana", header + b"".join(frames[i] for i in order))
+
+
+def test_a_frame_marked_last_early_or_extra_data_fails(cipher):
+    header, frames = sealed_frames(cipher)
+    flipped = bytearray(frames[1])
+    flipped[4] = 1
+    with pytest.raises(DecryptionError, match="Frame 1 failed authentication"):
+        opened(cipher, "ana", header + frames[0] + bytes(flipped))
+    _, others = sealed_frames(cipher)
+    with pytest.raises(DecryptionError, match="Data after the final frame"):
+        opened(cipher, "ana", header + b"".join(frames) + others[0])
+
+
+def test_another_users_stream_or_record_fails(cipher):
+    header, frames = sealed_frames(cipher, user_id="ana")
+    with pytest.raises(DecryptionError, match="Data key does not belong"):
+        opened(cipher, "bob", header + b"".join(frames))
+    # Even with bob's own data key spliced in, ana's frames don't authenticate as bob's
+    bob_header, _ = sealed_frames(cipher, user_id="bob")
+    with pytest.raises(DecryptionError, match="Frame 0 failed authentication"):
+        opened(cipher, "bob", bob_header + b"".join(frames))
+    record = cipher.seal("ana", b"120/80")
+    with pytest.raises(DecryptionError):
+        cipher.open("bob", record)
+    assert cipher.open("ana", record) == b"120/80"
+
+
+def test_another_master_key_cannot_open_a_stream(cipher):
+    header, frames = sealed_frames(cipher)
+    with pytest.raises(DecryptionError, match="Data key does not belong"):
+        opened(EnvelopeCipher(os.urandom(KEY_BYTES)), "ana", header + b"".join(frames))
+
+
+def test_open_many_rejects_a_tampered_record_among_good_ones(cipher):
+    records = cipher.seal_many("ana", [b"a", b"b", b"c"])
+    assert cipher.open_many("ana", records) == [b"a", b"b", b"c"]
+    tampered = bytearray(records[1])
+    tampered[-1] ^= 1
+    with pytest.raises(DecryptionError, match="Record failed authentication"):
+        cipher.open_many("ana", [records[0], bytes(tampered), records[2]])
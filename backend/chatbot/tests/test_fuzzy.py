@@ -0,0 +1,48 @@
+import pytest
+
+from app.fuzzy import FuzzyPhraseIndex
+from app.nlp import NLPEngine
+from app.store import DataStore
+
+
+@pytest.fixture(scope="module")
+def nlp_engine():
+    return NLPEngine(DataStore())
+
+
+def terms(nlp_engine, message):
+    return [mention["term"] for mention in nlp_engine.find_terms(message)]
+
+
+@pytest.mark.parametrize("message, expected", [
+    ("I have a feaver", ["fever"]),
+    ("my sore throught hurts", ["sore throat"]),
+    ("a runy nose since monday", ["runny nose"]),
+    ("I have a feaver, a sore throught and a runy nose", ["fever", "sore throat", "runny nose"]),
+])
+def test_misspelled_symptoms_are_found(nlp_engine, message, expected):
+    assert terms(nlp_engine, message) == expected
+
+
+@pytest.mark.parametrize("message, expected", [
+    ("I never had a cough before", ["cough"]),
+    ("I never miss my pills", []),
+    ("ever since the move I feel fine", []),
+    ("some days are better than others", []),
+    ("that store was closed", []),
+    ("it's a rough week at work", []),
+])
+def test_everyday_words_are_not_read_as_symptom_typos(nlp_engine, message, expected):
+    assert terms(nlp_engine, message) == expected
+
+
+def test_a_short_word_on_its_own_must_keep_the_first_letter():
+    index = FuzzyPhraseIndex(["fever", "runny nose"], common_words=())
+    assert index.search("fevr") == ("fever", 0.8)
+    assert index.search("lever") is None
+    assert index.search("runny rose") == ("runny nose", 0.9)
+
+
+def test_never_having_a_cough_is_not_read_as_flu(dialog):
+    reply = dialog.process_message("guest", "I never had a cough before")
+    assert "flu" not in reply.lower()
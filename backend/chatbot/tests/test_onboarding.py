@@ -0,0 +1,50 @@
+from conftest import converse
+
+ONBOARDING = ["hello", "Maria Lopez", "maria@example.com", "correct horse battery", "03/14/1979"]
+
+
+def test_onboarding_creates_the_account_under_the_conversation_id(dialog, security_manager):
+    replies = converse(dialog, "temp_guest", ONBOARDING)
+    assert "account has been created" in replies[-1]
+    user = dialog.data_store.get_user("temp_guest")
+    assert (user.name, user.email, user.dob) == ("Maria Lopez", "maria@example.com", "03/14/1979")
+    assert dialog.data_store.get_user_by_email("maria@example.com") is user
+
+
+def test_the_password_is_hashed_and_never_kept_in_the_session(dialog, security_manager):
+    converse(dialog, "temp_guest", ONBOARDING)
+    user = dialog.data_store.get_user("temp_guest")
+    assert security_manager.verify_password("correct horse battery", user.password_hash)
+    context = dialog.session_data.get("temp_guest")["context"]
+    assert "password" not in context and "password_hash" not in context
+
+
+def test_after_onboarding_the_user_is_greeted_and_reaches_personal_flows(dialog):
+    converse(dialog, "temp_guest", ONBOARDING)
+    greeting, vitals = converse(dialog, "temp_guest", ["hello", "my weight is 70 kg"])
+    assert greeting.startswith("Hello Maria Lopez!")
+    assert vitals == "Recorded your weight: 70.0 kg."
+    assert dialog.data_store.vitals.latest("temp_guest", "weight") is not None
+
+
+def test_a_taken_email_is_asked_for_again(dialog):
+    converse(dialog, "first", ONBOARDING)
+    replies = converse(dialog, "second", ONBOARDING[:4] + ["01/01/1990", "other@example.com", "another password", "01/01/1990"])
+    assert replies[4] == "An account with maria@example.com already exists. Please enter a different email address:"
+    assert "account has been created" in replies[-1]
+    assert dialog.data_store.get_user("second").email == "other@example.com"
+
+
+def test_the_cli_signs_a_guest_in_to_the_account_they_onboard(monkeypatch):
+    monkeypatch.setenv("CHATBOT_SCRYPT_N", "16")
+    from healthcare_chatbot import HealthcareChatbot
+    chatbot = HealthcareChatbot()
+    try:
+        session_token = chatbot.start_guest_session()
+        replies = [chatbot.process_message(session_token, message) for message in ONBOARDING + ["hello"]]
+        assert "account has been created" in replies[-2]
+        assert replies[-1].startswith("Hello Maria Lopez!")
+        login_token = chatbot.authenticate_user("maria@example.com", "correct horse battery")
+        assert chatbot.active_sessions.get(login_token) == chatbot.active_sessions.get(session_token)
+    finally:
+        chatbot.security_manager.close()
@@ -0,0 +1,154 @@
+import datetime
+import random
+import time
+
+import pytest
+
+from app.reminders import HOUR, MemorySink, ReminderScheduler, SQLiteReminderQueue, parse_frequency
+from app.timing_wheel import TimingWheel
+
+START = datetime.date(2026, 1, 5)
+
+
+class Clock:
+    def __init__(self, now: float):
+        self.now = now
+    
+    def __call__(self) -> float:
+        return self.now
+
+
+def local(*args) -> float:
+    return time.mktime(datetime.datetime(*args).timetuple())
+
+
+@pytest.fixture
+def new_york(monkeypatch):
+    monkeypatch.setenv("TZ", "America/New_York")
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+@pytest.mark.parametrize("text, period_hours, hours", [
+    ("twice daily", 24, [9, 21]),
+    ("bid", 24, [9, 21]),
+    ("3 times a day", 24, [8, 14, 20]),
+    ("qid", 24, [8, 12, 16, 20]),
+    ("at 8 am and 8 pm", 24, [8, 20]),
+    ("once daily at 7:30", 24, [7.5]),
+    ("at bedtime", 24, [22]),
+    ("in the morning", 24, [8]),
+    ("every 8 hours", 8, [8]),
+    ("every 6 hours from 6 am", 6, [6]),
+    ("every other day", 48, [9]),
+    ("every 3 days at 10 am", 72, [10]),
+    ("weekly", 168, [9]),
+])
+def test_parse_frequency(text, period_hours, hours):
+    schedule = parse_frequency(text, START)
+    assert schedule.anchor == local(2026, 1, 5)
+    assert (schedule.period, schedule.offsets) == (period_hours * HOUR, [hour * HOUR for hour in hours])
+
+
+@pytest.mark.parametrize("text", ["as needed", "prn", "if needed for pain", "whenever"])
+def test_parse_frequency_gives_none_for_as_needed_and_unknown(text):
+    assert parse_frequency(text, START) is None
+
+
+def test_daily_reminders_keep_their_wall_clock_time_across_daylight_saving(new_york):
+    twice_daily = parse_frequency("twice daily", datetime.date(2026, 3, 1))
+    # Clocks went forward on March 8 and go back on November 1
+    assert twice_daily.next_after(local(2026, 3, 20)) == local(2026, 3, 20, 9)
+    assert twice_daily.next_after(local(2026, 3, 20, 9)) == local(2026, 3, 20, 21)
+    assert twice_daily.next_after(local(2026, 11, 2)) == local(2026, 11, 2, 9)
+    weekly = parse_frequency("weekly", datetime.date(2026, 3, 2))
+    assert weekly.next_after(local(2026, 3, 10)) == local(2026, 3, 16, 9)
+    # Hourly schedules count elapsed time instead
+    every_8_hours = parse_frequency("every 8 hours", datetime.date(2026, 3, 7))
+    assert every_8_hours.next_after(local(2026, 3, 9)) == local(2026, 3, 9, 1)
+
+
+def test_timing_wheel_cascades_and_overflows_in_expiry_order():
+    # Four slots a level, two levels: 16 ticks before items wait in the overflow heap
+    wheel = TimingWheel(0, tick=1, slot_bits=2, levels=2)
+    rng = random.Random(1)
+    expiry = {}
+    for n in range(300):
+        when = rng.randrange(1, 100) + rng.random()
+        wheel.add(when, n)
+        expiry[n] = int(when)
+    assert len(wheel) == 300
+    fired = []
+    for now in range(1, 101):
+        batch = wheel.advance(now)
+        assert sorted(batch) == sorted(n for n, tick in expiry.items() if tick == now), f"tick {now}"
+        fired.extend(batch)
+    assert [expiry[n] for n in fired] == sorted(expiry.values())
+    assert len(wheel) == 0
+
+
+def test_timing_wheel_returns_overdue_items_on_the_next_advance():
+    wheel = TimingWheel(100, tick=1)
+    wheel.add(50, "late")
+    wheel.add(100.5, "now")
+    wheel.add(101, "next")
+    assert wheel.advance(100) == ["late", "now"]
+    assert wheel.advance(101) == ["next"]
+
+
+def medication(frequency="twice daily", name="Lisinopril"):
+    return {"medication_id": "m1", "name": name, "dosage": "10 mg", "frequency": frequency, "start_date": START.isoformat()}
+
+
+def test_a_cancelled_reminder_never_fires():
+    clock = Clock(local(2026, 1, 5, 8))
+    sink = MemorySink()
+    scheduler = ReminderScheduler(sink=sink, clock=clock)
+    kept = scheduler.schedule("ana", medication())
+    cancelled = scheduler.schedule("ana", medication(name="Metformin"))
+    scheduler.cancel(cancelled.reminder_id)
+    scheduler.schedule("bo", medication())
+    scheduler.cancel_user("bo")
+    assert scheduler.run_due(local(2026, 1, 5, 9)) == 1
+    assert [name for _, name, _, _ in sink.sent] == ["Lisinopril"]
+    assert kept.next_due == local(2026, 1, 5, 21) and len(scheduler) == 1
+
+
+def test_a_sent_reminder_fires_once_from_its_new_time():
+    clock = Clock(local(2026, 1, 5, 8))
+    sink = MemorySink()
+    scheduler = ReminderScheduler(sink=sink, clock=clock)
+    scheduler.schedule("ana", medication())
+    assert scheduler.run_due(local(2026, 1, 5, 9)) == 1
+    # Sent at 9 am and put back on the wheel for 9 pm: nothing in between
+    assert scheduler.run_due(local(2026, 1, 5, 20)) == 0
+    assert scheduler.run_due(local(2026, 1, 5, 21)) == 1
+    assert [due for *_, due in sink.sent] == [local(2026, 1, 5, 9), local(2026, 1, 5, 21)]
+
+
+def test_sqlite_reminders_replay_once_after_a_restart(tmp_path):
+    path = str(tmp_path / "reminders.db")
+    clock = Clock(local(2026, 1, 5, 8))
+    scheduler = ReminderScheduler(SQLiteReminderQueue(path), MemorySink(), clock=clock)
+    scheduler.schedule_many((f"user-{i}", medication()) for i in range(50))
+    cancelled = scheduler.schedule("gone", medication())
+    scheduler.cancel(cancelled.reminder_id)
+    scheduler.close()
+    
+    # Down for three days: each reminder is overdue and sent once, then rescheduled after now
+    clock.now = local(2026, 1, 8, 12)
+    sink = MemorySink()
+    scheduler = ReminderScheduler(SQLiteReminderQueue(path), sink, clock=clock)
+    assert len(scheduler) == 50
+    assert scheduler.run_due() == 50
+    assert sorted(user_id for user_id, *_ in sink.sent) == sorted(f"user-{i}" for i in range(50))
+    assert all(reminder.next_due == local(2026, 1, 8, 21) for reminder in scheduler.reminders.values())
+    assert scheduler.run_due() == 0
+    scheduler.close()
+    
+    reopened = ReminderScheduler(SQLiteReminderQueue(path), MemorySink(), clock=clock)
+    assert reopened.run_due() == 0
+    assert {reminder.next_due for reminder in reopened.reminders.values()} == {local(2026, 1, 8, 21)}
+    reopened.close()
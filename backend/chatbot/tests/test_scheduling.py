@@ -0,0 +1,115 @@
+import datetime
+import random
+
+import pytest
+
+from app.backends import SQLiteUserBackend
+from app.models import User
+from app.scheduling import Scheduler, SlotTakenError, SQLiteBookingStore
+from app.store import DataStore
+
+MONDAY = datetime.datetime(2026, 1, 5, 9)
+SLOT = datetime.timedelta(minutes=30)
+
+
+def brute_force_earliest(scheduler, start, duration=None):
+    # What _check_appointment used to do: ask every calendar, earliest first, then order added
+    times = [(calendar.next_free(start, duration), n, calendar) for n, calendar in enumerate(scheduler.calendars.values())]
+    next_free, _, calendar = min(times, key=lambda item: item[:2])
+    return calendar, next_free
+
+
+@pytest.fixture
+def scheduler():
+    rng = random.Random(3)
+    scheduler = Scheduler()
+    for i in range(40):
+        # Three shifts: weekdays 9-17, weekdays 8-12, and weekends 10-14
+        if i % 3 == 0:
+            scheduler.add_doctor(f"Dr. Doctor{i}")
+        elif i % 3 == 1:
+            scheduler.add_doctor(f"Dr. Doctor{i}", hours=(8, 12))
+        else:
+            scheduler.add_doctor(f"Dr. Doctor{i}", hours=(10, 14), weekdays=(5, 6))
+    for n in range(3000):
+        calendar = scheduler.calendar(f"Doctor{rng.randrange(40)}")
+        start = MONDAY + datetime.timedelta(days=rng.randrange(10)) + SLOT * rng.randrange(-2, 18)
+        try:
+            calendar.book(str(n), start, "patient", duration=rng.choice((30, 60)))
+        except SlotTakenError:
+            pass
+    return scheduler
+
+
+def test_earliest_available_agrees_with_asking_every_calendar(scheduler):
+    rng = random.Random(4)
+    for _ in range(500):
+        start = MONDAY + datetime.timedelta(days=rng.randrange(12), minutes=rng.randrange(0, 24 * 60, 15))
+        duration = rng.choice((None, 60))
+        calendar, next_free = scheduler.earliest_available(start, duration)
+        expected_calendar, expected_free = brute_force_earliest(scheduler, start, duration)
+        assert (calendar.name, next_free) == (expected_calendar.name, expected_free)
+        assert calendar.is_free(next_free, duration)
+
+
+def test_cancelling_frees_the_slot_in_the_index():
+    scheduler = Scheduler(["Dr. Smith", "Dr. Jones"])
+    scheduler.calendar("Smith").book("a", MONDAY, "p1")
+    assert scheduler.first_available(MONDAY).name == "Dr. Jones"
+    scheduler.calendar("Jones").book("b", MONDAY, "p2")
+    assert scheduler.first_available(MONDAY) is None
+    assert scheduler.earliest_available(MONDAY) == (scheduler.calendar("Smith"), MONDAY + SLOT)
+    scheduler.calendar("Smith").cancel("a")
+    assert scheduler.first_available(MONDAY).name == "Dr. Smith"
+
+
+def test_a_weekend_request_moves_to_the_next_opening():
+    scheduler = Scheduler(f"Dr. Doctor{i}" for i in range(100))
+    saturday = datetime.datetime(2026, 1, 10, 11)
+    assert scheduler.earliest_available(saturday) == (scheduler.calendar("Doctor0"), datetime.datetime(2026, 1, 12, 9))
+    assert Scheduler().earliest_available(saturday) is None
+
+
+def test_bookings_persist_in_their_own_table(tmp_path):
+    path = str(tmp_path / "bookings.db")
+    scheduler = Scheduler(["Dr. Smith", "Dr. Jones"], store=SQLiteBookingStore(path))
+    scheduler.calendar("Smith").book("a", MONDAY, "p1", duration=60)
+    scheduler.calendar("Jones").book("b", MONDAY, "p2")
+    scheduler.calendar("Jones").book("c", MONDAY + SLOT, "p3")
+    scheduler.calendar("Jones").cancel("b")
+    scheduler.close()
+    
+    reopened = Scheduler(["Dr. Smith", "Dr. Jones"], store=SQLiteBookingStore(path))
+    assert not reopened.store.needs_import
+    assert reopened.calendar("Smith").next_free(MONDAY) == MONDAY + 2 * SLOT
+    assert reopened.calendar("Jones").next_free(MONDAY) == MONDAY
+    assert reopened.earliest_available(MONDAY + SLOT) == (reopened.calendar("Smith"), MONDAY + 2 * SLOT)
+    reopened.close()
+
+
+class CountingBackend(SQLiteUserBackend):
+    scans = 0
+    
+    def __iter__(self):
+        CountingBackend.scans += 1
+        return super().__iter__()
+
+
+def test_a_sqlite_data_store_starts_without_reading_every_user(tmp_path):
+    users, bookings = str(tmp_path / "users.db"), str(tmp_path / "bookings.db")
+    backend = CountingBackend(users)
+    patient = User("ana", "Ana", "ana@example.com", "01/01/1990")
+    patient.appointments.append({"appointment_id": "a1", "doctor": "Dr. Smith", "date_time": MONDAY.isoformat(), "status": "scheduled"})
+    backend.put(patient)
+    
+    # The first start with a booking table imports what the user records hold, once
+    store = DataStore(backend, bookings=SQLiteBookingStore(bookings))
+    assert CountingBackend.scans == 1
+    assert not store.scheduler.calendar("Smith").is_free(MONDAY)
+    store.close()
+    
+    store = DataStore(CountingBackend(users), bookings=SQLiteBookingStore(bookings))
+    assert CountingBackend.scans == 1
+    assert not store.scheduler.calendar("Smith").is_free(MONDAY)
+    assert store.get_user_by_email("ANA@example.com").user_id == "ana"
+    store.close()
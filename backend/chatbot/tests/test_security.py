@@ -0,0 +1,111 @@
+import hashlib
+import threading
+import time
+
+import pytest
+from flask import Flask
+
+from app.dialog import DialogManager
+from app.models import User
+from app.nlp import NLPEngine
+from app.security import AuthBusyError, RateLimiter, SecurityManager
+from app.sessions import SessionStore
+from app.store import DataStore
+from main import init_routes
+
+
+def make_client(security_manager):
+    data_store = DataStore()
+    app = Flask(__name__)
+    init_routes(app, DialogManager(data_store, NLPEngine(data_store), security_manager=security_manager),
+                security_manager, SessionStore())
+    return app.test_client(), data_store
+
+
+def login(client, email, password, client_ip="10.0.0.1"):
+    return client.post("/api/authenticate", json={"email": email, "password": password},
+                       environ_base={"REMOTE_ADDR": client_ip})
+
+
+def test_a_legacy_hash_logs_in_and_is_upgraded_to_scrypt(security_manager):
+    client, data_store = make_client(security_manager)
+    legacy = hashlib.sha256(b"hunter22").hexdigest()
+    data_store.create_user(User("ana", "Ana", "ana@example.com", "01/01/1990", legacy))
+    assert security_manager.needs_rehash(legacy)
+    
+    assert login(client, "ana@example.com", "wrong").status_code == 401
+    assert data_store.get_user("ana").password_hash == legacy
+    response = login(client, "ana@example.com", "hunter22")
+    assert response.status_code == 200 and response.get_json()["session_token"]
+    upgraded = data_store.get_user("ana").password_hash
+    assert upgraded.startswith("scrypt$16$8$1$")
+    assert not security_manager.needs_rehash(upgraded)
+    # The new hash keeps working, and isn't redone
+    assert login(client, "ana@example.com", "hunter22").status_code == 200
+    assert data_store.get_user("ana").password_hash == upgraded
+
+
+def test_a_hash_with_an_older_cost_is_upgraded(security_manager):
+    client, data_store = make_client(security_manager)
+    older = SecurityManager(n=8)
+    try:
+        data_store.create_user(User("bo", "Bo", "bo@example.com", "01/01/1990", older.hash_password("hunter22")))
+    finally:
+        older.close()
+    assert security_manager.needs_rehash(data_store.get_user("bo").password_hash)
+    assert login(client, "bo@example.com", "hunter22").status_code == 200
+    assert data_store.get_user("bo").password_hash.startswith("scrypt$16$")
+
+
+def test_logins_past_the_burst_get_a_429():
+    security_manager = SecurityManager(n=16, rate_limiter=RateLimiter(rate=0.001, burst=3))
+    try:
+        client, _ = make_client(security_manager)
+        assert [login(client, "nobody@example.com", "x").status_code for _ in range(4)] == [401, 401, 401, 429]
+        response = client.post("/api/register", json={"name": "Cy", "email": "cy@example.com", "dob": "01/01/1990",
+                                                       "password": "pw"}, environ_base={"REMOTE_ADDR": "10.0.0.1"})
+        assert response.status_code == 429
+        assert response.get_json() == {"error": "Too many login attempts"}
+        # Other clients have their own bucket
+        assert login(client, "nobody@example.com", "x", client_ip="10.0.0.2").status_code == 401
+    finally:
+        security_manager.close()
+
+
+def test_the_rate_limiter_refills_over_time(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    limiter = RateLimiter(rate=1.0, burst=2, max_keys=2)
+    assert [limiter.allow("a") for _ in range(3)] == [True, True, False]
+    now[0] += 1.0
+    assert limiter.allow("a") and not limiter.allow("a")
+    # Past max_keys the least recently seen client starts over with a full bucket
+    limiter.allow("b")
+    limiter.allow("c")
+    assert [limiter.allow("a") for _ in range(3)] == [True, True, False]
+
+
+def test_a_full_hashing_queue_answers_503():
+    security_manager = SecurityManager(n=16, max_pending=1)
+    try:
+        client, data_store = make_client(security_manager)
+        data_store.create_user(User("dee", "Dee", "dee@example.com", "01/01/1990", security_manager.hash_password("pw")))
+        # Hold the only slot with a long job
+        busy = security_manager._submit(time.sleep, 1.0)
+        # Done callbacks run in order, so this one sees the slot already released
+        released = threading.Event()
+        busy.add_done_callback(lambda _: released.set())
+        with pytest.raises(AuthBusyError):
+            security_manager.submit_hash("pw")
+        response = login(client, "dee@example.com", "pw")
+        assert response.status_code == 503
+        assert response.get_json() == {"error": "Authentication is busy, try again shortly"}
+        response = client.post("/api/register", json={"name": "Eve", "email": "eve@example.com", "dob": "01/01/1990",
+                                                       "password": "pw"})
+        assert response.status_code == 503
+        assert data_store.get_user_by_email("eve@example.com") is None
+        # The slot is given back once the job is done
+        assert released.wait(10)
+        assert login(client, "dee@example.com", "pw").status_code == 200
+    finally:
+        security_manager.close()
@@ -0,0 +1,125 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from app import sessions
+from app.sessions import MemorySessionBackend, SQLiteSessionBackend, SessionStore
+
+
+class Clock:
+    def __init__(self, now: float):
+        self.now = now
+    
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock(1000.0)
+    monkeypatch.setattr(sessions, "time", SimpleNamespace(time=clock.time))
+    return clock
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_store(request, tmp_path):
+    stores = []
+    
+    def make(ttl=10, max_sessions=100):
+        if request.param == "memory":
+            backend = MemorySessionBackend()
+        else:
+            backend = SQLiteSessionBackend(str(tmp_path / "sessions.db"), f"test{len(stores)}")
+        store = SessionStore(ttl, max_sessions, backend)
+        stores.append(store)
+        return store
+    yield make
+    for store in stores:
+        store.close()
+
+
+def test_each_access_slides_the_expiry(clock, make_store):
+    store = make_store(ttl=10)
+    store.set("token", "ana")
+    clock.now += 9
+    assert store.get("token") == "ana"
+    clock.now += 9
+    assert store.get("token") == "ana"
+    # Ten seconds after the last access the session is gone, before any sweep
+    clock.now += 10
+    assert store.get("token") is None
+    assert "token" not in store
+
+
+def test_setting_a_session_again_restarts_its_ttl(clock, make_store):
+    store = make_store(ttl=10)
+    store.set("token", {"user_id": "ana"})
+    clock.now += 8
+    store.set("token", {"user_id": "bo"})
+    clock.now += 8
+    assert store.get("token") == {"user_id": "bo"}
+
+
+def test_sweep_drops_only_expired_sessions(clock, make_store):
+    store = make_store(ttl=10)
+    for n in range(5):
+        store.set(f"old-{n}", n)
+    clock.now += 6
+    store.set("new", "kept")
+    store.get("old-0")
+    clock.now += 6
+    assert store.sweep() == 4
+    assert len(store) == 2
+    assert store.get("old-0") == 0 and store.get("new") == "kept"
+    assert store.metrics() == {"live_sessions": 2, "expired_evictions": 4, "lru_evictions": 0}
+
+
+def test_the_least_recently_used_sessions_go_past_the_cap(clock, make_store):
+    store = make_store(max_sessions=3)
+    for key in ("a", "b", "c"):
+        store.set(key, key)
+        clock.now += 1
+    store.get("a")
+    clock.now += 1
+    store.set("d", "d")
+    # Memory stores trim on every write; SQLite ones on the next sweep
+    if isinstance(store.backend, SQLiteSessionBackend):
+        assert len(store) == 4
+        assert store.sweep() == 1
+    assert [key for key in "abcd" if store.get(key)] == ["a", "c", "d"]
+    assert store.metrics()["lru_evictions"] == 1
+
+
+def test_two_sqlite_stores_share_sessions(clock, tmp_path):
+    path = str(tmp_path / "sessions.db")
+    first, second = (SessionStore(10, 100, SQLiteSessionBackend(path, "shared")) for _ in range(2))
+    try:
+        first.set("token", "ana")
+        clock.now += 8
+        assert second.get("token") == "ana"
+        clock.now += 8
+        # The other worker's read slid the expiry for both
+        assert first.get("token") == "ana"
+        second.delete("token")
+        assert first.get("token") is None
+    finally:
+        first.close()
+        second.close()
+
+
+def test_the_sweeper_thread_evicts_in_the_background(clock, make_store):
+    store = make_store(ttl=10)
+    store.set("token", "ana")
+    store.start_sweeper(interval=0.01)
+    store.start_sweeper(interval=0.01)
+    try:
+        clock.now += 11
+        deadline = time.monotonic() + 5
+        while len(store):
+            assert time.monotonic() < deadline, "sweeper never ran"
+            time.sleep(0.01)
+        assert store.metrics()["expired_evictions"] == 1
+    finally:
+        store.stop_sweeper()
+    assert store._sweeper is None
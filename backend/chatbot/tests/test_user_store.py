@@ -0,0 +1,131 @@
+import sqlite3
+
+import pytest
+
+from app.backends import SQLiteUserBackend
+from app.indexes import DuplicateValueError, UnwrittenUsersError
+from app.models import User
+from app.store import DataStore
+
+
+@pytest.fixture
+def workers(tmp_path):
+    # Two workers' stores on one database file, each with its own in-process index
+    path = str(tmp_path / "users.db")
+    stores = [DataStore(SQLiteUserBackend(path)) for _ in range(2)]
+    yield stores
+    for store in stores:
+        store.close()
+
+
+def test_an_email_taken_in_another_worker_is_rejected_whatever_its_case(workers):
+    first, second = workers
+    first.create_user(User("alice-1", "Alice", "Alice@X.com", "01/01/1990"))
+    with pytest.raises(DuplicateValueError) as error:
+        second.create_user(User("alice-2", "Alice", "alice@x.com", "01/01/1990"))
+    assert error.value.field == "email"
+    assert second.get_user("alice-2") is None
+    assert second.indexes.lookup("email", "alice@x.com") is None
+    assert second.get_user_by_email("alice@x.com").user_id == "alice-1"
+    assert len(second.users) == 1
+
+
+def test_email_lookups_ignore_case_and_surrounding_space(workers):
+    first, second = workers
+    first.create_user(User("bob", "Bob", "Bob@Example.com", "01/01/1990"))
+    assert second.get_user_by_email(" bob@example.COM ").user_id == "bob"
+    assert second.users.get_by_email("BOB@EXAMPLE.COM").email == "Bob@Example.com"
+
+
+def test_changing_to_an_email_another_worker_holds_is_rejected(workers):
+    first, second = workers
+    first.create_user(User("carol", "Carol", "carol@example.com", "01/01/1990"))
+    second.create_user(User("dave", "Dave", "dave@example.com", "01/01/1990"))
+    dave = second.get_user("dave")
+    dave.email = "CAROL@example.com"
+    with pytest.raises(DuplicateValueError):
+        second.update_user(dave)
+    assert second.get_user("dave").email == "dave@example.com"
+    assert second.get_user_by_email("dave@example.com").user_id == "dave"
+
+
+def test_a_table_with_raw_emails_is_normalized_on_open(tmp_path):
+    path = str(tmp_path / "users.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE users (user_id TEXT PRIMARY KEY, email TEXT, data BLOB NOT NULL)")
+    conn.execute("CREATE INDEX users_email ON users (email)")
+    conn.execute("INSERT INTO users VALUES (?, ?, ?)", ("erin", "Erin@Example.com", User("erin", "Erin", "Erin@Example.com", "01/01/1990").to_bytes()))
+    conn.commit()
+    conn.close()
+    backend = SQLiteUserBackend(path)
+    try:
+        assert backend.get_by_email("erin@example.com").user_id == "erin"
+        with pytest.raises(DuplicateValueError):
+            backend.insert_many([User("erin-2", "Erin", "ERIN@example.com", "01/01/1990")])
+    finally:
+        backend.close()
+
+
+def user(user_id, email):
+    return User(user_id, user_id.title(), email, "01/01/1990")
+
+
+def test_a_buffered_update_to_a_taken_email_is_rejected_before_it_is_buffered(tmp_path):
+    backend = SQLiteUserBackend(str(tmp_path / "users.db"), batch_size=10)
+    try:
+        backend.insert_many([user("alice", "alice@x.com"), user("bob", "bob@x.com")])
+        with pytest.raises(DuplicateValueError):
+            backend.put(user("bob", "ALICE@x.com"))
+        backend.put(user("carol", "carol@x.com"))
+        with pytest.raises(DuplicateValueError):
+            backend.put(user("dave", "carol@x.com"))
+        with pytest.raises(DuplicateValueError):
+            backend.put_many([user("erin", "same@x.com"), user("frank", "same@x.com")])
+        # Moving an email within one user, or back from a buffered change, is fine
+        backend.put(user("bob", "robert@x.com"))
+        backend.put(user("bob", "bob@x.com"))
+        backend.flush()
+        assert sorted((u.user_id, u.email) for u in backend) == [
+            ("alice", "alice@x.com"), ("bob", "bob@x.com"), ("carol", "carol@x.com")]
+    finally:
+        backend.close()
+
+
+def test_a_flush_reports_every_update_another_worker_beat_to_an_email(tmp_path):
+    path = str(tmp_path / "users.db")
+    batched, other = SQLiteUserBackend(path, batch_size=10), SQLiteUserBackend(path)
+    try:
+        batched.insert_many([user("ana", "ana@x.com"), user("bo", "bo@x.com"), user("cy", "cy@x.com")])
+        batched.put_many([user("ana", "new-ana@x.com"), user("bo", "new-bo@x.com"), user("cy", "cy@y.com")])
+        other.insert_many([user("dan", "new-ana@x.com"), user("eve", "new-bo@x.com")])
+        with pytest.raises(UnwrittenUsersError) as error:
+            batched.flush()
+        assert sorted(error.value.errors) == ["ana", "bo"]
+        assert error.value.errors["bo"].field == "email"
+        assert "ana" in str(error.value) and "bo" in str(error.value)
+        assert [other.get(user_id).email for user_id in ("ana", "bo", "cy")] == ["ana@x.com", "bo@x.com", "cy@y.com"]
+    finally:
+        batched.close()
+        other.close()
+
+
+def test_an_update_is_not_blamed_for_another_users_rejected_flush(tmp_path, caplog):
+    path = str(tmp_path / "users.db")
+    store, other = DataStore(SQLiteUserBackend(path, batch_size=2)), DataStore(SQLiteUserBackend(path))
+    try:
+        store.create_users([user("ana", "ana@x.com"), user("bo", "bo@x.com")])
+        ana = store.get_user("ana")
+        ana.email = "taken@x.com"
+        store.update_user(ana)
+        other.create_user(user("cy", "taken@x.com"))
+        bo = store.get_user("bo")
+        bo.name = "Bo B."
+        store.update_user(bo)
+        assert "ana" in caplog.text
+        assert store.get_user("bo").name == "Bo B."
+        assert store.get_user("ana").email == "ana@x.com"
+        assert store.get_user_by_email("ana@x.com").user_id == "ana"
+        assert store.get_user_by_email("taken@x.com").user_id == "cy"
+    finally:
+        store.close()
+        other.close()
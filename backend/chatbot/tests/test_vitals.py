@@ -0,0 +1,140 @@
+import random
+import threading
+import time
+
+import pytest
+
+from app.vitals import DAY, WEEK, WEEK_OFFSET, SQLiteVitalsStore, VitalsStore, _Series
+
+# A Monday 00:00 UTC
+MONDAY = 1_767_571_200
+
+
+def brute_force(points, start, end):
+    values = [values for timestamp, values in points if start <= timestamp < end]
+    if not values:
+        return 0, []
+    return len(values), [stat for field in zip(*values) for stat in (sum(field) / len(values), min(field), max(field))]
+
+
+def summarized(series, start, end):
+    stats = series.summarize(start, end)
+    if not stats.count:
+        return 0, []
+    return stats.count, [stat for total, low, high in zip(stats.sums, stats.mins, stats.maxs) for stat in (total / stats.count, low, high)]
+
+
+@pytest.fixture(scope="module")
+def readings():
+    rng = random.Random(5)
+    points = [(MONDAY - 3 * WEEK + rng.uniform(0, 8 * WEEK), [rng.uniform(60, 180), rng.uniform(40, 120)]) for _ in range(3000)]
+    # Readings exactly on day and week boundaries
+    points += [(MONDAY + n * DAY, [100.0, 70.0]) for n in range(-7, 8)]
+    return points
+
+
+def test_monday_is_a_week_boundary():
+    assert (MONDAY - WEEK_OFFSET) % WEEK == 0
+
+
+@pytest.mark.parametrize("start, end", [
+    # Raw points only: within one day, or across a single midnight
+    (MONDAY + 3600, MONDAY + 7200),
+    (MONDAY - 3600, MONDAY + 3600),
+    (MONDAY + 12 * 3600, MONDAY + DAY + 12 * 3600),
+    # Whole days, no whole week
+    (MONDAY + DAY, MONDAY + 3 * DAY),
+    (MONDAY + 0.5 * DAY, MONDAY + 4.25 * DAY),
+    (MONDAY - 2.5 * DAY, MONDAY + 3.5 * DAY),
+    # Weeks, with days and partial days either side
+    (MONDAY, MONDAY + WEEK),
+    (MONDAY - WEEK, MONDAY + 2 * WEEK),
+    (MONDAY - 1.3 * DAY, MONDAY + WEEK + 2.7 * DAY),
+    (MONDAY - 2 * WEEK - 0.2 * DAY, MONDAY + 3 * WEEK + 0.1 * DAY),
+    # Before, after and around all the data, and empty
+    (MONDAY - 10 * WEEK, MONDAY - 9 * WEEK),
+    (MONDAY + 9 * WEEK, MONDAY + 10 * WEEK),
+    (MONDAY - 10 * WEEK, MONDAY + 10 * WEEK),
+    (MONDAY, MONDAY),
+])
+def test_summarize_matches_a_scan_of_the_raw_points(readings, start, end):
+    series = _Series(2)
+    for timestamp, values in sorted(readings):
+        series.append(timestamp, values)
+    count, fields = summarized(series, start, end)
+    expected_count, expected_fields = brute_force(readings, start, end)
+    assert count == expected_count
+    assert fields == pytest.approx(expected_fields)
+
+
+def test_backdated_readings_land_in_order_and_in_their_buckets(readings):
+    in_order, shuffled = _Series(2), _Series(2)
+    for timestamp, values in sorted(readings):
+        in_order.append(timestamp, values)
+    late = list(readings)
+    random.Random(6).shuffle(late)
+    for timestamp, values in late:
+        shuffled.append(timestamp, values)
+    assert list(shuffled.times) == list(in_order.times)
+    assert [list(column) for column in shuffled.columns] == [list(column) for column in in_order.columns]
+    for rollup in ("daily", "weekly"):
+        expected, actual = getattr(in_order, rollup), getattr(shuffled, rollup)
+        assert list(actual.starts) == list(expected.starts)
+        assert list(actual.counts) == list(expected.counts)
+        assert [list(column) for column in actual.mins] == [list(column) for column in expected.mins]
+        assert [list(column) for column in actual.maxs] == [list(column) for column in expected.maxs]
+        assert [list(column) for column in actual.sums] == [pytest.approx(list(column)) for column in expected.sums]
+
+
+def test_a_backdated_reading_is_counted_in_summaries_and_rollups():
+    vitals = VitalsStore()
+    vitals.record_many("ana", "glucose", [(MONDAY + n * DAY, [100.0]) for n in (0, 1, 2, 10)])
+    vitals.record("ana", "glucose", [220.0], timestamp=MONDAY + 5 * DAY + 60)
+    assert vitals.latest("ana", "glucose") == (MONDAY + 10 * DAY, [100.0])
+    summary = vitals.summary("ana", "glucose", MONDAY, MONDAY + 2 * WEEK)
+    assert summary["count"] == 5 and summary["fields"]["glucose"]["max"] == 220.0
+    assert [day["start"] for day in vitals.rollup("ana", "glucose", MONDAY, MONDAY + 2 * WEEK)] == [
+        MONDAY + n * DAY for n in (0, 1, 2, 5, 10)]
+
+
+def test_sqlite_users_past_max_users_are_dropped_and_reloaded(tmp_path):
+    vitals = SQLiteVitalsStore(str(tmp_path / "vitals.db"), max_users=2)
+    try:
+        for n, user_id in enumerate(("ana", "bo", "cy")):
+            vitals.record(user_id, "weight", [70.0 + n], timestamp=MONDAY)
+        assert list(vitals._series) == ["bo", "cy"]
+        vitals.latest("bo", "weight")
+        assert vitals.latest("ana", "weight") == (MONDAY, [70.0])
+        assert list(vitals._series) == ["bo", "ana"]
+        vitals.record("cy", "weight", [75.0], timestamp=MONDAY + DAY)
+        assert vitals.summary("cy", "weight", MONDAY, MONDAY + WEEK)["count"] == 2
+    finally:
+        vitals.close()
+
+
+def test_in_memory_vitals_are_never_dropped():
+    vitals = VitalsStore()
+    for n in range(100):
+        vitals.record(f"user-{n}", "heart_rate", [60.0], timestamp=MONDAY)
+    assert all(vitals.latest(f"user-{n}", "heart_rate") for n in range(100))
+
+
+def test_loading_one_user_does_not_hold_up_another(tmp_path):
+    class SlowLoads(SQLiteVitalsStore):
+        def _load(self, user_id):
+            if user_id == "slow":
+                time.sleep(0.5)
+            return super()._load(user_id)
+    
+    vitals = SlowLoads(str(tmp_path / "vitals.db"))
+    try:
+        loading = threading.Thread(target=vitals.metrics, args=("slow",))
+        loading.start()
+        time.sleep(0.05)
+        started = time.perf_counter()
+        vitals.record("fast", "glucose", [95.0], timestamp=MONDAY)
+        assert vitals.latest("fast", "glucose") == (MONDAY, [95.0])
+        assert time.perf_counter() - started < 0.3
+        loading.join()
+    finally:
+        vitals.close()
@@ -0,0 +1,200 @@
+import os
+import sys
+import mmap
+import gzip
+import struct
+from bisect import bisect_left
+from typing import List, Dict, Any, Optional, Iterable, Iterator, Tuple
+
+# Compact, sorted allele-frequency index
+#
+# File layout: an 8-byte header (magic + record count) followed by fixed-size
+# records sorted by numeric rsid, so a lookup is a binary search over a
+# memory-mapped file and nothing is loaded up front. Build it from a
+# population VCF subset (gnomAD, 1000 Genomes) or a TSV with
+# `rsid ref alt alt_frequency` columns:
+#
+#     python allele_frequency.py build 1kg_subset.vcf.gz data/allele_frequencies.afi
+
+INDEX_MAGIC = b'AFI1'
+INDEX_HEADER = struct.Struct('<4sI')
+INDEX_RECORD = struct.Struct('<I1s1sf')  # rs number, ref, alt, alt allele frequency
+
+DEFAULT_INDEX_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'allele_frequencies.afi')
+
+# Expected genotype frequency (Hardy-Weinberg) below which a genotype is flagged
+RARE_GENOTYPE_FREQUENCY = 0.01
+UNCOMMON_GENOTYPE_FREQUENCY = 0.05
+
+COMPLEMENT = {'A': 'T', 'T': 'A', 'C': 'G', 'G': 'C'}
+
+
+def _read_source(source_path: str) -> Iterator[Tuple[int, str, str, float]]:
+    """
+    Yield (rs number, ref, alt, alt frequency) for every biallelic SNV in a VCF or TSV file
+    """
+    opener = gzip.open if source_path.endswith('.gz') else open
+    with opener(source_path, 'rt') as f:
+        for line in f:
+            if line.startswith('#') or not line.strip():
+                continue
+            parts = line.rstrip('\n').split('\t')
+
+            if len(parts) >= 8:
+                # VCF: CHROM POS ID REF ALT QUAL FILTER INFO
+                rsid, ref, alt, info = parts[2], parts[3], parts[4].split(',')[0], parts[7]
+                frequency = None
+                for field in info.split(';'):
+                    if field.startswith('AF='):
+                        frequency = float(field[3:].split(',')[0])
+                        break
+                if frequency is None:
+                    continue
+            else:
+                rsid, ref, alt, frequency = parts[0], parts[1], parts[2], float(parts[3])
+
+            if not rsid.startswith('rs') or not rsid[2:].isdigit() or len(ref) != 1 or len(alt) != 1:
+                continue
+            yield int(rsid[2:]), ref.upper(), alt.upper(), frequency
+
+
+def build_index(source_path: str, output_path: str) -> int:
+    """
+    Build a sorted binary allele-frequency index from a VCF or TSV subset
+
+    Args:
+        source_path: Population frequency file (.vcf, .tsv, optionally gzipped)
+        output_path: Where to write the index
+
+    Returns:
+        Number of records written
+    """
+    records = {}
+    for rs_number, ref, alt, frequency in _read_source(source_path):
+        # Keep the first record seen for an rsid
+        records.setdefault(rs_number, (ref, alt, frequency))
+
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    with open(output_path, 'wb') as f:
+        f.write(INDEX_HEADER.pack(INDEX_MAGIC, len(records)))
+        for rs_number in sorted(records):
+            ref, alt, frequency = records[rs_number]
+            f.write(INDEX_RECORD.pack(rs_number, ref.encode(), alt.encode(), frequency))
+    return len(records)
+
+
+class _RsidColumn:
+    """
+    Sequence view of the rs numbers in the mapped index, for bisect
+    """
+
+    def __init__(self, buffer: mmap.mmap, count: int):
+        self._buffer = buffer
+        self._count = count
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, position: int) -> int:
+        return struct.unpack_from('<I', self._buffer, INDEX_HEADER.size + position * INDEX_RECORD.size)[0]
+
+
+class AlleleFrequencyIndex:
+    """
+    Memory-mapped allele-frequency index queried in bulk by rsid
+    """
+
+    def __init__(self, index_path: str = DEFAULT_INDEX_PATH):
+        """
+        Open an index built by build_index
+
+        Args:
+            index_path: Path to the .afi index file
+        """
+        self.index_path = index_path
+        self._file = open(index_path, 'rb')
+        self._buffer = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, self.record_count = INDEX_HEADER.unpack_from(self._buffer, 0)
+        if magic != INDEX_MAGIC:
+            raise ValueError(f"{index_path} is not an allele frequency index")
+        self._rsids = _RsidColumn(self._buffer, self.record_count)
+
+    def close(self) -> None:
+        self._buffer.close()
+        self._file.close()
+
+    def lookup(self, rsids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Look up many rsids at once
+
+        The queries are sorted so each binary search starts where the previous
+        one ended, which keeps a bulk lookup to a few page touches per marker.
+
+        Args:
+            rsids: rsids to look up (e.g. ['rs429358', 'rs7412'])
+
+        Returns:
+            Mapping of rsid to {'ref', 'alt', 'alt_frequency'} for every rsid found
+        """
+        numbers = sorted({int(rsid[2:]) for rsid in rsids if rsid.startswith('rs') and rsid[2:].isdigit()})
+        results = {}
+        low = 0
+        for rs_number in numbers:
+            position = bisect_left(self._rsids, rs_number, low)
+            if position >= self.record_count:
+                break
+            low = position
+            found, ref, alt, frequency = INDEX_RECORD.unpack_from(
+                self._buffer, INDEX_HEADER.size + position * INDEX_RECORD.size)
+            if found == rs_number:
+                results[f"rs{rs_number}"] = {
+                    'ref': ref.decode(),
+                    'alt': alt.decode(),
+                    'alt_frequency': round(frequency, 6)
+                }
+        return results
+
+
+def genotype_frequency(genotype: str, ref: str, alt: str, alt_frequency: float) -> Optional[Tuple[int, float]]:
+    """
+    Expected population frequency of a genotype under Hardy-Weinberg equilibrium
+
+    Args:
+        genotype: Two-letter genotype call (e.g. 'TC')
+        ref: Reference allele
+        alt: Alternate allele
+        alt_frequency: Population frequency of the alternate allele
+
+    Returns:
+        Tuple of (alt allele count, expected genotype frequency), or None if the
+        genotype does not match the indexed alleles on either strand
+    """
+    if not genotype or len(genotype) != 2 or '-' in genotype:
+        return None
+
+    alleles = genotype.upper()
+    if not all(allele in (ref, alt) for allele in alleles):
+        alleles = ''.join(COMPLEMENT.get(allele, allele) for allele in alleles)
+        if not all(allele in (ref, alt) for allele in alleles):
+            return None
+
+    alt_count = alleles.count(alt)
+    p, q = 1.0 - alt_frequency, alt_frequency
+    return alt_count, (p * p, 2 * p * q, q * q)[alt_count]
+
+
+def rarity(expected_frequency: float) -> str:
+    if expected_frequency < RARE_GENOTYPE_FREQUENCY:
+        return 'rare'
+    if expected_frequency < UNCOMMON_GENOTYPE_FREQUENCY:
+        return 'uncommon'
+    return 'common'
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 4 or sys.argv[1] != 'build':
+        print("Usage: python allele_frequency.py build <source.vcf|.tsv[.gz]> <output.afi>")
+        sys.exit(1)
+    count = build_index(sys.argv[2], sys.argv[3])
+    print(f"Wrote {count} records to {sys.argv[3]}")
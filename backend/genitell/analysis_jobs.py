@@ -0,0 +1,179 @@
+import os
+import time
+import uuid
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional, BinaryIO, Callable
+
+from dna_analysis import DNAAnalysisAgent, STREAM_CHUNK_SIZE
+
+# Pipeline stages in the order the worker runs them
+JOB_STAGES = ['parse', 'markers', 'validation', 'reports']
+
+# Share of the overall progress bar each stage accounts for (the LLM reports dominate)
+STAGE_WEIGHTS = {'parse': 25.0, 'markers': 5.0, 'validation': 5.0, 'reports': 65.0}
+
+
+class AnalysisJob:
+    """
+    State of one asynchronous DNA analysis
+    """
+
+    def __init__(self, file_hash: str, file_name: str, max_snps: Optional[int]):
+        self.job_id = str(uuid.uuid4())
+        self.file_hash = file_hash
+        self.file_name = file_name
+        self.max_snps = max_snps
+        self.status = 'queued'
+        self.stages = OrderedDict((stage, 0.0) for stage in JOB_STAGES)
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        with self._lock:
+            self.status = 'running'
+            self.updated_at = time.time()
+
+    def set_progress(self, stage: str, percent: float) -> None:
+        with self._lock:
+            self.stages[stage] = round(percent, 1)
+            self.updated_at = time.time()
+
+    def finish(self, result: Dict[str, Any] = None, error: str = None) -> None:
+        with self._lock:
+            if error:
+                self.status = 'failed'
+                self.error = error
+            else:
+                self.status = 'completed'
+                self.result = result
+                for stage in self.stages:
+                    self.stages[stage] = 100.0
+            self.updated_at = time.time()
+
+    @property
+    def progress(self) -> float:
+        return round(sum(STAGE_WEIGHTS[stage] * percent / 100.0 for stage, percent in self.stages.items()), 1)
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            data = {
+                'job_id': self.job_id,
+                'status': self.status,
+                'file_name': self.file_name,
+                'file_hash': self.file_hash,
+                'progress': self.progress,
+                'stages': dict(self.stages),
+                'created_at': self.created_at,
+                'updated_at': self.updated_at
+            }
+            if self.status == 'completed':
+                data['result'] = self.result
+            elif self.status == 'failed':
+                data['error'] = self.error
+            return data
+
+
+class AnalysisJobManager:
+    """
+    Runs DNA analyses on a bounded worker pool and tracks their progress
+
+    Uploads are spooled to a temporary file while being hashed, so a job is
+    keyed by its file hash before any parsing starts: submitting a file that
+    is already queued, running or completed returns the existing job instead
+    of starting a second run.
+    """
+
+    def __init__(self, dna_agent: DNAAnalysisAgent, max_workers: int = 2, max_jobs: int = 100,
+                 result_formatter: Callable[[Dict[str, Any]], Dict[str, Any]] = None):
+        """
+        Initialize the job manager
+
+        Args:
+            dna_agent: Agent used to run the analyses
+            max_workers: Maximum number of analyses running at the same time
+            max_jobs: Maximum number of jobs kept; the oldest finished jobs are dropped first
+            result_formatter: Optional function applied to the analysis report before it is stored
+        """
+        self.dna_agent = dna_agent
+        self.max_jobs = max_jobs
+        self.result_formatter = result_formatter
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='dna-analysis')
+        self.jobs = OrderedDict()
+        self.jobs_by_key = {}
+        self._lock = threading.Lock()
+
+    def submit(self, stream: BinaryIO, file_name: str, max_snps: int = None) -> AnalysisJob:
+        """
+        Create (or reuse) a job for an uploaded DNA file
+
+        Args:
+            stream: Binary stream of the upload (plain text, gzip or zip)
+            file_name: Original name of the uploaded file
+            max_snps: Maximum number of SNPs to analyze (None for all)
+
+        Returns:
+            The job analyzing this file
+        """
+        spool_path, file_hash = self._spool_upload(stream)
+        key = (file_hash, max_snps)
+
+        with self._lock:
+            existing = self.jobs_by_key.get(key)
+            if existing and existing.status != 'failed':
+                os.remove(spool_path)
+                return existing
+
+            job = AnalysisJob(file_hash, file_name, max_snps)
+            self.jobs[job.job_id] = job
+            self.jobs_by_key[key] = job
+            self._evict_finished_jobs()
+
+        self.executor.submit(self._run_job, job, spool_path)
+        return job
+
+    def get(self, job_id: str) -> Optional[AnalysisJob]:
+        return self.jobs.get(job_id)
+
+    def _spool_upload(self, stream: BinaryIO):
+        # Copy the upload to disk in chunks, hashing it on the way
+        sha256_hash = hashlib.sha256()
+        with tempfile.NamedTemporaryFile(prefix='dna-upload-', delete=False) as spool:
+            for byte_block in iter(lambda: stream.read(STREAM_CHUNK_SIZE), b""):
+                sha256_hash.update(byte_block)
+                spool.write(byte_block)
+        return spool.name, sha256_hash.hexdigest()
+
+    def _run_job(self, job: AnalysisJob, spool_path: str) -> None:
+        job.start()
+        try:
+            with open(spool_path, 'rb') as f:
+                report = self.dna_agent.analyze_dna_upload(
+                    f, job.file_name, job.max_snps,
+                    progress=job.set_progress, total_size=os.path.getsize(spool_path)
+                )
+            if 'error' in report:
+                job.finish(error=report['error'])
+            else:
+                job.finish(result=self.result_formatter(report) if self.result_formatter else report)
+        except Exception as e:
+            job.finish(error=str(e))
+        finally:
+            os.remove(spool_path)
+
+    def _evict_finished_jobs(self) -> None:
+        # Called with self._lock held
+        for job_id in list(self.jobs):
+            if len(self.jobs) <= self.max_jobs:
+                break
+            job = self.jobs[job_id]
+            if job.status in ('completed', 'failed'):
+                del self.jobs[job_id]
+                if self.jobs_by_key.get((job.file_hash, job.max_snps)) is job:
+                    del self.jobs_by_key[(job.file_hash, job.max_snps)]
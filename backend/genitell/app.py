@@ -1,6 +1,7 @@
-from flask import Flask, render_template, request, jsonify
-import os
+from flask import Flask, render_template, request, jsonify, Response
+import json
 from dna_analysis import DNAAnalysisAgent  # Make sure this file exists and has the class
+from analysis_jobs import AnalysisJobManager
 
 app = Flask(__name__)
 
@@ -10,42 +11,126 @@ api_key = "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"
 # Initialize the DNA analysis agent
 dna_agent = DNAAnalysisAgent(api_key=api_key)
 
+def _format_analysis_response(analysis_report):
+    return {
+        'technical_report': analysis_report['technical_report'],
+        'consumer_report': analysis_report['consumer_report'],
+        'validation_report': analysis_report['validation_report'],
+        'summary': {
+            'total_snps': analysis_report['data_summary']['total_snps_analyzed'],
+            'significant_markers': len(analysis_report['data_summary']['significant_markers']),
+            'file_hash': analysis_report['data_summary'].get('file_hash', 'Not available'),
+            'genotype_calls': analysis_report['data_summary']['genotype_calls']
+        }
+    }
+
+# Background jobs for analyses that outlive an HTTP request
+job_manager = AnalysisJobManager(dna_agent, max_workers=2, result_formatter=_format_analysis_response)
+
 @app.route('/')
 def index():
     return render_template('index.html')
 
+def _get_dna_upload():
+    """
+    Return the (stream, file_name) of the uploaded DNA file.
+    
+    Accepts a multipart form upload in the `dna_file` field, or the file as
+    the raw request body (plain text, .gz or .zip) with its name in the
+    `filename` query argument. Either way the file is read exactly once.
+    """
+    if request.mimetype == 'multipart/form-data':
+        upload = request.files.get('dna_file')
+        if not upload or not upload.filename:
+            return None, None
+        return upload.stream, upload.filename
+    
+    if not request.content_length and 'chunked' not in request.headers.get('Transfer-Encoding', ''):
+        return None, None
+    return request.stream, request.args.get('filename', 'upload.txt')
+
 @app.route('/analyze', methods=['POST'])
 def analyze_dna():
     try:
-        # Get file path from the form
-        file_path = request.form['file_path']
-        analyze_all = request.form.get('analyze_all', 'n').lower()
+        # Get the uploaded file
+        stream, file_name = _get_dna_upload()
+        analyze_all = request.values.get('analyze_all', 'n').lower()
         
-        # Validate file exists
-        if not os.path.exists(file_path):
-            return jsonify({'error': 'File not found at the specified path'}), 400
+        if stream is None:
+            return jsonify({'error': 'No DNA data file was uploaded'}), 400
         
         # Analyze the DNA file
         max_snps = None if analyze_all == 'y' else 10000
-        analysis_report = dna_agent.analyze_dna_file(file_path, max_snps)
+        analysis_report = dna_agent.analyze_dna_upload(stream, file_name, max_snps)
         
         if 'error' in analysis_report:
             return jsonify({'error': analysis_report['error']}), 400
             
         # Return the reports
-        return jsonify({
-            'technical_report': analysis_report['technical_report'],
-            'consumer_report': analysis_report['consumer_report'],
-            'validation_report': analysis_report['validation_report'],
-            'summary': {
-                'total_snps': analysis_report['data_summary']['total_snps_analyzed'],
-                'significant_markers': len(analysis_report['data_summary']['significant_markers']),
-                'file_hash': analysis_report['data_summary'].get('file_hash', 'Not available')
-            }
-        })
+        return jsonify(_format_analysis_response(analysis_report))
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/analyze/stream', methods=['POST'])
+def analyze_dna_stream():
+    # Streaming variant of /analyze: newline-delimited JSON events, the summary
+    # and validation data first, then report tokens as the LLM produces them
+    stream, file_name = _get_dna_upload()
+    analyze_all = request.values.get('analyze_all', 'n').lower()
+    
+    if stream is None:
+        return jsonify({'error': 'No DNA data file was uploaded'}), 400
+    
+    max_snps = None if analyze_all == 'y' else 10000
+    
+    # Pull the first event here so the upload is parsed while the request
+    # (and its spooled file) is still open; only the LLM output is deferred
+    events = dna_agent.analyze_dna_upload_stream(stream, file_name, max_snps)
+    try:
+        first_event = next(events)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    
+    if first_event['event'] == 'error':
+        return jsonify({'error': first_event['error']}), 400
+    
+    def generate():
+        yield json.dumps(first_event) + '\n'
+        try:
+            for event in events:
+                yield json.dumps(event) + '\n'
+        except Exception as e:
+            yield json.dumps({'event': 'error', 'error': str(e)}) + '\n'
+    
+    return Response(generate(), mimetype='application/x-ndjson',
+                    headers={'X-Accel-Buffering': 'no', 'Cache-Control': 'no-cache'})
+
+@app.route('/jobs', methods=['POST'])
+def create_analysis_job():
+    # Start an analysis in the background; poll GET /jobs/<job_id> for progress
+    stream, file_name = _get_dna_upload()
+    analyze_all = request.values.get('analyze_all', 'n').lower()
+    
+    if stream is None:
+        return jsonify({'error': 'No DNA data file was uploaded'}), 400
+    
+    max_snps = None if analyze_all == 'y' else 10000
+    job = job_manager.submit(stream, file_name, max_snps)
+    
+    response = jsonify(job.to_dict())
+    response.status_code = 202
+    response.headers['Location'] = f'/jobs/{job.job_id}'
+    return response
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_analysis_job(job_id):
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job.to_dict())
+
 if __name__ == '__main__':
     app.run(debug=True, port=8082)
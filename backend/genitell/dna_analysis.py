@@ -1,23 +1,135 @@
 import os
+import io
+import gzip
 import json
+import zlib
+import struct
 import hashlib
 import requests
-from typing import List, Dict, Any, Tuple
+from typing import List, Dict, Any, Tuple, Iterator, BinaryIO, Callable
 
 # Import official Groq client
 from groq import Groq
 
+from genotype_rules import GenotypeRulesEngine
+from allele_frequency import AlleleFrequencyIndex, DEFAULT_INDEX_PATH, genotype_frequency, rarity
+
+STREAM_CHUNK_SIZE = 64 * 1024
+PROGRESS_INTERVAL_LINES = 10000
+GZIP_MAGIC = b'\x1f\x8b'
+ZIP_MAGIC = b'PK\x03\x04'
+ZIP_LOCAL_HEADER = struct.Struct('<IHHHHHIIIHH')
+
+
+class _HashingReader(io.RawIOBase):
+    """
+    Raw reader that feeds every byte it passes through into a SHA-256 hasher
+    """
+    
+    def __init__(self, stream: BinaryIO):
+        self._stream = stream
+        self._hash = hashlib.sha256()
+        self.bytes_read = 0
+    
+    def readable(self) -> bool:
+        return True
+    
+    def readinto(self, buffer) -> int:
+        data = self._stream.read(len(buffer))
+        if not data:
+            return 0
+        self._hash.update(data)
+        self.bytes_read += len(data)
+        buffer[:len(data)] = data
+        return len(data)
+    
+    def drain(self) -> None:
+        # Read (and hash) the rest of the stream without keeping it
+        for byte_block in iter(lambda: self._stream.read(STREAM_CHUNK_SIZE), b""):
+            self._hash.update(byte_block)
+            self.bytes_read += len(byte_block)
+    
+    def hexdigest(self) -> str:
+        return self._hash.hexdigest()
+
+
+class _ZipMemberReader(io.RawIOBase):
+    """
+    Forward-only reader for the first file in a zip archive
+    
+    Reads the local file header and inflates the member as it is read, so
+    the archive does not need to be seekable or held in memory (23andMe
+    distributes raw data as a zip containing a single .txt file).
+    """
+    
+    def __init__(self, stream: BinaryIO):
+        self._stream = stream
+        self._eof = False
+        
+        while True:
+            header = stream.read(ZIP_LOCAL_HEADER.size)
+            if len(header) < ZIP_LOCAL_HEADER.size:
+                raise ValueError("Zip archive does not contain a DNA data file")
+            (signature, _, flags, method, _, _, _,
+             compressed_size, _, name_length, extra_length) = ZIP_LOCAL_HEADER.unpack(header)
+            if signature != struct.unpack('<I', ZIP_MAGIC)[0]:
+                raise ValueError("Zip archive does not contain a DNA data file")
+            name = stream.read(name_length).decode('utf-8', errors='replace')
+            stream.read(extra_length)
+            
+            # Skip directory entries in front of the data file
+            if name.endswith('/') and not flags & 0x08:
+                stream.read(compressed_size)
+                continue
+            break
+        
+        if method == 8:
+            self._decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+        elif method == 0 and not flags & 0x08:
+            self._decompressor = None
+            self._remaining = compressed_size
+        else:
+            raise ValueError(f"Unsupported zip compression method: {method}")
+    
+    def readable(self) -> bool:
+        return True
+    
+    def readinto(self, buffer) -> int:
+        data = self._read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+    
+    def _read(self, size: int) -> bytes:
+        if self._decompressor is None:
+            data = self._stream.read(min(size, self._remaining))
+            self._remaining -= len(data)
+            return data
+        
+        while not self._eof:
+            chunk = self._decompressor.unconsumed_tail or self._stream.read(STREAM_CHUNK_SIZE)
+            if not chunk:
+                raise ValueError("Zip archive is truncated")
+            data = self._decompressor.decompress(chunk, size)
+            self._eof = self._decompressor.eof
+            if data:
+                return data
+        return b""
+
+
 class DNAAnalysisAgent:
-    def __init__(self, api_key: str, model: str = "meta-llama/llama-4-scout-17b-16e-instruct"):
+    def __init__(self, api_key: str, model: str = "meta-llama/llama-4-scout-17b-16e-instruct", base_url: str = None,
+                 frequency_index_path: str = DEFAULT_INDEX_PATH):
         """
         Initialize the DNA Analysis Agent
         
         Args:
             api_key: Groq API key
             model: Groq model to use for analysis
+            base_url: Optional Groq-compatible endpoint (e.g. a local server for testing)
+            frequency_index_path: Local allele-frequency index (see allele_frequency.py)
         """
         # Initialize Groq client directly
-        self.client = Groq(api_key=api_key)
+        self.client = Groq(api_key=api_key, base_url=base_url)
         self.model = model
         
         # System prompt for technical DNA analysis
@@ -145,6 +257,12 @@ class DNAAnalysisAgent:
             # Add more markers from publicly available databases
         }
         
+        # Deterministic genotype -> phenotype rules (APOE, MTHFR, star alleles)
+        self.rules_engine = GenotypeRulesEngine()
+        
+        # Local population allele frequencies (memory-mapped, no network access)
+        self.frequency_index = AlleleFrequencyIndex(frequency_index_path) if os.path.exists(frequency_index_path) else None
+        
         # Reference databases for validation
         self.reference_databases = {
             'dbSNP': 'https://www.ncbi.nlm.nih.gov/snp/',
@@ -161,9 +279,34 @@ class DNAAnalysisAgent:
         Parse a 23andMe raw data file
         
         Args:
-            file_path: Path to the 23andMe file
+            file_path: Path to the 23andMe file (plain text, .gz or .zip)
             max_snps: Maximum number of SNPs to analyze (None for all)
             
+        Returns:
+            Dictionary containing parsed DNA data
+        """
+        try:
+            with open(file_path, 'rb') as f:
+                return self._parse_23andme_stream(f, max_snps)
+        except Exception as e:
+            return {'error': str(e)}
+    
+    def _parse_23andme_stream(self, stream: BinaryIO, max_snps: int = None,
+                              progress: Callable[[str, float], None] = None, total_size: int = None) -> Dict[str, Any]:
+        """
+        Parse a 23andMe raw data stream in a single pass
+        
+        The raw bytes are hashed as they are read, gzip and zip archives are
+        decompressed on the fly, and the remainder of the stream is still hashed
+        when max_snps stops parsing early, so nothing is buffered in memory and
+        the stream is never read twice.
+        
+        Args:
+            stream: Binary file-like object (plain text, gzip or zip)
+            max_snps: Maximum number of SNPs to analyze (None for all)
+            progress: Optional callback receiving (stage, percent) updates
+            total_size: Size of the stream in bytes, if known, for progress reporting
+            
         Returns:
             Dictionary containing parsed DNA data
         """
@@ -171,71 +314,85 @@ class DNAAnalysisAgent:
         metadata = {}
         
         try:
-            with open(file_path, 'r') as f:
-                for line in f:
-                    # Skip comment lines but capture metadata
-                    if line.startswith('#'):
-                        if ': ' in line:
-                            key, value = line[1:].strip().split(': ', 1)
-                            metadata[key] = value
-                        continue
-                    
-                    # Handle header line
-                    if line.lower().startswith('rsid'):
-                        continue
+            raw = _HashingReader(stream)
+            buffered = io.BufferedReader(raw, buffer_size=STREAM_CHUNK_SIZE)
+            
+            # Detect archives by magic bytes rather than trusting the file name
+            magic = buffered.peek(4)[:4]
+            if magic.startswith(GZIP_MAGIC):
+                decompressed = gzip.GzipFile(fileobj=buffered, mode='rb')
+            elif magic == ZIP_MAGIC:
+                decompressed = io.BufferedReader(_ZipMemberReader(buffered), buffer_size=STREAM_CHUNK_SIZE)
+            else:
+                decompressed = buffered
+            
+            lines = io.TextIOWrapper(decompressed, encoding='utf-8', errors='replace')
+            for line_number, line in enumerate(lines, 1):
+                if progress and line_number % PROGRESS_INTERVAL_LINES == 0:
+                    progress('parse', self._parse_progress(raw.bytes_read, total_size, len(snp_data), max_snps))
+                
+                # Skip comment lines but capture metadata
+                if line.startswith('#'):
+                    if ': ' in line:
+                        key, value = line[1:].strip().split(': ', 1)
+                        metadata[key] = value
+                    continue
+                
+                # Handle header line
+                if line.lower().startswith('rsid'):
+                    continue
+                
+                # Parse SNP data - handle both 4-column and 5-column formats
+                parts = line.strip().split()
+                if len(parts) >= 4:
+                    rsid = parts[0]
+                    chromosome = parts[1]
+                    position = parts[2]
                     
-                    # Parse SNP data - handle both 4-column and 5-column formats
-                    parts = line.strip().split()
-                    if len(parts) >= 4:
-                        rsid = parts[0]
-                        chromosome = parts[1]
-                        position = parts[2]
-                        
-                        # Handle both 4-column format (combined genotype) and 5-column format (separate alleles)
-                        if len(parts) >= 5:
-                            # 5-column format: Combine alleles into genotype
-                            genotype = parts[3] + parts[4]
-                        else:
-                            # 4-column format: Genotype already combined
-                            genotype = parts[3]
-                            
-                        snp_data.append({
-                            'rsid': rsid,
-                            'chromosome': chromosome,
-                            'position': position,
-                            'genotype': genotype
-                        })
+                    # Handle both 4-column format (combined genotype) and 5-column format (separate alleles)
+                    if len(parts) >= 5:
+                        # 5-column format: Combine alleles into genotype
+                        genotype = parts[3] + parts[4]
+                    else:
+                        # 4-column format: Genotype already combined
+                        genotype = parts[3]
                         
-                        # Limit to max_snps if specified
-                        if max_snps and len(snp_data) >= max_snps:
-                            break
+                    snp_data.append({
+                        'rsid': rsid,
+                        'chromosome': chromosome,
+                        'position': position,
+                        'genotype': genotype
+                    })
+                    
+                    # Limit to max_snps if specified
+                    if max_snps and len(snp_data) >= max_snps:
+                        break
+            
+            # Hash whatever is left so the digest always covers the whole upload
+            raw.drain()
+            if progress:
+                progress('parse', 100.0)
             
             return {
                 'metadata': metadata,
                 'snp_data': snp_data,
                 'total_snps': len(snp_data),
-                'file_hash': self._calculate_file_hash(file_path)  # Add file hash for validation
+                'file_hash': raw.hexdigest(),  # Add file hash for validation
+                'file_size': raw.bytes_read
             }
         
         except Exception as e:
             return {'error': str(e)}
     
-    def _calculate_file_hash(self, file_path: str) -> str:
-        """
-        Calculate SHA-256 hash of file for data integrity validation
-        
-        Args:
-            file_path: Path to the file
-            
-        Returns:
-            SHA-256 hash of the file
-        """
-        sha256_hash = hashlib.sha256()
-        with open(file_path, "rb") as f:
-            # Read and update hash in chunks for memory efficiency
-            for byte_block in iter(lambda: f.read(4096), b""):
-                sha256_hash.update(byte_block)
-        return sha256_hash.hexdigest()
+    @staticmethod
+    def _parse_progress(bytes_read: int, total_size: int, snps_parsed: int, max_snps: int) -> float:
+        # Whichever limit (end of file or max_snps) is closer decides the percentage
+        percent = 0.0
+        if total_size:
+            percent = bytes_read * 100.0 / total_size
+        if max_snps:
+            percent = max(percent, snps_parsed * 100.0 / max_snps)
+        return min(percent, 99.0)
     
     def _get_significant_markers(self, parsed_data: Dict[str, Any]) -> List[Dict[str, Any]]:
         """
@@ -261,6 +418,21 @@ class DNAAnalysisAgent:
         
         return found_markers
     
+    def _call_genotypes(self, parsed_data: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        Interpret the rule-covered SNPs locally with the genotype rules engine
+        
+        Args:
+            parsed_data: Parsed DNA data
+            
+        Returns:
+            List of deterministic genotype calls (diplotypes and phenotypes)
+        """
+        rule_rsids = self.rules_engine.rsids
+        genotypes = {snp['rsid']: snp['genotype'] for snp in parsed_data.get('snp_data', [])
+                     if snp['rsid'] in rule_rsids}
+        return self.rules_engine.evaluate(genotypes)
+    
     def _validate_file_format(self, parsed_data: Dict[str, Any]) -> Dict[str, Any]:
         """
         Validate the format of the DNA file
@@ -330,27 +502,51 @@ class DNAAnalysisAgent:
         Returns:
             Dictionary containing marker frequency validation results
         """
-        # This function would ideally check against actual population databases
-        # For the purpose of this example, we'll simulate this process
-        
         validation_results = {
             'unusual_markers': [],
             'frequency_validation': []
         }
         
+        # One bulk lookup against the local index for every marker found
+        frequencies = {}
+        if self.frequency_index:
+            frequencies = self.frequency_index.lookup(marker['rsid'] for marker in significant_markers)
+        
         for marker in significant_markers:
-            # For demonstration - in a real implementation, you'd query actual databases
-            # or have a local copy of frequency data
-            
             marker_validation = {
                 'rsid': marker['rsid'],
                 'trait': marker['trait'],
                 'genotype': marker.get('genotype', 'N/A'),
                 'scientific_consensus': marker.get('scientific_consensus', 'unknown'),
-                'citation': marker.get('citation', 'Not available'),
-                'frequency_check': 'Simulated validation - would query actual population databases'
+                'citation': marker.get('citation', 'Not available')
             }
             
+            frequency = frequencies.get(marker['rsid'])
+            expected = genotype_frequency(marker.get('genotype'), frequency['ref'], frequency['alt'],
+                                          frequency['alt_frequency']) if frequency else None
+            if not frequency:
+                marker_validation['frequency_check'] = 'Not available in the local population frequency index'
+            elif expected is None:
+                marker_validation['frequency_check'] = f"Genotype does not match the indexed alleles ({frequency['ref']}/{frequency['alt']})"
+            else:
+                alt_count, expected_frequency = expected
+                marker_validation.update({
+                    'frequency_check': 'Checked against local population frequency index',
+                    'ref_allele': frequency['ref'],
+                    'alt_allele': frequency['alt'],
+                    'alt_allele_frequency': frequency['alt_frequency'],
+                    'alt_allele_count': alt_count,
+                    'expected_genotype_frequency': round(expected_frequency, 6),
+                    'rarity': rarity(expected_frequency)
+                })
+                if marker_validation['rarity'] != 'common':
+                    validation_results['unusual_markers'].append({
+                        'rsid': marker['rsid'],
+                        'genotype': marker_validation['genotype'],
+                        'expected_genotype_frequency': marker_validation['expected_genotype_frequency'],
+                        'rarity': marker_validation['rarity']
+                    })
+            
             # Example validation logic
             if marker.get('scientific_consensus') == 'low':
                 marker_validation['note'] = "This marker has relatively low scientific consensus. Results should be interpreted with caution."
@@ -359,12 +555,12 @@ class DNAAnalysisAgent:
         
         return validation_results
     
-    def _cross_check_markers(self, significant_markers: List[Dict[str, Any]]) -> Dict[str, Any]:
+    def _cross_check_markers(self, genotype_calls: List[Dict[str, Any]]) -> Dict[str, Any]:
         """
         Cross-check markers for internal consistency
         
         Args:
-            significant_markers: List of significant markers
+            genotype_calls: Deterministic genotype calls from the rules engine
             
         Returns:
             Dictionary containing cross-check results
@@ -374,36 +570,36 @@ class DNAAnalysisAgent:
             'related_markers': []
         }
         
-        # Example: Check APOE status (rs429358 and rs7412 together determine APOE allele)
-        apoe_markers = [m for m in significant_markers if m['rsid'] in ['rs429358', 'rs7412']]
-        
-        if len(apoe_markers) == 2:
-            # This would contain the actual logic to determine APOE status
-            validation_results['related_markers'].append({
-                'marker_group': 'APOE status',
-                'markers_present': [m['rsid'] for m in apoe_markers],
-                'note': 'Both markers for APOE status are present, allowing for complete APOE genotype determination.'
-            })
-        elif len(apoe_markers) == 1:
-            validation_results['consistency_issues'].append({
-                'marker_group': 'APOE status',
-                'issue': f"Only one APOE marker ({apoe_markers[0]['rsid']}) is present. Both rs429358 and rs7412 are needed for complete APOE genotype determination."
-            })
+        # Multi-SNP calls (e.g. APOE from rs429358 and rs7412) need every defining SNP
+        for call in genotype_calls:
+            if len(call['rsids']) < 2:
+                continue
+            if call['call']:
+                validation_results['related_markers'].append({
+                    'marker_group': f"{call['gene']} status",
+                    'markers_present': call['rsids'],
+                    'note': f"All markers for {call['gene']} are present; genotype determined as {call['call']}."
+                })
+            else:
+                validation_results['consistency_issues'].append({
+                    'marker_group': f"{call['gene']} status",
+                    'issue': f"{call.get('note', 'Genotype could not be determined')}. {', '.join(call['rsids'])} are all needed for complete {call['gene']} genotype determination."
+                })
         
         return validation_results
     
-    def _generate_validation_report(self, data_summary: Dict[str, Any], validation_data: Dict[str, Any]) -> str:
+    def _build_validation_prompt(self, data_summary: Dict[str, Any], validation_data: Dict[str, Any]) -> str:
         """
-        Generate a comprehensive validation report
-        
+        Build the LLM prompt for the validation report
+
         Args:
             data_summary: Summary of DNA data
             validation_data: Validation results
-            
+
         Returns:
-            Formatted validation report
+            Validation prompt text
         """
-        validation_prompt = f"""
+        return f"""
         I need to create a validation report for a DNA analysis with the following information:
         
         File: {data_summary['file_name']}
@@ -432,7 +628,20 @@ class DNAAnalysisAgent:
         
         Format this as a formal validation report with clear sections and appropriate scientific terminology.
         """
-        
+
+    def _generate_validation_report(self, data_summary: Dict[str, Any], validation_data: Dict[str, Any]) -> str:
+        """
+        Generate a comprehensive validation report
+
+        Args:
+            data_summary: Summary of DNA data
+            validation_data: Validation results
+
+        Returns:
+            Formatted validation report
+        """
+        validation_prompt = self._build_validation_prompt(data_summary, validation_data)
+
         try:
             validation_response = self.client.chat.completions.create(
                 model=self.model,
@@ -449,46 +658,110 @@ class DNAAnalysisAgent:
         
         return validation_report
     
-    def analyze_dna_file(self, file_path: str, max_snps: int = None) -> Dict[str, Any]:
+    def _prepare_analysis(self, parsed_data: Dict[str, Any], file_name: str,
+                          progress: Callable[[str, float], None] = None) -> Dict[str, Any]:
         """
-        Analyze a 23andMe DNA file and generate technical, consumer-friendly, and validation reports
+        Run the local (non-LLM) marker and validation steps on parsed DNA data
         
         Args:
-            file_path: Path to the 23andMe file
-            max_snps: Maximum number of SNPs to analyze (None for all)
+            parsed_data: Parsed DNA data
+            file_name: Name of the analyzed file
+            progress: Optional callback receiving (stage, percent) updates
             
         Returns:
-            Dictionary containing analysis reports and validation results
+            Dictionary containing the data summary and validation data
         """
-        # Parse the DNA file
-        parsed_data = self._parse_23andme_file(file_path, max_snps)
-        
         if 'error' in parsed_data:
             return {'error': parsed_data['error']}
         
-        # Extract significant markers
+        # Extract significant markers and interpret them locally
         significant_markers = self._get_significant_markers(parsed_data)
+        genotype_calls = self._call_genotypes(parsed_data)
+        if progress:
+            progress('markers', 100.0)
         
         # Create a summary of the data
         data_summary = {
-            'file_name': os.path.basename(file_path),
-            'file_size': os.path.getsize(file_path),
+            'file_name': file_name,
+            'file_size': parsed_data.get('file_size', 0),
             'file_hash': parsed_data.get('file_hash', 'Not available'),
             'metadata': parsed_data.get('metadata', {}),
             'total_snps_analyzed': parsed_data.get('total_snps', 0),
-            'significant_markers': significant_markers
+            'significant_markers': significant_markers,
+            'genotype_calls': genotype_calls
         }
         
         # Perform validation checks
         validation_data = {
             'file_format': self._validate_file_format(parsed_data),
             'marker_frequencies': self._validate_marker_frequencies(significant_markers),
-            'cross_check': self._cross_check_markers(significant_markers)
+            'cross_check': self._cross_check_markers(genotype_calls)
         }
+        if progress:
+            progress('validation', 100.0)
+        
+        return {
+            'data_summary': data_summary,
+            'validation_data': validation_data
+        }
+    
+    def analyze_dna_file(self, file_path: str, max_snps: int = None) -> Dict[str, Any]:
+        """
+        Analyze a 23andMe DNA file and generate technical, consumer-friendly, and validation reports
+        
+        Args:
+            file_path: Path to the 23andMe file (plain text, .gz or .zip)
+            max_snps: Maximum number of SNPs to analyze (None for all)
+            
+        Returns:
+            Dictionary containing analysis reports and validation results
+        """
+        parsed_data = self._parse_23andme_file(file_path, max_snps)
+        return self._complete_analysis(self._prepare_analysis(parsed_data, os.path.basename(file_path)))
+    
+    def analyze_dna_upload(self, stream: BinaryIO, file_name: str, max_snps: int = None,
+                           progress: Callable[[str, float], None] = None, total_size: int = None) -> Dict[str, Any]:
+        """
+        Analyze an uploaded 23andMe DNA file without saving it to disk
+        
+        Args:
+            stream: Binary stream of the upload (plain text, gzip or zip)
+            file_name: Original name of the uploaded file
+            max_snps: Maximum number of SNPs to analyze (None for all)
+            progress: Optional callback receiving (stage, percent) updates for the
+                'parse', 'markers', 'validation' and 'reports' stages
+            total_size: Size of the stream in bytes, if known, for progress reporting
+            
+        Returns:
+            Dictionary containing analysis reports and validation results
+        """
+        parsed_data = self._parse_23andme_stream(stream, max_snps, progress, total_size)
+        return self._complete_analysis(self._prepare_analysis(parsed_data, file_name, progress), progress)
+    
+    def _complete_analysis(self, prepared: Dict[str, Any], progress: Callable[[str, float], None] = None) -> Dict[str, Any]:
+        """
+        Generate all LLM reports for a prepared analysis
+        
+        Args:
+            prepared: Output of _prepare_analysis
+            progress: Optional callback receiving (stage, percent) updates
+            
+        Returns:
+            Dictionary containing analysis reports and validation results
+        """
+        if 'error' in prepared:
+            return {'error': prepared['error']}
+        
+        data_summary = prepared['data_summary']
+        validation_data = prepared['validation_data']
         
         # Generate reports
         technical_report, consumer_report = self._generate_reports(data_summary)
+        if progress:
+            progress('reports', 67.0)
         validation_report = self._generate_validation_report(data_summary, validation_data)
+        if progress:
+            progress('reports', 100.0)
         
         # Combine all information into a complete report package
         report = {
@@ -501,15 +774,127 @@ class DNAAnalysisAgent:
         
         return report
     
-    def _generate_reports(self, data_summary: Dict[str, Any]) -> Tuple[str, str]:
+    def analyze_dna_file_stream(self, file_path: str, max_snps: int = None) -> Iterator[Dict[str, Any]]:
         """
-        Generate both technical and consumer-friendly reports using the LLM
+        Streaming variant of analyze_dna_file
+        
+        Args:
+            file_path: Path to the 23andMe file (plain text, .gz or .zip)
+            max_snps: Maximum number of SNPs to analyze (None for all)
+            
+        Yields:
+            Analysis events (see _stream_analysis)
+        """
+        parsed_data = self._parse_23andme_file(file_path, max_snps)
+        yield from self._stream_analysis(self._prepare_analysis(parsed_data, os.path.basename(file_path)))
+    
+    def analyze_dna_upload_stream(self, stream: BinaryIO, file_name: str, max_snps: int = None) -> Iterator[Dict[str, Any]]:
+        """
+        Streaming variant of analyze_dna_upload
+        
+        Args:
+            stream: Binary stream of the upload (plain text, gzip or zip)
+            file_name: Original name of the uploaded file
+            max_snps: Maximum number of SNPs to analyze (None for all)
+            
+        Yields:
+            Analysis events (see _stream_analysis)
+        """
+        parsed_data = self._parse_23andme_stream(stream, max_snps)
+        yield from self._stream_analysis(self._prepare_analysis(parsed_data, file_name))
+    
+    def _stream_analysis(self, prepared: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        """
+        Stream the results of a prepared analysis
+        
+        Yields the parse summary and validation data immediately, then the
+        technical, consumer and validation reports token by token as they
+        arrive from the LLM.
+        
+        Args:
+            prepared: Output of _prepare_analysis
+            
+        Yields:
+            Event dictionaries with an 'event' key of 'summary', 'validation',
+            'report_start', 'token', 'report_end', 'error' or 'done'. An
+            'error' with a 'report' key means only that report failed.
+        """
+        if 'error' in prepared:
+            yield {'event': 'error', 'error': prepared['error']}
+            return
+        
+        data_summary = prepared['data_summary']
+        validation_data = prepared['validation_data']
+        
+        yield {
+            'event': 'summary',
+            'total_snps': data_summary['total_snps_analyzed'],
+            'significant_markers': len(data_summary['significant_markers']),
+            'file_hash': data_summary.get('file_hash', 'Not available'),
+            'genotype_calls': data_summary['genotype_calls']
+        }
+        yield {'event': 'validation', 'validation_data': validation_data}
+        
+        technical_prompt, consumer_prompt = self._build_report_prompts(data_summary)
+        reports = [
+            ('technical', self.technical_system_prompt, technical_prompt, 0.7, 2500),
+            ('consumer', self.simplified_system_prompt, consumer_prompt, 0.7, 2000),
+            ('validation', self.validation_system_prompt,
+             self._build_validation_prompt(data_summary, validation_data), 0.5, 2000)
+        ]
+        
+        for report_name, system_prompt, user_prompt, temperature, max_tokens in reports:
+            yield {'event': 'report_start', 'report': report_name}
+            try:
+                for content in self._stream_completion(system_prompt, user_prompt, temperature, max_tokens):
+                    yield {'event': 'token', 'report': report_name, 'content': content}
+            except Exception as e:
+                # The other reports may still succeed, so report this one and carry on
+                yield {'event': 'error', 'report': report_name,
+                       'error': f"Error generating {report_name} report: {e}"}
+            yield {'event': 'report_end', 'report': report_name}
+        
+        yield {'event': 'done'}
+    
+    def _stream_completion(self, system_prompt: str, user_prompt: str, temperature: float, max_tokens: int) -> Iterator[str]:
+        """
+        Stream a chat completion from the LLM
+        
+        Args:
+            system_prompt: System prompt for the completion
+            user_prompt: User prompt for the completion
+            temperature: Sampling temperature
+            max_tokens: Maximum number of tokens to generate
+            
+        Yields:
+            Content fragments as they arrive
+        """
+        stream = self.client.chat.completions.create(
+            model=self.model,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ],
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stream=True
+        )
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            content = chunk.choices[0].delta.content
+            if content:
+                yield content
+    
+    def _build_report_prompts(self, data_summary: Dict[str, Any]) -> Tuple[str, str]:
+        """
+        Build the LLM prompts for the technical and consumer-friendly reports
         
         Args:
             data_summary: Summary of the DNA data analysis
             
         Returns:
-            Tuple containing technical and consumer-friendly reports
+            Tuple containing the technical and consumer prompts
         """
         # Common prompt content for both reports
         base_prompt = f"""
@@ -523,7 +908,11 @@ class DNAAnalysisAgent:
         {json.dumps(data_summary['metadata'], indent=2)}
         
         Significant genetic markers found:
-        {json.dumps(data_summary['significant_markers'], indent=2)}
+        {json.dumps([{k: m[k] for k in ('rsid', 'genotype', 'trait')} for m in data_summary['significant_markers']])}
+        
+        Genotype interpretations (computed deterministically from established tables; 
+        narrate these as given and do not re-derive or contradict them):
+        {json.dumps([{k: c[k] for k in ('gene', 'call', 'phenotype')} for c in data_summary.get('genotype_calls', [])])}
         """
         
         # Generate technical report for medical professionals
@@ -552,6 +941,20 @@ class DNAAnalysisAgent:
         Focus on being informative, practical, and reassuring while being honest.
         """
         
+        return technical_prompt, consumer_prompt
+    
+    def _generate_reports(self, data_summary: Dict[str, Any]) -> Tuple[str, str]:
+        """
+        Generate both technical and consumer-friendly reports using the LLM
+        
+        Args:
+            data_summary: Summary of the DNA data analysis
+            
+        Returns:
+            Tuple containing technical and consumer-friendly reports
+        """
+        technical_prompt, consumer_prompt = self._build_report_prompts(data_summary)
+        
         # Generate technical report
         try:
             tech_response = self.client.chat.completions.create(
@@ -0,0 +1,197 @@
+from itertools import combinations_with_replacement
+from typing import List, Dict, Any, Optional, Tuple
+
+# All alleles are given on the plus (forward) strand, as reported by 23andMe.
+
+# Haplotype definitions: each gene lists the allele seen at every defining SNP
+# for each named haplotype. Add a new gene (or a new star allele) here and the
+# lookup tables are compiled from it automatically.
+HAPLOTYPE_RULES = {
+    'APOE': {
+        'rsids': ['rs429358', 'rs7412'],
+        'haplotypes': {
+            'ε2': ['T', 'T'],
+            'ε3': ['T', 'C'],
+            'ε4': ['C', 'C'],
+        },
+        'phenotypes': {
+            'ε2/ε2': 'Lower than average Alzheimer\'s risk; associated with type III hyperlipoproteinemia',
+            'ε2/ε3': 'Lower than average Alzheimer\'s risk',
+            'ε2/ε4': 'Roughly average Alzheimer\'s risk',
+            'ε3/ε3': 'Average Alzheimer\'s risk (most common genotype)',
+            'ε3/ε4': 'Increased Alzheimer\'s risk (about 2-3x)',
+            'ε4/ε4': 'Substantially increased Alzheimer\'s risk (about 8-12x)',
+        },
+        'citation': 'Corder, E. H. et al. (1993). Science, 261(5123), 921-923'
+    },
+    'CYP2C19': {
+        'rsids': ['rs4244285', 'rs4986893', 'rs12248560'],
+        'haplotypes': {
+            '*1': ['G', 'G', 'C'],
+            '*2': ['A', 'G', 'C'],
+            '*3': ['G', 'A', 'C'],
+            '*17': ['G', 'G', 'T'],
+        },
+        'function': {'*1': 'normal', '*2': 'none', '*3': 'none', '*17': 'increased'},
+        'citation': 'Lee, C. R. et al. (2022). Clinical Pharmacology & Therapeutics, 112(5), 959-967 (CPIC)'
+    },
+    'CYP2C9': {
+        'rsids': ['rs1799853', 'rs1057910'],
+        'haplotypes': {
+            '*1': ['C', 'A'],
+            '*2': ['T', 'A'],
+            '*3': ['C', 'C'],
+        },
+        'function': {'*1': 'normal', '*2': 'decreased', '*3': 'none'},
+        'citation': 'Theken, K. N. et al. (2020). Clinical Pharmacology & Therapeutics, 108(2), 191-200 (CPIC)'
+    },
+}
+
+# Metabolizer phenotype from the functions of the two star alleles (CPIC terms)
+STAR_ALLELE_PHENOTYPES = {
+    ('normal', 'normal'): 'Normal metabolizer',
+    ('increased', 'normal'): 'Rapid metabolizer',
+    ('increased', 'increased'): 'Ultrarapid metabolizer',
+    ('decreased', 'normal'): 'Intermediate metabolizer',
+    ('none', 'normal'): 'Intermediate metabolizer',
+    ('decreased', 'increased'): 'Intermediate metabolizer',
+    ('increased', 'none'): 'Intermediate metabolizer',
+    ('decreased', 'decreased'): 'Intermediate metabolizer',
+    ('decreased', 'none'): 'Poor metabolizer',
+    ('none', 'none'): 'Poor metabolizer',
+}
+
+# Single-SNP rules: genotype (alleles in sorted order) to phenotype
+SNP_RULES = {
+    'MTHFR C677T': {
+        'rsid': 'rs1801133',
+        'genotypes': {
+            'GG': 'Typical MTHFR enzyme activity',
+            'AG': 'Mildly reduced MTHFR enzyme activity (about 65% of typical)',
+            'AA': 'Reduced MTHFR enzyme activity (about 30% of typical); may affect folate metabolism',
+        },
+        'citation': 'Frosst, P. et al. (1995). Nature Genetics, 10(1), 111-113'
+    },
+    'VKORC1 -1639G>A': {
+        'rsid': 'rs9923231',
+        'genotypes': {
+            'CC': 'Typical warfarin sensitivity',
+            'CT': 'Increased warfarin sensitivity; lower doses may be needed',
+            'TT': 'Highly increased warfarin sensitivity; lower doses are usually needed',
+        },
+        'citation': 'Johnson, J. A. et al. (2017). Clinical Pharmacology & Therapeutics, 102(3), 397-404 (CPIC)'
+    },
+}
+
+
+def _normalize_genotype(genotype: str) -> Optional[str]:
+    """
+    Normalize a genotype call to its sorted allele string, or None for no-calls
+    """
+    if not genotype or '-' in genotype or len(genotype) != 2:
+        return None
+    return ''.join(sorted(genotype.upper()))
+
+
+class GenotypeRulesEngine:
+    """
+    Deterministic, table-driven genotype to phenotype interpretation
+
+    Haplotype and single-SNP rules are compiled once into dictionaries keyed
+    by normalized genotypes, so evaluating a file is a handful of dict lookups
+    rather than an LLM round trip.
+    """
+
+    def __init__(self, haplotype_rules: Dict[str, Any] = None, snp_rules: Dict[str, Any] = None):
+        self.haplotype_rules = HAPLOTYPE_RULES if haplotype_rules is None else haplotype_rules
+        self.snp_rules = SNP_RULES if snp_rules is None else snp_rules
+
+        self._diplotype_tables = {gene: self._compile_haplotype_rule(rule)
+                                  for gene, rule in self.haplotype_rules.items()}
+
+        # Every rsid any rule needs, so callers can collect genotypes in one pass
+        self.rsids = frozenset(
+            [rsid for rule in self.haplotype_rules.values() for rsid in rule['rsids']] +
+            [rule['rsid'] for rule in self.snp_rules.values()]
+        )
+
+    def _compile_haplotype_rule(self, rule: Dict[str, Any]) -> Dict[Tuple[str, ...], Tuple[str, str]]:
+        """
+        Enumerate every diplotype of a gene into a genotype -> (diplotype, phenotype) table
+
+        Args:
+            rule: Haplotype rule definition
+
+        Returns:
+            Dictionary keyed by the tuple of normalized genotypes at the rule's rsids
+        """
+        haplotypes = rule['haplotypes']
+        table = {}
+        for first, second in combinations_with_replacement(haplotypes, 2):
+            key = tuple(''.join(sorted(a + b)) for a, b in zip(haplotypes[first], haplotypes[second]))
+            # Ambiguous phase: keep the first (most common) diplotype listed
+            if key in table:
+                continue
+            diplotype = f"{first}/{second}"
+            table[key] = (diplotype, self._diplotype_phenotype(rule, first, second, diplotype))
+        return table
+
+    @staticmethod
+    def _diplotype_phenotype(rule: Dict[str, Any], first: str, second: str, diplotype: str) -> str:
+        if 'phenotypes' in rule:
+            return rule['phenotypes'].get(diplotype, 'Unknown')
+        functions = tuple(sorted((rule['function'][first], rule['function'][second])))
+        return STAR_ALLELE_PHENOTYPES.get(functions, 'Indeterminate')
+
+    def evaluate(self, genotypes: Dict[str, str]) -> List[Dict[str, Any]]:
+        """
+        Interpret the genotypes covered by the rule tables
+
+        Args:
+            genotypes: Mapping of rsid to genotype (e.g. {'rs429358': 'TC'})
+
+        Returns:
+            List of calls, one per gene or SNP rule with at least one genotype present
+        """
+        calls = []
+
+        for gene, rule in self.haplotype_rules.items():
+            observed = [_normalize_genotype(genotypes.get(rsid)) for rsid in rule['rsids']]
+            present = [rsid for rsid, genotype in zip(rule['rsids'], observed) if genotype]
+            if not present:
+                continue
+
+            call = {
+                'gene': gene,
+                'rsids': rule['rsids'],
+                'genotypes': {rsid: genotypes.get(rsid) for rsid in rule['rsids']},
+                'citation': rule.get('citation', 'Not available')
+            }
+            if len(present) < len(rule['rsids']):
+                missing = [rsid for rsid in rule['rsids'] if rsid not in present]
+                call.update({'call': None, 'phenotype': 'Indeterminate',
+                             'note': f"Missing genotype for {', '.join(missing)}"})
+            else:
+                match = self._diplotype_tables[gene].get(tuple(observed))
+                if match:
+                    call.update({'call': match[0], 'phenotype': match[1]})
+                else:
+                    call.update({'call': None, 'phenotype': 'Indeterminate',
+                                 'note': 'Genotype combination does not match any known haplotype pair'})
+            calls.append(call)
+
+        for name, rule in self.snp_rules.items():
+            raw_genotype = genotypes.get(rule['rsid'])
+            genotype = _normalize_genotype(raw_genotype)
+            if not genotype:
+                continue
+            calls.append({
+                'gene': name,
+                'rsids': [rule['rsid']],
+                'genotypes': {rule['rsid']: raw_genotype},
+                'call': genotype,
+                'phenotype': rule['genotypes'].get(genotype, 'Unrecognized genotype'),
+                'citation': rule.get('citation', 'Not available')
+            })
+
+        return calls
@@ -0,0 +1,135 @@
+import gzip
+import os
+import random
+
+import pytest
+
+from allele_frequency import AlleleFrequencyIndex, DEFAULT_INDEX_PATH, build_index, genotype_frequency, rarity
+
+TSV_PATH = os.path.join(os.path.dirname(DEFAULT_INDEX_PATH), 'allele_frequencies.tsv')
+
+
+def tsv_records():
+    with open(TSV_PATH) as f:
+        rows = [line.split() for line in f if not line.startswith('#') and line.strip()]
+    return {rsid: {'ref': ref, 'alt': alt, 'alt_frequency': float(frequency)} for rsid, ref, alt, frequency in rows}
+
+
+@pytest.fixture
+def index():
+    index = AlleleFrequencyIndex(DEFAULT_INDEX_PATH)
+    yield index
+    index.close()
+
+
+def test_the_committed_index_is_built_from_the_committed_tsv(tmp_path):
+    rebuilt = str(tmp_path / 'rebuilt.afi')
+    assert build_index(TSV_PATH, rebuilt) == len(tsv_records())
+    with open(rebuilt, 'rb') as f, open(DEFAULT_INDEX_PATH, 'rb') as committed:
+        assert f.read() == committed.read()
+
+
+def test_every_tsv_record_is_found(index):
+    expected = tsv_records()
+    assert index.record_count == len(expected)
+    found = index.lookup(expected)
+    assert found.keys() == expected.keys()
+    for rsid, record in expected.items():
+        assert found[rsid] == {**record, 'alt_frequency': pytest.approx(record['alt_frequency'], abs=1e-6)}
+
+
+@pytest.mark.parametrize('rsids, expected', [
+    (['rs7412'], ['rs7412']),
+    # Smallest and largest rs numbers in the fixture
+    (['rs12248560', 'rs7412', 'rs7411', 'rs12248561'], ['rs7412', 'rs12248560']),
+    (['rs1', 'rs7412', 'rs99999999'], ['rs7412']),
+    # Between two records, out of order, repeated, malformed
+    (['rs7413', 'rs9923231', 'rs429358', 'rs9923231'], ['rs429358', 'rs9923231']),
+    (['i3000001', 'rsabc', 'rs', 'rs1801133'], ['rs1801133']),
+    ([], []),
+])
+def test_lookups_return_only_indexed_rsids(index, rsids, expected):
+    assert sorted(index.lookup(rsids)) == sorted(expected)
+
+
+def test_bisect_lookups_agree_with_a_dict_on_a_large_index(tmp_path):
+    rng = random.Random(8)
+    records = {rng.randrange(1, 10 ** 9): (rng.choice('ACGT'), rng.choice('ACGT'), round(rng.random(), 3)) for _ in range(20000)}
+    source = tmp_path / 'large.tsv'
+    source.write_text(''.join(f"rs{n}\t{ref}\t{alt}\t{frequency}\n" for n, (ref, alt, frequency) in records.items()))
+    build_index(str(source), str(tmp_path / 'large.afi'))
+    index = AlleleFrequencyIndex(str(tmp_path / 'large.afi'))
+    try:
+        queries = rng.sample(sorted(records), 500) + [rng.randrange(1, 10 ** 9) for _ in range(500)]
+        found = index.lookup(f"rs{n}" for n in queries)
+        assert found.keys() == {f"rs{n}" for n in queries if n in records}
+        for rsid, record in found.items():
+            ref, alt, frequency = records[int(rsid[2:])]
+            assert (record['ref'], record['alt']) == (ref, alt)
+            assert record['alt_frequency'] == pytest.approx(frequency, abs=1e-6)
+    finally:
+        index.close()
+
+
+def test_a_vcf_source_keeps_biallelic_snvs_with_a_frequency(tmp_path):
+    source = tmp_path / 'subset.vcf.gz'
+    with gzip.open(source, 'wt') as f:
+        f.write('##fileformat=VCFv4.2\n#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\n')
+        f.write('19\t45411941\trs429358\tT\tC,G\t.\tPASS\tAC=10;AF=0.15,0.01\n')
+        f.write('19\t45412079\trs7412\tC\tT\t.\tPASS\tAF=0.075\n')
+        f.write('19\t45412079\trs7412\tC\tA\t.\tPASS\tAF=0.5\n')
+        f.write('1\t100\trs100\tAT\tA\t.\tPASS\tAF=0.2\n')
+        f.write('1\t200\trs200\tA\tG\t.\tPASS\tAC=3\n')
+        f.write('1\t300\t.\tA\tG\t.\tPASS\tAF=0.3\n')
+    assert build_index(str(source), str(tmp_path / 'subset.afi')) == 2
+    index = AlleleFrequencyIndex(str(tmp_path / 'subset.afi'))
+    try:
+        assert index.lookup(['rs429358', 'rs7412', 'rs100', 'rs200']) == {
+            'rs429358': {'ref': 'T', 'alt': 'C', 'alt_frequency': 0.15},
+            'rs7412': {'ref': 'C', 'alt': 'T', 'alt_frequency': 0.075},
+        }
+    finally:
+        index.close()
+
+
+def test_a_file_that_is_not_an_index_is_refused(tmp_path):
+    path = tmp_path / 'bogus.afi'
+    path.write_bytes(b'NOPE' + bytes(20))
+    with pytest.raises(ValueError, match='not an allele frequency index'):
+        AlleleFrequencyIndex(str(path))
+
+
+@pytest.mark.parametrize('genotype, ref, alt, q, alt_count, expected', [
+    # APOE rs429358 (T>C, q = 0.15): p², 2pq, q²
+    ('TT', 'T', 'C', 0.15, 0, 0.7225),
+    ('TC', 'T', 'C', 0.15, 1, 0.255),
+    ('CT', 'T', 'C', 0.15, 1, 0.255),
+    ('CC', 'T', 'C', 0.15, 2, 0.0225),
+    # Reported on the other strand: AG is the complement of TC
+    ('AG', 'T', 'C', 0.15, 1, 0.255),
+    ('gg', 'T', 'C', 0.15, 2, 0.0225),
+    ('AA', 'G', 'A', 0.245, 2, 0.060025),
+    ('GG', 'C', 'T', 0.5, 0, 0.25),
+    ('TT', 'C', 'T', 1.0, 2, 1.0),
+])
+def test_hardy_weinberg_genotype_frequencies(genotype, ref, alt, q, alt_count, expected):
+    count, frequency = genotype_frequency(genotype, ref, alt, q)
+    assert count == alt_count
+    assert frequency == pytest.approx(expected)
+
+
+@pytest.mark.parametrize('genotype', ['', '--', 'T', 'TCT', 'AC', 'TN'])
+def test_genotypes_that_match_neither_strand_have_no_frequency(genotype):
+    assert genotype_frequency(genotype, 'T', 'C', 0.15) is None
+
+
+def test_hardy_weinberg_frequencies_sum_to_one():
+    for q in (0.0, 0.01, 0.15, 0.5, 0.99):
+        assert sum(genotype_frequency(genotype, 'A', 'G', q)[1] for genotype in ('AA', 'AG', 'GG')) == pytest.approx(1.0)
+
+
+@pytest.mark.parametrize('frequency, label', [
+    (0.0, 'rare'), (0.0099, 'rare'), (0.01, 'uncommon'), (0.0499, 'uncommon'), (0.05, 'common'), (0.7225, 'common'),
+])
+def test_rarity_thresholds(frequency, label):
+    assert rarity(frequency) == label
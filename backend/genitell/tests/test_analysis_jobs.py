@@ -0,0 +1,159 @@
+import io
+import threading
+import time
+
+import pytest
+
+from analysis_jobs import AnalysisJobManager
+from dna_analysis import DNAAnalysisAgent
+from fake_groq import FakeGroqServer
+
+SAMPLE = b"""# This data file generated by 23andMe
+# rsid\tchromosome\tposition\tgenotype
+rs429358\t19\t45411941\tTC
+rs7412\t19\t45412079\tCC
+rs4680\t22\t19951271\tAG
+rs1801133\t1\t11856378\tCT
+"""
+
+
+def sample(n):
+    # A different upload (and so file hash) per n
+    return SAMPLE + f"rs{1000 + n}\t1\t{1000 + n}\tAA\n".encode()
+
+
+@pytest.fixture
+def fake_groq():
+    with FakeGroqServer() as server:
+        yield server
+
+
+@pytest.fixture
+def agent(fake_groq):
+    agent = DNAAnalysisAgent(api_key='test-key', base_url=fake_groq.base_url)
+    agent.client = agent.client.with_options(max_retries=0)
+    return agent
+
+
+@pytest.fixture
+def make_manager(agent):
+    managers = []
+
+    def make(**kwargs):
+        manager = AnalysisJobManager(agent, **kwargs)
+        managers.append(manager)
+        return manager
+    yield make
+    for manager in managers:
+        manager.executor.shutdown(wait=True)
+
+
+def submit(manager, data=SAMPLE, max_snps=None):
+    return manager.submit(io.BytesIO(data), 'genome.txt', max_snps)
+
+
+def wait(job, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while job.status not in ('completed', 'failed'):
+        assert time.monotonic() < deadline, f'job still {job.status}'
+        time.sleep(0.01)
+    return job.to_dict()
+
+
+def test_the_same_upload_and_max_snps_share_one_job(make_manager, fake_groq):
+    manager = make_manager()
+    job = submit(manager)
+    assert submit(manager) is job
+    assert wait(job)['status'] == 'completed'
+    # Completed jobs are reused too, without another run
+    assert submit(manager) is job
+    assert len(fake_groq.requests) == 3
+    limited = submit(manager, max_snps=2)
+    assert limited is not job and submit(manager, max_snps=2) is limited
+    assert wait(limited)['result']['data_summary']['total_snps_analyzed'] == 2
+    assert submit(manager, sample(1)) is not job
+    assert len(manager.jobs) == 3
+
+
+def test_a_failed_job_is_run_again_on_resubmission(make_manager, agent, monkeypatch):
+    manager = make_manager()
+    call_genotypes = agent._call_genotypes
+    calls = []
+
+    def fail_once(parsed_data):
+        calls.append(parsed_data)
+        if len(calls) == 1:
+            raise RuntimeError('genotype index unavailable')
+        return call_genotypes(parsed_data)
+    monkeypatch.setattr(agent, '_call_genotypes', fail_once)
+    failed = submit(manager)
+    state = wait(failed)
+    assert (state['status'], state['error']) == ('failed', 'genotype index unavailable')
+    assert 'result' not in state
+    retried = submit(manager)
+    assert retried is not failed
+    assert wait(retried)['status'] == 'completed'
+    assert submit(manager) is retried
+    assert manager.jobs_by_key[(retried.file_hash, None)] is retried
+
+
+def test_an_unreadable_upload_fails_its_job(make_manager, fake_groq):
+    manager = make_manager()
+    job = submit(manager, b'PK\x03\x04' + b'\x14\x00\x00\x00\x63\x00' + b'\x00' * 40)
+    assert wait(job)['error'] == 'Unsupported zip compression method: 99'
+    assert not fake_groq.requests
+
+
+def test_the_oldest_finished_jobs_are_evicted_past_max_jobs(make_manager, agent, monkeypatch):
+    manager = make_manager(max_workers=1, max_jobs=2)
+    first, second = submit(manager, sample(1)), submit(manager, sample(2))
+    wait(first)
+    wait(second)
+    third = submit(manager, sample(3))
+    assert manager.get(first.job_id) is None
+    assert list(manager.jobs) == [second.job_id, third.job_id]
+    assert (first.file_hash, None) not in manager.jobs_by_key
+    wait(third)
+    # Resubmitting an evicted upload starts over
+    again = submit(manager, sample(1))
+    assert again is not first and manager.get(second.job_id) is None
+    wait(again)
+
+    # Running and queued jobs are kept whatever the limit
+    release = threading.Event()
+    prepare = agent._prepare_analysis
+
+    def blocked(*args, **kwargs):
+        release.wait(10)
+        return prepare(*args, **kwargs)
+    monkeypatch.setattr(agent, '_prepare_analysis', blocked)
+    running = [submit(manager, sample(n)) for n in range(4, 7)]
+    assert all(job.job_id in manager.jobs for job in running)
+    assert len(manager.jobs) == 3
+    release.set()
+    for job in running:
+        assert wait(job)['status'] == 'completed'
+
+
+def test_progress_moves_through_the_stages(make_manager, agent, monkeypatch):
+    manager = make_manager()
+    in_reports, release = threading.Event(), threading.Event()
+    generate_reports = agent._generate_reports
+
+    def blocked(data_summary):
+        in_reports.set()
+        release.wait(10)
+        return generate_reports(data_summary)
+    monkeypatch.setattr(agent, '_generate_reports', blocked)
+    job = submit(manager)
+    assert in_reports.wait(10)
+    state = job.to_dict()
+    assert state['status'] == 'running'
+    assert state['stages'] == {'parse': 100.0, 'markers': 100.0, 'validation': 100.0, 'reports': 0.0}
+    assert state['progress'] == 35.0
+    assert 'result' not in state
+    release.set()
+    state = wait(job)
+    assert state['stages'] == dict.fromkeys(('parse', 'markers', 'validation', 'reports'), 100.0)
+    assert state['progress'] == 100.0
+    assert state['result']['consumer_report'] == 'Hello, world'
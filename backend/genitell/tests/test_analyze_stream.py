@@ -0,0 +1,86 @@
+import io
+import json
+
+import pytest
+
+import app as genitell_app
+from dna_analysis import DNAAnalysisAgent
+from fake_groq import FakeGroqServer
+
+SAMPLE = b"""# This data file generated by 23andMe
+# rsid\tchromosome\tposition\tgenotype
+rs429358\t19\t45411941\tTC
+rs7412\t19\t45412079\tCC
+rs4680\t22\t19951271\tAG
+rs1801133\t1\t11856378\tCT
+"""
+
+
+@pytest.fixture
+def fake_groq():
+    with FakeGroqServer() as server:
+        yield server
+
+
+@pytest.fixture
+def client(fake_groq, monkeypatch):
+    agent = DNAAnalysisAgent(api_key='test-key', base_url=fake_groq.base_url)
+    agent.client = agent.client.with_options(max_retries=0)
+    monkeypatch.setattr(genitell_app, 'dna_agent', agent)
+    return genitell_app.app.test_client()
+
+
+def post_stream(client, data=SAMPLE):
+    return client.post('/analyze/stream', data={'dna_file': (io.BytesIO(data), 'genome.txt')},
+                       content_type='multipart/form-data')
+
+
+def events(response):
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines() if line.strip()]
+
+
+def test_streams_summary_then_each_report(client, fake_groq):
+    response = post_stream(client)
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    received = events(response)
+    assert [event['event'] for event in received[:2]] == ['summary', 'validation']
+    assert received[0]['total_snps'] == 4
+    assert received[-1] == {'event': 'done'}
+    for report in ('technical', 'consumer', 'validation'):
+        tokens = [event['content'] for event in received if event['event'] == 'token' and event['report'] == report]
+        assert ''.join(tokens) == 'Hello, world'
+    assert len(fake_groq.requests) == 3 and all(request['stream'] for request in fake_groq.requests)
+
+
+def test_llm_failure_is_an_error_event_per_report(client, fake_groq):
+    fake_groq.status = 400
+    received = events(post_stream(client))
+    errors = [event for event in received if event['event'] == 'error']
+    assert [event['report'] for event in errors] == ['technical', 'consumer', 'validation']
+    assert not [event for event in received if event['event'] == 'token']
+    assert received[-1] == {'event': 'done'}
+
+
+def test_unreadable_upload_is_a_json_400(client, fake_groq):
+    # A zip member compressed with an unsupported method: the parser fails before any event is streamed
+    response = post_stream(client, b'PK\x03\x04' + b'\x14\x00\x00\x00\x63\x00' + b'\x00' * 40)
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'Unsupported zip compression method: 99'}
+    assert not fake_groq.requests
+
+
+def test_missing_upload_is_a_json_400(client):
+    response = client.post('/analyze/stream', data={}, content_type='multipart/form-data')
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'No DNA data file was uploaded'}
+
+
+@pytest.mark.parametrize('error, status', [(ValueError('bad marker data'), 400), (RuntimeError('index unavailable'), 500)])
+def test_failure_before_first_event_is_json(client, monkeypatch, error, status):
+    def fail(*args, **kwargs):
+        raise error
+    monkeypatch.setattr(genitell_app.dna_agent, '_prepare_analysis', fail)
+    response = post_stream(client)
+    assert response.status_code == status
+    assert response.get_json() == {'error': str(error)}
@@ -0,0 +1,104 @@
+import pytest
+
+from allele_frequency import AlleleFrequencyIndex, DEFAULT_INDEX_PATH
+from genotype_rules import GenotypeRulesEngine, HAPLOTYPE_RULES, SNP_RULES
+
+
+@pytest.fixture(scope='module')
+def engine():
+    return GenotypeRulesEngine()
+
+
+def call_for(engine, gene, genotypes):
+    calls = [call for call in engine.evaluate(genotypes) if call['gene'] == gene]
+    return calls[0] if calls else None
+
+
+@pytest.mark.parametrize('rs429358, rs7412, diplotype, risk', [
+    ('TT', 'TT', 'ε2/ε2', 'Lower than average'),
+    ('TT', 'CT', 'ε2/ε3', 'Lower than average'),
+    ('CT', 'CT', 'ε2/ε4', 'Roughly average'),
+    ('TT', 'CC', 'ε3/ε3', 'Average'),
+    ('CT', 'CC', 'ε3/ε4', 'Increased'),
+    ('CC', 'CC', 'ε4/ε4', 'Substantially increased'),
+    # Genotypes come in either allele order and case
+    ('tc', 'TC', 'ε2/ε4', 'Roughly average'),
+])
+def test_apoe_diplotypes(engine, rs429358, rs7412, diplotype, risk):
+    call = call_for(engine, 'APOE', {'rs429358': rs429358, 'rs7412': rs7412})
+    assert call['call'] == diplotype
+    assert call['phenotype'].startswith(risk)
+    assert call['genotypes'] == {'rs429358': rs429358, 'rs7412': rs7412}
+
+
+@pytest.mark.parametrize('rs4244285, rs4986893, rs12248560, diplotype, phenotype', [
+    ('GG', 'GG', 'CC', '*1/*1', 'Normal metabolizer'),
+    ('AG', 'GG', 'CC', '*1/*2', 'Intermediate metabolizer'),
+    ('GG', 'AG', 'CC', '*1/*3', 'Intermediate metabolizer'),
+    ('GG', 'GG', 'CT', '*1/*17', 'Rapid metabolizer'),
+    ('AA', 'GG', 'CC', '*2/*2', 'Poor metabolizer'),
+    ('AG', 'AG', 'CC', '*2/*3', 'Poor metabolizer'),
+    ('AG', 'GG', 'TC', '*2/*17', 'Intermediate metabolizer'),
+    ('GG', 'AA', 'CC', '*3/*3', 'Poor metabolizer'),
+    ('GG', 'GG', 'TT', '*17/*17', 'Ultrarapid metabolizer'),
+])
+def test_cyp2c19_diplotypes(engine, rs4244285, rs4986893, rs12248560, diplotype, phenotype):
+    call = call_for(engine, 'CYP2C19', {'rs4244285': rs4244285, 'rs4986893': rs4986893, 'rs12248560': rs12248560})
+    assert (call['call'], call['phenotype']) == (diplotype, phenotype)
+
+
+@pytest.mark.parametrize('rs1799853, rs1057910, diplotype, phenotype', [
+    ('CC', 'AA', '*1/*1', 'Normal metabolizer'),
+    ('CT', 'AA', '*1/*2', 'Intermediate metabolizer'),
+    ('CC', 'AC', '*1/*3', 'Intermediate metabolizer'),
+    ('TT', 'AA', '*2/*2', 'Intermediate metabolizer'),
+    ('CT', 'AC', '*2/*3', 'Poor metabolizer'),
+    ('CC', 'CC', '*3/*3', 'Poor metabolizer'),
+])
+def test_cyp2c9_diplotypes(engine, rs1799853, rs1057910, diplotype, phenotype):
+    call = call_for(engine, 'CYP2C9', {'rs1799853': rs1799853, 'rs1057910': rs1057910})
+    assert (call['call'], call['phenotype']) == (diplotype, phenotype)
+
+
+@pytest.mark.parametrize('genotypes, note', [
+    ({'rs429358': 'CT'}, 'Missing genotype for rs7412'),
+    ({'rs429358': 'CT', 'rs7412': '--'}, 'Missing genotype for rs7412'),
+    ({'rs429358': 'AG', 'rs7412': 'CC'}, 'Genotype combination does not match any known haplotype pair'),
+])
+def test_incomplete_or_unknown_apoe_genotypes_are_indeterminate(engine, genotypes, note):
+    call = call_for(engine, 'APOE', genotypes)
+    assert (call['call'], call['phenotype'], call['note']) == (None, 'Indeterminate', note)
+
+
+def test_a_gene_with_no_genotypes_is_left_out(engine):
+    assert engine.evaluate({'rs429358': '--', 'rs9999999': 'AA'}) == []
+    assert call_for(engine, 'CYP2C19', {'rs4244285': 'AA', 'rs4986893': 'AA', 'rs12248560': 'CC'})['phenotype'] == 'Indeterminate'
+
+
+@pytest.mark.parametrize('gene, genotype, call, phenotype', [
+    ('MTHFR C677T', 'GG', 'GG', 'Typical MTHFR enzyme activity'),
+    ('MTHFR C677T', 'GA', 'AG', 'Mildly reduced MTHFR enzyme activity (about 65% of typical)'),
+    ('MTHFR C677T', 'AA', 'AA', 'Reduced MTHFR enzyme activity (about 30% of typical); may affect folate metabolism'),
+    ('MTHFR C677T', 'CT', 'CT', 'Unrecognized genotype'),
+    ('VKORC1 -1639G>A', 'TC', 'CT', 'Increased warfarin sensitivity; lower doses may be needed'),
+])
+def test_single_snp_rules(engine, gene, genotype, call, phenotype):
+    rsid = SNP_RULES[gene]['rsid']
+    result = call_for(engine, gene, {rsid: genotype})
+    assert (result['call'], result['phenotype'], result['genotypes']) == (call, phenotype, {rsid: genotype})
+
+
+def test_every_rule_allele_is_an_allele_of_the_committed_frequency_index(engine):
+    index = AlleleFrequencyIndex(DEFAULT_INDEX_PATH)
+    try:
+        records = index.lookup(engine.rsids)
+    finally:
+        index.close()
+    assert set(records) == engine.rsids
+    for gene, rule in HAPLOTYPE_RULES.items():
+        for position, rsid in enumerate(rule['rsids']):
+            alleles = {haplotype[position] for haplotype in rule['haplotypes'].values()}
+            assert alleles <= {records[rsid]['ref'], records[rsid]['alt']}, (gene, rsid)
+    for name, rule in SNP_RULES.items():
+        record = records[rule['rsid']]
+        assert {allele for genotype in rule['genotypes'] for allele in genotype} == {record['ref'], record['alt']}, name
@@ -0,0 +1,128 @@
+import gzip
+import hashlib
+import io
+import zipfile
+
+import pytest
+
+import app as genitell_app
+from dna_analysis import DNAAnalysisAgent
+from fake_groq import FakeGroqServer
+
+GENOME = b"# This data file generated by 23andMe\n# rsid\tchromosome\tposition\tgenotype\n" + b"".join(
+    b"rs%d\t%d\t%d\t%s\n" % (100000 + i, 1 + i % 22, 1000 + i, (b"AG", b"CC", b"TT")[i % 3]) for i in range(30000))
+
+
+class _Unseekable(io.RawIOBase):
+    # zipfile writes a data descriptor after each member when it can't seek back to the header
+    def __init__(self):
+        self.buffer = io.BytesIO()
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        return self.buffer.write(data)
+
+
+def zipped(data, compression=zipfile.ZIP_DEFLATED, directory=False, descriptors=False):
+    out = _Unseekable() if descriptors else io.BytesIO()
+    with zipfile.ZipFile(out, 'w', compression) as archive:
+        if directory:
+            archive.writestr('genome/', b'')
+        with archive.open('genome/genome_v5.txt' if directory else 'genome_v5.txt', 'w') as member:
+            member.write(data)
+    return out.buffer.getvalue() if descriptors else out.getvalue()
+
+
+UPLOADS = {
+    'plain': GENOME,
+    'gzip': gzip.compress(GENOME),
+    'zip': zipped(GENOME),
+    'stored zip': zipped(GENOME, zipfile.ZIP_STORED),
+    'zip with a directory entry': zipped(GENOME, directory=True),
+    'zip with data descriptors': zipped(GENOME, descriptors=True),
+}
+
+
+@pytest.fixture
+def agent():
+    return DNAAnalysisAgent(api_key='test-key')
+
+
+@pytest.fixture
+def client(monkeypatch):
+    with FakeGroqServer() as server:
+        agent = DNAAnalysisAgent(api_key='test-key', base_url=server.base_url)
+        agent.client = agent.client.with_options(max_retries=0)
+        monkeypatch.setattr(genitell_app, 'dna_agent', agent)
+        yield genitell_app.app.test_client()
+
+
+def test_zip_fixtures_use_the_flags_they_are_named_for():
+    assert int.from_bytes(UPLOADS['zip with data descriptors'][6:8], 'little') & 0x08
+    assert not int.from_bytes(UPLOADS['zip'][6:8], 'little') & 0x08
+
+
+@pytest.mark.parametrize('kind', list(UPLOADS))
+def test_every_upload_format_parses_the_same_snps(agent, kind):
+    upload = UPLOADS[kind]
+    parsed = agent._parse_23andme_stream(io.BytesIO(upload))
+    assert 'error' not in parsed
+    assert parsed['total_snps'] == 30000
+    assert parsed['snp_data'][0] == {'rsid': 'rs100000', 'chromosome': '1', 'position': '1000', 'genotype': 'AG'}
+    assert parsed['snp_data'][-1]['rsid'] == 'rs129999'
+    assert parsed['metadata'] == {}
+    # The hash is of the upload as sent, compressed or not
+    assert parsed['file_hash'] == hashlib.sha256(upload).hexdigest()
+    assert parsed['file_size'] == len(upload)
+
+
+@pytest.mark.parametrize('kind', list(UPLOADS))
+def test_the_hash_covers_the_whole_file_when_parsing_stops_early(agent, kind):
+    upload = UPLOADS[kind]
+    progress = []
+    parsed = agent._parse_23andme_stream(io.BytesIO(upload), max_snps=5, progress=lambda *update: progress.append(update),
+                                         total_size=len(upload))
+    assert parsed['total_snps'] == 5
+    assert parsed['file_hash'] == hashlib.sha256(upload).hexdigest()
+    assert parsed['file_size'] == len(upload)
+    assert progress[-1] == ('parse', 100.0)
+
+
+GZIP = UPLOADS['gzip']
+ZIP = UPLOADS['zip']
+BROKEN = {
+    'truncated gzip': (GZIP[:len(GZIP) // 2], 'Compressed file ended before the end-of-stream marker was reached'),
+    'gzip without its trailer': (GZIP[:-4], 'Compressed file ended before the end-of-stream marker was reached'),
+    'gzip with a bad checksum': (GZIP[:-8] + bytes(4) + GZIP[-4:], 'CRC check failed'),
+    'truncated zip': (ZIP[:len(ZIP) // 2], 'Zip archive is truncated'),
+    'corrupt zip': (ZIP[:80] + bytes(200) + ZIP[280:], 'Error -3 while decompressing data'),
+    'zip header only': (ZIP[:20], 'Zip archive does not contain a DNA data file'),
+    'stored zip with data descriptors': (zipped(GENOME, zipfile.ZIP_STORED, descriptors=True),
+                                         'Unsupported zip compression method: 0'),
+}
+
+
+@pytest.mark.parametrize('kind', list(BROKEN))
+def test_a_broken_upload_is_a_400_not_a_500(client, kind):
+    upload, error = BROKEN[kind]
+    response = client.post('/analyze?analyze_all=y', data={'dna_file': (io.BytesIO(upload), 'genome.zip')},
+                           content_type='multipart/form-data')
+    assert response.status_code == 400
+    assert response.get_json()['error'].startswith(error)
+    response = client.post('/analyze/stream?filename=genome.zip&analyze_all=y', data=upload,
+                           content_type='application/octet-stream')
+    assert response.status_code == 400
+    assert response.get_json()['error'].startswith(error)
+
+
+@pytest.mark.parametrize('kind', ['gzip', 'zip with data descriptors'])
+def test_a_compressed_upload_is_analyzed_from_the_raw_body(client, kind):
+    upload = UPLOADS[kind]
+    response = client.post('/analyze?filename=genome.zip&analyze_all=y', data=upload,
+                           content_type='application/octet-stream')
+    assert response.status_code == 200
+    summary = response.get_json()['summary']
+    assert summary['total_snps'] == 30000
+    assert summary['file_hash'] == hashlib.sha256(upload).hexdigest()